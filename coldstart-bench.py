@@ -0,0 +1,175 @@
+"""
+Cold-start benchmark for the Lambda / SSM script handlers under src/.
+
+Every handler module is loaded in a fresh interpreter with `python -X importtime`, so each
+measurement is a real cold start:
+
+  * import_ms   - total import time reported by -X importtime (top-level imports)
+  * init_ms     - wall time to execute the module (imports + module-scope clients/config)
+  * invoke_ms   - first invocation of the handler (only with --event; needs credentials)
+  * slowest     - the heaviest top-level imports, to see what to defer
+
+Usage:
+    python coldstart-bench.py                              # all handlers under src/
+    python coldstart-bench.py src/OMBASR/Mime3.py          # selected files
+    python coldstart-bench.py --event event.json --output coldstart.json
+    python coldstart-bench.py --baseline coldstart.json    # show deltas against an earlier run
+    python coldstart-bench.py --repeat 5                   # median of 5 cold starts per handler
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+HANDLER_NAMES = ("lambda_handler", "script_handler")
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+# Runs inside the child interpreter. The handler's directory and src/ (shared modules such as
+# profiling.py) are appended, not prepended, to sys.path so src/email.py cannot shadow the stdlib.
+LOADER = r"""
+import sys, json, time, importlib.util
+path, handler_name, event_path = sys.argv[1], sys.argv[2], sys.argv[3]
+sys.path.extend([sys.argv[4], sys.argv[5]])
+result = {}
+start = time.perf_counter()
+try:
+    spec = importlib.util.spec_from_file_location("coldstart_target", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    result["init_ms"] = round((time.perf_counter() - start) * 1000, 1)
+except BaseException as e:
+    result["init_error"] = f"{type(e).__name__}: {e}"
+    print("COLDSTART " + json.dumps(result)); sys.exit(0)
+
+if event_path:
+    class Context:
+        function_name = "coldstart-bench"
+        aws_request_id = "coldstart-bench"
+        def get_remaining_time_in_millis(self):
+            return 900000
+    with open(event_path) as fh:
+        event = json.load(fh)
+    start = time.perf_counter()
+    try:
+        getattr(module, handler_name)(event, Context())
+    except BaseException as e:
+        result["invoke_error"] = f"{type(e).__name__}: {e}"
+    result["invoke_ms"] = round((time.perf_counter() - start) * 1000, 1)
+print("COLDSTART " + json.dumps(result))
+"""
+
+
+def discover_handlers(paths):
+    """Return [(file, handler_name)] for files defining lambda_handler/script_handler."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames[:] = [d for d in dirnames if d not in ("__pycache__", "node_modules")]
+                files.extend(os.path.join(dirpath, f) for f in sorted(filenames) if f.endswith(".py"))
+        else:
+            files.append(path)
+
+    handlers = []
+    for file in sorted(files):
+        with open(file, encoding="utf-8", errors="replace") as fh:
+            source = fh.read()
+        for name in HANDLER_NAMES:
+            if re.search(rf"^def {name}\(", source, re.M):
+                handlers.append((file, name))
+                break
+    return handlers
+
+
+def parse_importtime(stderr, top=5):
+    """Sum top-level cumulative import time and list the slowest top-level imports."""
+    top_level = []
+    for line in stderr.splitlines():
+        m = IMPORTTIME_LINE.match(line)
+        if m and len(m.group(3)) == 1:  # one space of indent == imported directly by the handler
+            top_level.append((int(m.group(2)), m.group(4)))
+    total_us = sum(us for us, _ in top_level)
+    slowest = [f"{name} {us / 1000:.1f}ms" for us, name in sorted(top_level, reverse=True)[:top]]
+    return round(total_us / 1000, 1), slowest
+
+
+def measure(file, handler_name, event_path=None, timeout=120):
+    env = dict(os.environ)
+    env.setdefault("AWS_REGION", env.get("AWS_DEFAULT_REGION", "us-east-1"))  # always set in Lambda
+    env.setdefault("AWS_DEFAULT_REGION", env["AWS_REGION"])
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", LOADER,
+         os.path.abspath(file), handler_name, event_path or "", os.path.dirname(os.path.abspath(file)),
+         os.path.join(ROOT, "src")],
+        capture_output=True, text=True, timeout=timeout, cwd=ROOT, env=env,
+    )
+    result = {}
+    for line in proc.stdout.splitlines():
+        if line.startswith("COLDSTART "):
+            result = json.loads(line[len("COLDSTART "):])
+    if not result:
+        result["init_error"] = (proc.stderr.strip().splitlines() or ["no output"])[-1]
+    result["import_ms"], result["slowest"] = parse_importtime(proc.stderr)
+    result["handler"] = handler_name
+    return result
+
+
+def measure_median(file, handler_name, event_path=None, repeat=1):
+    """Run measure() `repeat` times and keep the median of each timing."""
+    runs = [measure(file, handler_name, event_path) for _ in range(max(1, repeat))]
+    result = dict(runs[-1])
+    for field in ("import_ms", "init_ms", "invoke_ms"):
+        values = [r[field] for r in runs if field in r]
+        if values:
+            result[field] = round(statistics.median(values), 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start init and first-invocation time per handler.")
+    parser.add_argument("paths", nargs="*", default=[os.path.join(ROOT, "src")])
+    parser.add_argument("--event", help="JSON event file; when given, the handler is invoked once after init")
+    parser.add_argument("--output", help="write results as JSON (to track init time over time)")
+    parser.add_argument("--baseline", help="earlier --output file to compare against")
+    parser.add_argument("--repeat", type=int, default=1, help="cold starts per handler; medians are reported")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+
+    results = {}
+    for file, handler_name in discover_handlers(args.paths):
+        key = os.path.relpath(file, ROOT)
+        results[key] = r = measure_median(
+            file, handler_name, os.path.abspath(args.event) if args.event else None, args.repeat)
+
+        line = f"{key:<60} import {r['import_ms']:>7.1f}ms"
+        if "init_ms" in r:
+            line += f"  init {r['init_ms']:>7.1f}ms"
+            previous = baseline.get(key, {}).get("init_ms")
+            if previous is not None:
+                line += f" ({r['init_ms'] - previous:+.1f})"
+        else:
+            line += f"  init failed: {r['init_error']}"
+        if "invoke_ms" in r:
+            line += f"  invoke {r['invoke_ms']:>8.1f}ms"
+            if "invoke_error" in r:
+                line += f" [{r['invoke_error'][:60]}]"
+        print(line)
+        if r["slowest"]:
+            print(f"{'':<62}{', '.join(r['slowest'])}")
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2, sort_keys=True)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 import json
 from datetime import datetime, timezone
 import boto3
+from api_metrics import instrumented
+from profiling import profiled
 
 config = boto3.client("config")
 
@@ -72,6 +74,8 @@ def _eval_from_tags(resource_id: str, tags: dict, capture_time: str):
     }
 
 
+@instrumented
+@profiled
 def lambda_handler(event, context):
     """
     AWS Config Custom Rule Lambda (Tag-level evaluation)
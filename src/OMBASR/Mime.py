@@ -17,6 +17,8 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 import boto3
 from botocore.config import Config
 from botocore.exceptions import ClientError, EndpointConnectionError, ReadTimeoutError, ConnectTimeoutError
+from api_metrics import instrumented
+from profiling import profiled
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -328,6 +330,8 @@ def send_email_with_attachment(to_address: str, file_path: str, emailbody: str,
         return 1
 
 # -------------------- Lambda entry --------------------
+@instrumented
+@profiled
 def lambda_handler(event, context):
     # Regions
     regions = getenv_list("SECURITY_HUB_REGIONS")
@@ -1,24 +1,19 @@
 import os
 import json
-import csv
 import io
-import smtplib
-import ssl
 import logging
 import re
-import socket
+import threading
 import random
 from datetime import datetime, timezone, timedelta
-from email.mime.base import MIMEBase
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email import encoders
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
 
 import boto3
 from botocore.config import Config
 from botocore.exceptions import ClientError, EndpointConnectionError, ReadTimeoutError, ConnectTimeoutError
+from api_metrics import instrumented
+from profiling import profiled, stage
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -26,8 +21,9 @@ logger.setLevel(logging.INFO)
 # ---------- Global timeouts ----------
 DEFAULT_CONNECT_TIMEOUT = int(os.getenv("CONNECT_TIMEOUT_SECONDS", "5"))
 DEFAULT_READ_TIMEOUT    = int(os.getenv("READ_TIMEOUT_SECONDS", "20"))
-SMTP_SOCKET_TIMEOUT     = float(os.getenv("SMTP_SOCKET_TIMEOUT", "8"))
-socket.setdefaulttimeout(SMTP_SOCKET_TIMEOUT)
+SMTP_SOCKET_TIMEOUT     = float(os.getenv("SMTP_SOCKET_TIMEOUT", "8"))   # passed per SMTP connection, not set process-wide
+# csv / smtplib / email.mime are imported where used: they are only needed at report time,
+# so keeping them out of module scope shortens the init phase.
 
 # -------------------- Env helpers --------------------
 def getenv_bool(key: str, default: bool = True) -> bool:
@@ -140,17 +136,29 @@ def dedupe_latest(findings, key_mode: str = "GENERATOR_ID"):
     return list(latest.values())
 
 # -------------------- Security Hub query (concurrent & capped) --------------------
+# Static region list resolved once per container (init phase); clients are built on first use
+# per region and reused by warm invocations.
+SECURITY_HUB_REGIONS = getenv_list("SECURITY_HUB_REGIONS") or [os.getenv("AWS_REGION", "us-east-1")]
+_sh_clients = {}
+_sh_clients_lock = threading.Lock()
+
+def get_securityhub_client(region: str):
+    with _sh_clients_lock:
+        if region not in _sh_clients:
+            _sh_clients[region] = boto3.client(
+                "securityhub",
+                region_name=region,
+                config=Config(
+                    retries={"max_attempts": 10, "mode": "standard"},
+                    connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                    read_timeout=DEFAULT_READ_TIMEOUT,
+                ),
+            )
+        return _sh_clients[region]
+
 def _collect_region_findings(region: str, filters, page_size: int, max_pages: int, max_findings: int):
     out = []
-    sh = boto3.client(
-        "securityhub",
-        region_name=region,
-        config=Config(
-            retries={"max_attempts": 10, "mode": "standard"},
-            connect_timeout=DEFAULT_CONNECT_TIMEOUT,
-            read_timeout=DEFAULT_READ_TIMEOUT,
-        ),
-    )
+    sh = get_securityhub_client(region)
     try:
         paginator = sh.get_paginator("get_findings")
         page_count = 0
@@ -439,6 +447,8 @@ def to_csv_bytes(findings):
         else:
             display_columns.append(col)
             
+    import csv
+
     out = io.StringIO(newline="")
     w = csv.writer(out)
     w.writerow(display_columns)
@@ -532,6 +542,12 @@ SMTP_PASS     = os.getenv("SMTP_PASS", "")
 SMTP_STARTTLS = (os.getenv("SMTP_STARTTLS", "").strip().lower() in ("1","true","yes"))
 
 def send_email_with_attachment(to_address: str, file_path: str, emailbody: str, servicename: str, subject_hint: str = "", extra_html: str = "", explain_html: str = ""):
+    import smtplib
+    from email import encoders
+    from email.mime.base import MIMEBase
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+
     to_address = to_address or DEFAULT_TO
     # servicename_u = (servicename or "report").upper()
     servicename_u = (servicename or "report")
@@ -573,7 +589,6 @@ def send_email_with_attachment(to_address: str, file_path: str, emailbody: str,
 
     rcpts = [e.strip() for e in (to_address + ("," + cc_addr if cc_addr else "")).split(",") if e.strip()]
 
-    socket.setdefaulttimeout(SMTP_SOCKET_TIMEOUT)
     print(f"[DEBUG] SMTP connect {SMTP_HOST}:{SMTP_PORT} starttls={SMTP_STARTTLS} timeout={SMTP_SOCKET_TIMEOUT}s")
 
     try:
@@ -600,11 +615,11 @@ def send_email_with_attachment(to_address: str, file_path: str, emailbody: str,
         return 1
 
 # -------------------- Lambda entry --------------------
+@instrumented
+@profiled
 def lambda_handler(event, context):
     # Regions
-    regions = getenv_list("SECURITY_HUB_REGIONS")
-    if not regions:
-        regions = [os.getenv("AWS_REGION", "us-east-1")]
+    regions = SECURITY_HUB_REGIONS
 
     # Filters (env-driven to keep your “old form”) — allow external override via event
     days_back = int(event.get("days_back", os.getenv("DAYS_BACK", 7)))
@@ -620,7 +635,8 @@ def lambda_handler(event, context):
     logger.info("Effective filters: %s", json.dumps(filters))
 
     # Query
-    findings = collect_findings(regions, filters)
+    with stage("inventory"):
+        findings = collect_findings(regions, filters)
 
     # Dedupe (latest per rule) — unchanged
     if getenv_bool("LATEST_PER_RULE", False):
@@ -630,13 +646,15 @@ def lambda_handler(event, context):
         findings = dedupe_latest(findings, key_mode)
 
     # ===== Sleek summary for email (unique resources) =====
-    counts, wf_list, cp_list = build_workflow_compliance_summary(findings)
-    summary_html = summary_to_html(counts, wf_list, cp_list)
-    explain_html = summary_explanations_html(counts, wf_list, cp_list)
+    with stage("summarize"):
+        counts, wf_list, cp_list = build_workflow_compliance_summary(findings)
+        summary_html = summary_to_html(counts, wf_list, cp_list)
+        explain_html = summary_explanations_html(counts, wf_list, cp_list)
     # ======================================================
 
     # CSV (unchanged order; Account IDs forced to full digits)
-    csv_bytes = to_csv_bytes(findings)
+    with stage("csv"):
+        csv_bytes = to_csv_bytes(findings)
 
     # Attachment name
     servicename   = os.getenv("SERVICE_NAME", "BMOASR-ConfigRule-HCOPS")
@@ -652,15 +670,16 @@ def lambda_handler(event, context):
     email_body = os.getenv("EMAIL_BODY", f"BMOASR Security Hub Findings updated in the last {days_back} days.")
 
     # Send (embed: grid + explanations; NO plaintext fallback)
-    rc = send_email_with_attachment(
-        to_address=os.getenv("SMTP_TO", ""),     # if empty -> FROM
-        file_path=csv_path,
-        emailbody=email_body,
-        servicename=servicename,
-        subject_hint=os.getenv("EMAIL_SUBJECT", ""),
-        extra_html=summary_html,
-        explain_html=explain_html
-    )
+    with stage("smtp"):
+        rc = send_email_with_attachment(
+            to_address=os.getenv("SMTP_TO", ""),     # if empty -> FROM
+            file_path=csv_path,
+            emailbody=email_body,
+            servicename=servicename,
+            subject_hint=os.getenv("EMAIL_SUBJECT", ""),
+            extra_html=summary_html,
+            explain_html=explain_html
+        )
     if rc != 0:
         raise RuntimeError("Email send failed")
 
@@ -1,22 +1,17 @@
 import os
 import json
-import csv
 import io
-import smtplib
-import ssl
 import logging
 import re
-import socket
+import threading
 from datetime import datetime, timezone
-from email.mime.base import MIMEBase
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email import encoders
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import boto3
 from botocore.config import Config
 from botocore.exceptions import ClientError, EndpointConnectionError, ReadTimeoutError, ConnectTimeoutError
+from api_metrics import instrumented
+from profiling import profiled, stage
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -24,8 +19,9 @@ logger.setLevel(logging.INFO)
 # ---------- Global timeouts ----------
 DEFAULT_CONNECT_TIMEOUT = int(os.getenv("CONNECT_TIMEOUT_SECONDS", "5"))
 DEFAULT_READ_TIMEOUT    = int(os.getenv("READ_TIMEOUT_SECONDS", "20"))
-SMTP_SOCKET_TIMEOUT     = float(os.getenv("SMTP_SOCKET_TIMEOUT", "8"))
-socket.setdefaulttimeout(SMTP_SOCKET_TIMEOUT)
+SMTP_SOCKET_TIMEOUT     = float(os.getenv("SMTP_SOCKET_TIMEOUT", "8"))   # passed per SMTP connection, not set process-wide
+# csv / smtplib / email.mime are imported where used: they are only needed at report time,
+# so keeping them out of module scope shortens the init phase.
 
 # -------------------- Env helpers --------------------
 def getenv_bool(key: str, default: bool = True) -> bool:
@@ -136,17 +132,29 @@ def dedupe_latest(findings, key_mode: str = "GENERATOR_ID"):
     return list(latest.values())
 
 # -------------------- Security Hub query (concurrent & capped) --------------------
+# Static region list resolved once per container (init phase); clients are built on first use
+# per region and reused by warm invocations.
+SECURITY_HUB_REGIONS = getenv_list("SECURITY_HUB_REGIONS") or [os.getenv("AWS_REGION", "us-east-1")]
+_sh_clients = {}
+_sh_clients_lock = threading.Lock()
+
+def get_securityhub_client(region: str):
+    with _sh_clients_lock:
+        if region not in _sh_clients:
+            _sh_clients[region] = boto3.client(
+                "securityhub",
+                region_name=region,
+                config=Config(
+                    retries={"max_attempts": 10, "mode": "standard"},
+                    connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                    read_timeout=DEFAULT_READ_TIMEOUT,
+                ),
+            )
+        return _sh_clients[region]
+
 def _collect_region_findings(region: str, filters, page_size: int, max_pages: int, max_findings: int):
     out = []
-    sh = boto3.client(
-        "securityhub",
-        region_name=region,
-        config=Config(
-            retries={"max_attempts": 10, "mode": "standard"},
-            connect_timeout=DEFAULT_CONNECT_TIMEOUT,
-            read_timeout=DEFAULT_READ_TIMEOUT,
-        ),
-    )
+    sh = get_securityhub_client(region)
     try:
         paginator = sh.get_paginator("get_findings")
         page_count = 0
@@ -379,6 +387,8 @@ def to_csv_bytes(findings):
         else:
             display_columns.append(col)
 
+    import csv
+
     out = io.StringIO(newline="")
     w = csv.writer(out)
     w.writerow(display_columns)
@@ -454,6 +464,12 @@ SMTP_PASS     = os.getenv("SMTP_PASS", "")
 SMTP_STARTTLS = (os.getenv("SMTP_STARTTLS", "").strip().lower() in ("1","true","yes"))
 
 def send_email_with_attachment(to_address: str, file_path: str, emailbody: str, servicename: str, subject_hint: str = "", extra_html: str = "", explain_html: str = ""):
+    import smtplib
+    from email import encoders
+    from email.mime.base import MIMEBase
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+
     to_address = to_address or DEFAULT_TO
     emailsubject = subject_hint or f"{(servicename or 'report')} security_findings report"
 
@@ -491,7 +507,6 @@ def send_email_with_attachment(to_address: str, file_path: str, emailbody: str,
 
     rcpts = [e.strip() for e in (to_address + ("," + cc_addr if cc_addr else "")).split(",") if e.strip()]
 
-    socket.setdefaulttimeout(SMTP_SOCKET_TIMEOUT)
     print(f"[DEBUG] SMTP connect {SMTP_HOST}:{SMTP_PORT} starttls={SMTP_STARTTLS} timeout={SMTP_SOCKET_TIMEOUT}s")
 
     try:
@@ -518,11 +533,11 @@ def send_email_with_attachment(to_address: str, file_path: str, emailbody: str,
         return 1
 
 # -------------------- Lambda entry --------------------
+@instrumented
+@profiled
 def lambda_handler(event, context):
     # Regions
-    regions = getenv_list("SECURITY_HUB_REGIONS")
-    if not regions:
-        regions = [os.getenv("AWS_REGION", "us-east-1")]
+    regions = SECURITY_HUB_REGIONS
 
     # Inputs
     days_back = int(event.get("days_back", os.getenv("DAYS_BACK", 7)))
@@ -538,7 +553,8 @@ def lambda_handler(event, context):
     filtersA = merge_filters(baseA, optA)
     logger.info("Filters A (NEW×FAILED): %s", json.dumps(filtersA))
 
-    findingsA = collect_findings(regions, filtersA)
+    with stage("inventory"):
+        findingsA = collect_findings(regions, filtersA)
 
     # --- Slice B: Title starts with ... AND Compliance != FAILED (we use PASSED) AND Workflow=RESOLVED AND NoteUpdatedAt in last days_back AND NoteUpdatedBy present
     baseB = make_time_filter(days_back)
@@ -551,7 +567,8 @@ def lambda_handler(event, context):
     filtersB = merge_filters(merge_filters(baseB, optB), noteB)
     logger.info("Filters B (RESOLVED×PASSED with recent note): %s", json.dumps(filtersB))
 
-    findingsB = collect_findings(regions, filtersB)
+    with stage("inventory"):
+        findingsB = collect_findings(regions, filtersB)
 
     # Combine
     findings = findingsA + findingsB
@@ -564,12 +581,14 @@ def lambda_handler(event, context):
         findings = dedupe_latest(findings, key_mode)
 
     # Summary only for the two asked combos
-    counts = build_workflow_compliance_summary_only_new_failed_and_resolved_passed(findings)
-    summary_html = summary_to_html_minimal(counts)
-    explain_html = explanations_html(counts)
+    with stage("summarize"):
+        counts = build_workflow_compliance_summary_only_new_failed_and_resolved_passed(findings)
+        summary_html = summary_to_html_minimal(counts)
+        explain_html = explanations_html(counts)
 
     # CSV
-    csv_bytes = to_csv_bytes(findings)
+    with stage("csv"):
+        csv_bytes = to_csv_bytes(findings)
     servicename = os.getenv("SERVICE_NAME", "BMOASR-ConfigRule-HCOPS")
     csv_filename = choose_attachment_name(findings, servicename, title_prefix, os.getenv("CSV_FILENAME"))
     csv_path = f"/tmp/{csv_filename}"
@@ -581,15 +600,16 @@ def lambda_handler(event, context):
     email_body = os.getenv("EMAIL_BODY", f"BMOASR Security Hub Findings in the last {days_back} days (NEW×FAILED and RESOLVED×PASSED).")
 
     # Send
-    rc = send_email_with_attachment(
-        to_address=os.getenv("SMTP_TO", ""),
-        file_path=csv_path,
-        emailbody=email_body,
-        servicename=servicename,
-        subject_hint=os.getenv("EMAIL_SUBJECT", ""),
-        extra_html=summary_html,
-        explain_html=explain_html
-    )
+    with stage("smtp"):
+        rc = send_email_with_attachment(
+            to_address=os.getenv("SMTP_TO", ""),
+            file_path=csv_path,
+            emailbody=email_body,
+            servicename=servicename,
+            subject_hint=os.getenv("EMAIL_SUBJECT", ""),
+            extra_html=summary_html,
+            explain_html=explain_html
+        )
     if rc != 0:
         raise RuntimeError("Email send failed")
 
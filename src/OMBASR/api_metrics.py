@@ -0,0 +1 @@
+../config/api_metrics.py
\ No newline at end of file
@@ -1,5 +1,8 @@
-import boto3, os
+import boto3
 from datetime import datetime, timezone
+from api_metrics import instrumented
+from evaluation_cache import EvaluationCache
+from profiling import profiled
 
 config = boto3.client("config")
 ec2 = boto3.client("ec2")
@@ -68,6 +71,8 @@ def _chunks(items, n=100):
         yield items[i:i+n]
 
 
+@instrumented
+@profiled
 def lambda_handler(event, context):
     result_token = event.get("resultToken", "TESTMODE")
     now = datetime.now(timezone.utc)
@@ -112,8 +117,16 @@ def lambda_handler(event, context):
         })
 
     # ------------------- Send to AWS Config -------------------
+    submitted = 0
     if result_token != "TESTMODE" and evals:
-        for batch in _chunks(evals, 100):
-            config.put_evaluations(Evaluations=batch, ResultToken=result_token)
-
-    return {"status": "ok", "evaluated": len(evals)}
+        # Only resources whose compliance/annotation changed or whose last submission is due
+        cache = EvaluationCache.for_event(event, "ombasr-configrule")
+        try:
+            for batch in _chunks(cache.filter(evals), 100):
+                config.put_evaluations(Evaluations=batch, ResultToken=result_token)
+                cache.mark_submitted(batch)
+                submitted += len(batch)
+        finally:
+            cache.save()
+
+    return {"status": "ok", "evaluated": len(evals), "submitted": submitted}
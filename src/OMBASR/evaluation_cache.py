@@ -0,0 +1 @@
+../config/evaluation_cache.py
\ No newline at end of file
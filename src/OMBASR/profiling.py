@@ -0,0 +1 @@
+../config/profiling.py
\ No newline at end of file
@@ -0,0 +1,314 @@
+"""
+Record / replay of AWS responses at the botocore HTTP layer.
+
+Record mode sends requests to AWS as usual and captures every raw HTTP response
+(each page of a paginated call is its own request) into a gzip-compressed JSON fixture,
+with 12-digit account IDs scrubbed. Replay mode answers requests from that fixture
+without network or credentials. Because the hook sits in front of the HTTP send,
+botocore still does parsing, pagination, retries and error mapping exactly as it does
+against AWS.
+
+Run a handler offline:
+
+    python src/aws_replay.py record src/config/cw-alarm-fix2.py --event event.json
+    python src/aws_replay.py replay src/config/cw-alarm-fix2.py --event event.json
+    python src/aws_replay.py replay src/OMBASR/Mime3.py --latency recorded --throttle-rate 0.05
+
+or from code, before the handler module creates its clients:
+
+    import aws_replay
+    aws_replay.activate("replay", "fixtures/cw-alarm-fix2.json.gz")
+
+Matching: a response is served for the same service, operation and request parameters
+(account IDs scrubbed, datetimes normalised), in recorded order when the same request
+is repeated. If nothing matches exactly, the next unserved response recorded for that
+operation is used, so time-windowed parameters (StartTime, startTime, ...) still replay.
+
+Environment (CLI flags override):
+    AWS_REPLAY_MODE           record | replay | off (default off)
+    AWS_REPLAY_FIXTURE        fixture path (default fixtures/<handler>.json.gz)
+    AWS_REPLAY_LATENCY        replay latency: 0, a number of ms, or "recorded" (default 0)
+    AWS_REPLAY_THROTTLE_RATE  fraction of replayed calls answered with a throttling error (default 0)
+    AWS_REPLAY_SEED           random seed for throttling and jitter (default 0)
+"""
+import os
+import io
+import re
+import sys
+import json
+import gzip
+import time
+import base64
+import random
+import hashlib
+import argparse
+import threading
+import importlib.util
+from datetime import date, datetime, timezone
+
+REPLAY_MODE = os.getenv("AWS_REPLAY_MODE", "off").lower()
+REPLAY_FIXTURE = os.getenv("AWS_REPLAY_FIXTURE", "")
+REPLAY_LATENCY = os.getenv("AWS_REPLAY_LATENCY", "0")
+REPLAY_THROTTLE_RATE = float(os.getenv("AWS_REPLAY_THROTTLE_RATE", "0"))
+REPLAY_SEED = int(os.getenv("AWS_REPLAY_SEED", "0"))
+
+ACCOUNT_ID = re.compile(r"(?<!\d)(?!0000)\d{12}(?!\d)")
+DROPPED_HEADERS = {"date", "content-length", "content-encoding", "transfer-encoding", "connection"}
+THROTTLE_RESPONSES = {
+    # protocol: (status, headers, body)
+    "json": (400, {"x-amzn-ErrorType": "ThrottlingException"},
+             '{"__type":"ThrottlingException","message":"Rate exceeded (simulated)"}'),
+    "rest-json": (429, {"x-amzn-ErrorType": "TooManyRequestsException"},
+                  '{"message":"Rate exceeded (simulated)"}'),
+    "query": (400, {}, "<ErrorResponse><Error><Type>Sender</Type><Code>Throttling</Code>"
+                       "<Message>Rate exceeded (simulated)</Message></Error><RequestId>replay</RequestId></ErrorResponse>"),
+    "ec2": (503, {}, "<Response><Errors><Error><Code>RequestLimitExceeded</Code>"
+                     "<Message>Request limit exceeded (simulated)</Message></Error></Errors><RequestID>replay</RequestID></Response>"),
+    "rest-xml": (503, {}, "<Error><Code>SlowDown</Code><Message>Reduce your request rate (simulated)</Message></Error>"),
+}
+
+_KEY = "aws_replay"
+
+
+class ReplayMiss(Exception):
+    """No recorded response is left for a request in replay mode."""
+
+
+# ------------------------------
+# Scrubbing and request keys
+# ------------------------------
+def scrub(text):
+    """Replace 12-digit account IDs with stable fakes (prefixed 0000, so they are never rescrubbed)."""
+    return ACCOUNT_ID.sub(lambda m: "0000" + str(int(hashlib.sha256(m.group(0).encode()).hexdigest(), 16))[:8], text)
+
+
+def _normalise(value):
+    if isinstance(value, (datetime, date)):
+        return "<time>"
+    if isinstance(value, bytes):
+        return hashlib.sha256(value).hexdigest()
+    if isinstance(value, dict):
+        return {k: _normalise(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalise(v) for v in value]
+    return value
+
+
+def request_key(service, operation, params):
+    payload = scrub(json.dumps(_normalise(params), sort_keys=True, default=str))
+    return f"{service}.{operation}:{hashlib.sha256(payload.encode()).hexdigest()[:20]}"
+
+
+# ------------------------------
+# Recorder / player
+# ------------------------------
+class Cassette:
+
+    def __init__(self, mode, path, latency=REPLAY_LATENCY, throttle_rate=REPLAY_THROTTLE_RATE, seed=REPLAY_SEED):
+        self.mode = mode
+        self.path = path
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.interactions = []
+        self.by_key = {}
+        self.by_operation = {}
+        self.stats = {"served": 0, "loose_matches": 0, "throttled": 0, "recorded": 0}
+        if mode == "replay":
+            self._load()
+
+    # -- fixture file
+    def _load(self):
+        with gzip.open(self.path, "rt", encoding="utf-8") as fh:
+            self.interactions = json.load(fh)["interactions"]
+        for index, item in enumerate(self.interactions):
+            self.by_key.setdefault(item["key"], []).append(index)
+            self.by_operation.setdefault(item["operation"], []).append(index)
+        self.served = set()
+        print(f"▶️ Replaying {len(self.interactions)} recorded responses from {self.path}")
+
+    def save(self):
+        if self.mode != "record":
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self.lock:
+            body = {"version": 1, "recorded_at": datetime.now(timezone.utc).isoformat(), "interactions": self.interactions}
+        with gzip.open(self.path, "wt", encoding="utf-8") as fh:
+            json.dump(body, fh, separators=(",", ":"))
+        print(f"💾 Recorded {len(self.interactions)} responses to {self.path}")
+
+    # -- botocore hooks
+    def before_parameter_build(self, params, model, context, **kwargs):
+        service = model.service_model.service_name
+        context[_KEY] = {
+            "key": request_key(service, model.name, params),
+            "operation": f"{service}.{model.name}",
+            "protocol": model.service_model.resolved_protocol,
+        }
+
+    def before_send(self, request, **kwargs):
+        info = request.context.get(_KEY)
+        if info is None:
+            return None
+        if self.mode == "record":
+            info["sent_at"] = time.perf_counter()
+            return None
+        return self._replay(info)
+
+    def response_received(self, context, response_dict=None, parsed_response=None, **kwargs):
+        info = context.get(_KEY)
+        if self.mode != "record" or info is None or response_dict is None:
+            return
+        error_code = (parsed_response or {}).get("Error", {}).get("Code", "")
+        if response_dict["status_code"] >= 500 or "Throttl" in error_code or error_code in ("RequestLimitExceeded", "SlowDown"):
+            return  # transient; the retry that follows is what the handler actually consumed
+        body = response_dict["body"] if isinstance(response_dict["body"], bytes) else b""
+        item = {
+            "key": info["key"],
+            "operation": info["operation"],
+            "status": response_dict["status_code"],
+            "headers": {k: scrub(v) for k, v in response_dict["headers"].items() if k.lower() not in DROPPED_HEADERS},
+            "latency_ms": round((time.perf_counter() - info.get("sent_at", time.perf_counter())) * 1000, 1),
+        }
+        try:
+            item["body"] = scrub(body.decode("utf-8"))
+        except UnicodeDecodeError:
+            item["body_b64"] = base64.b64encode(body).decode("ascii")
+        with self.lock:
+            self.interactions.append(item)
+            self.stats["recorded"] += 1
+
+    # -- replay
+    def _next(self, info):
+        with self.lock:
+            for index in self.by_key.get(info["key"], []):
+                if index not in self.served:
+                    self.served.add(index)
+                    return self.interactions[index]
+            for index in self.by_operation.get(info["operation"], []):
+                if index not in self.served:
+                    self.served.add(index)
+                    self.stats["loose_matches"] += 1
+                    return self.interactions[index]
+            # Exhausted: repeat the last response for this request (e.g. a polling loop that ran longer).
+            indexes = self.by_key.get(info["key"]) or self.by_operation.get(info["operation"])
+            if indexes:
+                return self.interactions[indexes[-1]]
+        raise ReplayMiss(f"No recorded response for {info['operation']} ({info['key']}) in {self.path}")
+
+    def _sleep(self, recorded_ms):
+        if self.latency == "recorded":
+            delay = recorded_ms
+        else:
+            delay = float(self.latency or 0)
+        if delay:
+            time.sleep(delay * self.random.uniform(0.8, 1.2) / 1000)
+
+    def _replay(self, info):
+        from botocore.awsrequest import AWSResponse
+        from urllib3.response import HTTPResponse
+
+        throttle = THROTTLE_RESPONSES.get(info["protocol"])
+        with self.lock:
+            throttled = throttle is not None and self.throttle_rate and self.random.random() < self.throttle_rate
+            if throttled:
+                self.stats["throttled"] += 1
+        if throttled:
+            status, headers, text = throttle
+            body = text.encode("utf-8")
+            self._sleep(0)
+        else:
+            item = self._next(info)
+            status, headers = item["status"], dict(item["headers"])
+            body = base64.b64decode(item["body_b64"]) if "body_b64" in item else item["body"].encode("utf-8")
+            self._sleep(item.get("latency_ms", 0))
+            with self.lock:
+                self.stats["served"] += 1
+        headers["content-length"] = str(len(body))
+        raw = HTTPResponse(body=io.BytesIO(body), headers=headers, status=status, preload_content=False)
+        return AWSResponse("https://replay.invalid/", status, headers, raw)
+
+    def register(self, events):
+        events.register("before-parameter-build.*.*", self.before_parameter_build, unique_id="aws-replay-params")
+        events.register_first("before-send.*.*", self.before_send, unique_id="aws-replay-send")
+        events.register("response-received.*.*", self.response_received, unique_id="aws-replay-received")
+
+
+def activate(mode, path, session=None, **options):
+    """Install record/replay hooks on a boto3 session (default session when omitted).
+
+    Call before the handler module creates its clients; clients copy the session's
+    event hooks when they are created.
+    """
+    import boto3
+
+    if mode == "replay":
+        # Requests are never sent, but botocore still signs them.
+        os.environ.setdefault("AWS_ACCESS_KEY_ID", "replay")
+        os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "replay")
+        os.environ.setdefault("AWS_DEFAULT_REGION", os.getenv("AWS_REGION", "us-east-1"))
+    cassette = Cassette(mode, path, **options)
+    if session is None:
+        if boto3.DEFAULT_SESSION is None:
+            boto3.setup_default_session()
+        session = boto3.DEFAULT_SESSION
+    cassette.register(session.events)
+    return cassette
+
+
+# ------------------------------
+# CLI: run a handler against a fixture
+# ------------------------------
+class _Context:
+    function_name = "aws-replay"
+    aws_request_id = "aws-replay"
+
+    def get_remaining_time_in_millis(self):
+        return 900000
+
+
+def run_handler(path, handler_name=None, event=None):
+    """Import a handler file (its directory and src/ go on sys.path for shared modules) and invoke it once."""
+    sys.path.extend([os.path.dirname(os.path.abspath(path)), os.path.dirname(os.path.abspath(__file__))])
+    spec = importlib.util.spec_from_file_location(os.path.splitext(os.path.basename(path))[0].replace("-", "_"), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    name = handler_name or next(n for n in ("lambda_handler", "script_handler") if hasattr(module, n))
+    return getattr(module, name)(event or {}, _Context())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record or replay AWS responses for one handler run.")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("handler_file")
+    parser.add_argument("--handler", help="function name (default lambda_handler / script_handler)")
+    parser.add_argument("--event", help="JSON event file")
+    parser.add_argument("--fixture", default=REPLAY_FIXTURE)
+    parser.add_argument("--latency", default=REPLAY_LATENCY, help='0, milliseconds, or "recorded"')
+    parser.add_argument("--throttle-rate", type=float, default=REPLAY_THROTTLE_RATE)
+    parser.add_argument("--seed", type=int, default=REPLAY_SEED)
+    args = parser.parse_args()
+
+    fixture = args.fixture or os.path.join("fixtures", os.path.splitext(os.path.basename(args.handler_file))[0] + ".json.gz")
+    event = {}
+    if args.event:
+        with open(args.event) as fh:
+            event = json.load(fh)
+
+    cassette = activate(args.mode, fixture, latency=args.latency, throttle_rate=args.throttle_rate, seed=args.seed)
+    started = time.perf_counter()
+    try:
+        result = run_handler(args.handler_file, args.handler, event)
+        print(json.dumps(result, default=str)[:2000])
+    finally:
+        cassette.save()
+        print(f"⏱️ {args.mode} run took {time.perf_counter() - started:.2f}s {json.dumps(cassette.stats)}")
+
+
+if __name__ == "__main__":
+    # Drop src/ from the front of sys.path: src/email.py would shadow the stdlib package botocore needs.
+    # run_handler() appends the handler's own directory instead.
+    _here = os.path.dirname(os.path.abspath(__file__))
+    sys.path[:] = [p for p in sys.path if os.path.abspath(p or ".") != _here]
+    main()
@@ -1,10 +1,25 @@
 import boto3
 import os
+import json
 import time
 import logging
 import traceback
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 
+try:
+    from api_metrics import instrumented
+except ImportError:  # inline / single-file deployment: no API call metrics
+    def instrumented(handler):
+        return handler
+try:
+    from profiling import profiled, stage
+except ImportError:  # inline / single-file deployment: profiling stays off
+    def profiled(handler):
+        return handler
+    from contextlib import nullcontext as stage
+
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
 
@@ -19,6 +34,145 @@ RETENTION_DAYS = 7
 RESOURCE_TYPES = ["RDS", "DynamoDB", "Aurora"]  # Add other resource types as needed
 STATES = ["FAILED", "ABORTED", "EXPIRED"]  # Filter states
 
+# Regions to collect from: comma-separated list, "ALL" for every enabled region, empty for AWS_REGION only
+BACKUP_REGIONS = os.getenv("BACKUP_REGIONS", "").strip()
+MAX_REGION_WORKERS = int(os.getenv("MAX_REGION_WORKERS", "8"))
+
+# Structured output
+EMIT_EMF_METRICS = os.getenv("EMIT_EMF_METRICS", "false").strip().lower() in ("1", "true", "yes")
+EMF_NAMESPACE = os.getenv("EMF_NAMESPACE", "HCOPS/Backup")
+MAX_BATCH_EVENTS = 10000          # put_log_events hard limit
+MAX_BATCH_BYTES = 1048576         # put_log_events hard limit (includes 26 bytes per event)
+
+
+def _add_emf_header(request, **kwargs):
+    # CloudWatch only extracts EMF metrics from put_log_events when this header is present
+    request.headers["x-amzn-logs-format"] = "json/emf"
+
+
+if EMIT_EMF_METRICS:
+    cloudwatch_logs.meta.events.register("before-sign.logs.PutLogEvents", _add_emf_header)
+
+
+# Cached per-region clients, shared across threads and warm invocations
+_client_pool = {}
+_client_pool_lock = threading.Lock()
+
+
+def get_backup_client(client_region):
+    with _client_pool_lock:
+        if client_region not in _client_pool:
+            _client_pool[client_region] = (
+                backup_client if client_region == region
+                else boto3.client("backup", region_name=client_region)
+            )
+        return _client_pool[client_region]
+
+
+def resolve_regions():
+    if not BACKUP_REGIONS:
+        return [region]
+    if BACKUP_REGIONS.upper() == "ALL":
+        ec2 = boto3.client("ec2", region_name=region)
+        return sorted(r["RegionName"] for r in ec2.describe_regions()["Regions"])
+    return [r.strip() for r in BACKUP_REGIONS.split(",") if r.strip()]
+
+
+def build_job_event(job, resource_type, job_region=None):
+    """Return the structured (JSON) log record for one backup job."""
+    return {
+        "event_type": "backup_job",
+        "account_id": job.get("AccountId", "N/A"),
+        "resource_name": job.get("ResourceName", "N/A"),
+        "resource_id": job.get("ResourceArn", "N/A").split(":")[-1],
+        "resource_arn": job.get("ResourceArn", "N/A"),
+        "status": job.get("State", "N/A"),
+        "job_id": job.get("BackupJobId", "N/A"),
+        "resource_type": resource_type,
+        "message": job.get("StatusMessage", "N/A"),
+        "creation_date": str(job.get("CreationDate", "")),
+        "region": job_region or region,
+    }
+
+
+def build_emf_event(resource_type, counts, job_region=None):
+    """Return an Embedded Metric Format record with per-state job counts for a resource type."""
+    metric_names = {state: f"{state.capitalize()}Jobs" for state in STATES}
+    record = {
+        "_aws": {
+            "Timestamp": int(round(time.time() * 1000)),
+            "CloudWatchMetrics": [
+                {
+                    "Namespace": EMF_NAMESPACE,
+                    "Dimensions": [["ResourceType", "Region"]],
+                    "Metrics": [{"Name": name, "Unit": "Count"} for name in metric_names.values()],
+                }
+            ],
+        },
+        "event_type": "backup_job_metrics",
+        "ResourceType": resource_type,
+        "Region": job_region or region,
+    }
+    for state, name in metric_names.items():
+        record[name] = counts.get(state, 0)
+    return record
+
+
+def put_log_events_batched(log_stream_name, messages):
+    """Send messages to CloudWatch Logs in as few put_log_events calls as the API limits allow."""
+    timestamp = int(round(time.time() * 1000))
+    batch, batch_bytes = [], 0
+    for message in messages:
+        event_bytes = len(message.encode("utf-8")) + 26
+        if batch and (len(batch) >= MAX_BATCH_EVENTS or batch_bytes + event_bytes > MAX_BATCH_BYTES):
+            cloudwatch_logs.put_log_events(
+                logGroupName=LOG_GROUP_NAME, logStreamName=log_stream_name, logEvents=batch
+            )
+            batch, batch_bytes = [], 0
+        batch.append({"timestamp": timestamp, "message": message})
+        batch_bytes += event_bytes
+    if batch:
+        cloudwatch_logs.put_log_events(
+            logGroupName=LOG_GROUP_NAME, logStreamName=log_stream_name, logEvents=batch
+        )
+
+
+def collect_region_jobs(job_region, start_time):
+    """Run the backup-job paginators for one region and return its JSON log lines."""
+    messages = []
+    paginator = get_backup_client(job_region).get_paginator("list_backup_jobs")
+
+    # Iterate through each resource type
+    for resource_type in RESOURCE_TYPES:
+        counts = {}
+        # Iterate through each state
+        for state in STATES:
+            pages = paginator.paginate(
+                ByAccountId="*",
+                ByState=state,
+                ByResourceType=resource_type,
+                ByCreatedAfter=start_time,  # Filter jobs created today
+            )
+
+            # Process each job
+            for page in pages:
+                for job in page.get("BackupJobs", []):
+                    job_event = build_job_event(job, resource_type, job_region)
+                    counts[state] = counts.get(state, 0) + 1
+
+                    # One JSON object per line so Logs Insights discovers the fields natively
+                    log_message = json.dumps(job_event, separators=(",", ":"))
+                    logging.info(f"Logging job status: {log_message}")
+                    messages.append(log_message)
+
+        if EMIT_EMF_METRICS:
+            messages.append(json.dumps(build_emf_event(resource_type, counts, job_region), separators=(",", ":")))
+
+    return messages
+
+
+@instrumented
+@profiled
 def script_handler(event, context):
     global region
     try:
@@ -41,47 +195,20 @@ def script_handler(event, context):
         # Filter for today's date
         start_time = datetime.utcnow() - timedelta(days=14)
 
-        # Iterate through each resource type
-        for resource_type in RESOURCE_TYPES:
-            # Iterate through each state
-            for state in STATES:
-                response = backup_client.list_backup_jobs(
-                    ByAccountId="*",
-                    ByState=state,
-                    ByResourceType=resource_type,
-                    ByCreatedAfter=start_time,  # Filter jobs created today
-                )
-
-                # Process each job
-                for job in response.get("BackupJobs", []):
-                    # Extract job details
-                    account_id = job.get("AccountId", "N/A")
-                    resource_name = job.get("ResourceName", "N/A")
-                    resource_id = job.get("ResourceArn", "N/A").split(":")[-1]
-                    status = job.get("State", "N/A")
-                    job_id = job.get("BackupJobId", "N/A")
-                    message = job.get("StatusMessage", "N/A")
-                    
-                    # Add resource_name and resource_id in log message
-                    log_message = (
-                        f"account id: {account_id}, Resource Name: {resource_name}, "
-                        f"Resource ID: {resource_id}, Status: {status}, "
-                        f"Job ID: {job_id}, Resource Type: {resource_type}, "
-                        f"Message: {message}, Region: {region}"
-                    )
-
-                    logging.info(f"Logging job status: {log_message}")
+        # Collect every region concurrently; latency is bounded by the slowest region
+        regions = resolve_regions()
+        messages = []
+        with stage("inventory"), ThreadPoolExecutor(max_workers=max(1, min(MAX_REGION_WORKERS, len(regions)))) as exe:
+            futs = {exe.submit(collect_region_jobs, r, start_time): r for r in regions}
+            for fut in as_completed(futs):
+                try:
+                    messages.extend(fut.result())
+                except Exception as e:
+                    logging.error(f"Region {futs[fut]} collection failed: {str(e)}")
 
-                    # Log to CloudWatch
-                    log_event = {
-                        "timestamp": int(round(time.time() * 1000)),
-                        "message": log_message,
-                    }
-                    cloudwatch_logs.put_log_events(
-                        logGroupName=LOG_GROUP_NAME,
-                        logStreamName=log_stream_name,
-                        logEvents=[log_event],
-                    )
+        # Log to CloudWatch in a single buffered write
+        with stage("submit"):
+            put_log_events_batched(log_stream_name, messages)
 
     except Exception as e:
         logging.error(
@@ -1,5 +1,11 @@
 import boto3
+try:
+    from profiling import profiled
+except ImportError:  # inline / single-file deployment: profiling stays off
+    def profiled(handler):
+        return handler
 
+@profiled
 def script_handler(event, context):
     # Initialize the AWS Backup client
     client = boto3.client('backup')
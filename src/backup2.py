@@ -4,6 +4,17 @@ import time
 import logging
 import traceback
 
+try:
+    from api_metrics import instrumented
+except ImportError:  # inline / single-file deployment: no API call metrics
+    def instrumented(handler):
+        return handler
+try:
+    from profiling import profiled
+except ImportError:  # inline / single-file deployment: profiling stays off
+    def profiled(handler):
+        return handler
+
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
 
@@ -17,12 +28,20 @@ LOG_GROUP_NAME = "/HCOPS/AWS/SSM/EC2-ORR"
 RETENTION_DAYS = 7
 
 
+FILTER_ID_LIMIT = 100  # Use a db-instance-id filter up to this many IDs; otherwise page the whole inventory
+MAX_BATCH_EVENTS = 10000          # put_log_events hard limit
+MAX_BATCH_BYTES = 1048576         # put_log_events hard limit (includes 26 bytes per event)
+
+
 def fetch_support_team(db_instance):
     """Fetch the Support-Team tag for the given DB instance."""
     try:
-        db_instance_arn = db_instance["DBInstanceArn"]
-        tags_response = rds_client.list_tags_for_resource(ResourceName=db_instance_arn)
-        tags_list = tags_response.get("TagList", [])
+        # describe_db_instances already returns TagList; only call the API when it is missing
+        tags_list = db_instance.get("TagList")
+        if tags_list is None:
+            db_instance_arn = db_instance["DBInstanceArn"]
+            tags_response = rds_client.list_tags_for_resource(ResourceName=db_instance_arn)
+            tags_list = tags_response.get("TagList", [])
         
         # Extract the Support-Team tag
         support_team = next((tag["Value"] for tag in tags_list if tag["Key"] == "Support-Team"), "N/A")
@@ -32,6 +51,44 @@ def fetch_support_team(db_instance):
         return "N/A"
 
 
+def describe_db_instances_bulk(resource_ids):
+    """Return {requested ID: db_instance} using paginated calls; IDs may be identifiers or ARNs."""
+    wanted = set(resource_ids)
+    paginator = rds_client.get_paginator("describe_db_instances")
+    if len(wanted) <= FILTER_ID_LIMIT:
+        pages = paginator.paginate(Filters=[{"Name": "db-instance-id", "Values": sorted(wanted)}])
+    else:
+        pages = paginator.paginate()
+
+    found = {}
+    for page in pages:
+        for db_instance in page.get("DBInstances", []):
+            for key in (db_instance["DBInstanceIdentifier"], db_instance["DBInstanceArn"]):
+                if key in wanted:
+                    found[key] = db_instance
+    return found
+
+
+def put_log_events_batched(log_stream_name, log_events):
+    """Send events to CloudWatch Logs in as few put_log_events calls as the API limits allow."""
+    batch, batch_bytes = [], 0
+    for log_event in log_events:
+        event_bytes = len(log_event["message"].encode("utf-8")) + 26
+        if batch and (len(batch) >= MAX_BATCH_EVENTS or batch_bytes + event_bytes > MAX_BATCH_BYTES):
+            cloudwatch_logs.put_log_events(
+                logGroupName=LOG_GROUP_NAME, logStreamName=log_stream_name, logEvents=batch
+            )
+            batch, batch_bytes = [], 0
+        batch.append(log_event)
+        batch_bytes += event_bytes
+    if batch:
+        cloudwatch_logs.put_log_events(
+            logGroupName=LOG_GROUP_NAME, logStreamName=log_stream_name, logEvents=batch
+        )
+
+
+@instrumented
+@profiled
 def script_handler(event, context):
     try:
         # Define log stream with a timestamp
@@ -52,11 +109,15 @@ def script_handler(event, context):
 
         # Retrieve resource IDs from the event
         resource_ids = event.get("RDSIDs", [])  # Replace with actual input key
+        db_instances = describe_db_instances_bulk(resource_ids) if resource_ids else {}
+
+        log_events = []
         for resource_id in resource_ids:
             try:
-                # Describe the DB instance to get its details
-                response = rds_client.describe_db_instances(DBInstanceIdentifier=resource_id)
-                db_instance = response["DBInstances"][0]
+                db_instance = db_instances.get(resource_id)
+                if db_instance is None:
+                    logging.error(f"Error processing resource {resource_id}: DB instance not found")
+                    continue
 
                 # Fetch the Support-Team tag
                 support_team = fetch_support_team(db_instance)
@@ -68,20 +129,17 @@ def script_handler(event, context):
                 )
                 logging.info(log_message)
 
-                # Log to CloudWatch
-                log_event = {
+                log_events.append({
                     "timestamp": int(round(time.time() * 1000)),
                     "message": log_message,
-                }
-                cloudwatch_logs.put_log_events(
-                    logGroupName=LOG_GROUP_NAME,
-                    logStreamName=log_stream_name,
-                    logEvents=[log_event],
-                )
+                })
 
             except Exception as db_error:
                 logging.error(f"Error processing resource {resource_id}: {str(db_error)}")
 
+        # Log to CloudWatch in as few buffered writes as the count and 1 MB limits allow
+        put_log_events_batched(log_stream_name, log_events)
+
     except Exception as e:
         logging.error(
             f"An error occurred while processing resources: {str(e)}\n{traceback.format_exc()}"
@@ -0,0 +1,298 @@
+import boto3
+import os
+import json
+import sqlite3
+import logging
+import traceback
+from datetime import datetime, timedelta, timezone
+from botocore.exceptions import ClientError
+
+try:
+    from api_metrics import instrumented
+except ImportError:  # inline / single-file deployment: no API call metrics
+    def instrumented(handler):
+        return handler
+try:
+    from profiling import profiled
+except ImportError:  # inline / single-file deployment: profiling stays off
+    def profiled(handler):
+        return handler
+
+# Initialize logging
+logging.basicConfig(level=logging.INFO)
+
+# AWS region and clients
+region = os.environ["AWS_REGION"]
+backup_client = boto3.client("backup", region_name=region)
+s3_client = boto3.client("s3", region_name=region)
+
+# Constants
+DB_PATH = os.getenv("BACKUP_HISTORY_DB", "/tmp/backup-history.sqlite3")
+S3_BUCKET = os.getenv("BACKUP_HISTORY_BUCKET", "")       # empty = local store only
+S3_KEY = os.getenv("BACKUP_HISTORY_KEY", f"backup-history/{region}/backup-history.sqlite3")
+INITIAL_LOOKBACK_DAYS = int(os.getenv("INITIAL_LOOKBACK_DAYS", "14"))
+# Jobs still running at the last sync can change state; re-read this much behind the watermark
+WATERMARK_OVERLAP_HOURS = int(os.getenv("WATERMARK_OVERLAP_HOURS", "24"))
+FAILED_STATES = ("FAILED", "ABORTED", "EXPIRED")
+# Conditional puts that lose to an overlapping run are merged and retried this many times
+S3_SAVE_ATTEMPTS = int(os.getenv("BACKUP_HISTORY_SAVE_ATTEMPTS", "3"))
+CONDITION_FAILED = ("PreconditionFailed", "ConditionalRequestConflict")
+
+# ETag of the S3 copy each local store was last read from or written to (survives warm starts)
+_etags = {}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS backup_jobs (
+    job_id          TEXT PRIMARY KEY,
+    account_id      TEXT,
+    region          TEXT,
+    resource_arn    TEXT,
+    resource_name   TEXT,
+    resource_type   TEXT,
+    state           TEXT,
+    status_message  TEXT,
+    creation_date   TEXT,
+    completion_date TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_resource ON backup_jobs (resource_arn, creation_date);
+CREATE INDEX IF NOT EXISTS idx_jobs_created ON backup_jobs (creation_date);
+"""
+
+
+def _iso(value):
+    return value.astimezone(timezone.utc).isoformat() if isinstance(value, datetime) else value
+
+
+def _download_store(path):
+    """Copy the S3 store to path and return its ETag."""
+    response = s3_client.get_object(Bucket=S3_BUCKET, Key=S3_KEY)
+    with open(path, "wb") as fh:
+        for chunk in response["Body"].iter_chunks():
+            fh.write(chunk)
+    return response["ETag"]
+
+
+def open_store(path=DB_PATH):
+    """Open (and create if needed) the local history store, pulling the S3 copy first when configured."""
+    if S3_BUCKET and not os.path.exists(path):
+        try:
+            _etags[path] = _download_store(path)
+        except Exception as e:
+            logging.info(f"No history copy downloaded from s3://{S3_BUCKET}/{S3_KEY}: {str(e)}")
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def merge_remote_store(conn, path=DB_PATH):
+    """
+    Fold the newer S3 copy written by an overlapping run into the local store: jobs only it
+    has are added, and a job it saw finish replaces our still-running row.
+    """
+    remote_path = path + ".remote"
+    etag = _download_store(remote_path)
+    conn.execute("ATTACH DATABASE ? AS remote", (remote_path,))
+    try:
+        conn.execute(
+            """
+            INSERT INTO backup_jobs SELECT * FROM remote.backup_jobs WHERE true
+            ON CONFLICT(job_id) DO UPDATE SET
+                state = excluded.state,
+                status_message = excluded.status_message,
+                completion_date = excluded.completion_date
+            WHERE backup_jobs.completion_date IS NULL AND excluded.completion_date IS NOT NULL
+            """
+        )
+        conn.commit()
+    finally:
+        conn.execute("DETACH DATABASE remote")
+        os.remove(remote_path)
+    _etags[path] = etag
+
+
+def save_store(conn, path=DB_PATH):
+    """
+    Commit and upload the store with a conditional put (If-Match the copy we started from, or
+    If-None-Match when there was none), so overlapping runs cannot overwrite each other's
+    upserts: the loser merges the winner's copy and retries. Upload failures are logged and
+    reported as False; the next run re-syncs from the watermark.
+    """
+    conn.commit()
+    if not S3_BUCKET:
+        return True
+    for attempt in range(S3_SAVE_ATTEMPTS):
+        etag = _etags.get(path)
+        condition = {"IfMatch": etag} if etag else {"IfNoneMatch": "*"}
+        try:
+            with open(path, "rb") as fh:
+                response = s3_client.put_object(Bucket=S3_BUCKET, Key=S3_KEY, Body=fh, **condition)
+            _etags[path] = response["ETag"]
+            return True
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in CONDITION_FAILED:
+                logging.error(f"History store not uploaded to s3://{S3_BUCKET}/{S3_KEY}: {str(e)}")
+                return False
+            logging.info(f"History store changed in S3 since it was read; merging (attempt {attempt + 1})")
+            try:
+                merge_remote_store(conn, path)
+            except Exception as merge_error:
+                logging.error(f"Could not merge the S3 history store: {str(merge_error)}")
+                return False
+        except Exception as e:
+            logging.error(f"History store not uploaded to s3://{S3_BUCKET}/{S3_KEY}: {str(e)}")
+            return False
+    logging.error(f"History store not uploaded after {S3_SAVE_ATTEMPTS} conflicting attempts")
+    return False
+
+
+def get_watermark(conn):
+    row = conn.execute("SELECT MAX(creation_date) FROM backup_jobs").fetchone()
+    if row and row[0]:
+        return datetime.fromisoformat(row[0]) - timedelta(hours=WATERMARK_OVERLAP_HOURS)
+    return datetime.now(timezone.utc) - timedelta(days=INITIAL_LOOKBACK_DAYS)
+
+
+def upsert_jobs(conn, jobs, job_region=None):
+    rows = [
+        (
+            job["BackupJobId"],
+            job.get("AccountId"),
+            job_region or region,
+            job.get("ResourceArn"),
+            job.get("ResourceName"),
+            job.get("ResourceType"),
+            job.get("State"),
+            job.get("StatusMessage"),
+            _iso(job.get("CreationDate")),
+            _iso(job.get("CompletionDate")),
+        )
+        for job in jobs
+    ]
+    conn.executemany(
+        """
+        INSERT INTO backup_jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(job_id) DO UPDATE SET
+            state = excluded.state,
+            status_message = excluded.status_message,
+            completion_date = excluded.completion_date
+        """,
+        rows,
+    )
+    return len(rows)
+
+
+def sync_jobs(conn):
+    """Fetch only jobs created since the watermark (all states) and upsert them by BackupJobId."""
+    created_after = get_watermark(conn)
+    paginator = backup_client.get_paginator("list_backup_jobs")
+    count = 0
+    for page in paginator.paginate(ByAccountId="*", ByCreatedAfter=created_after):
+        count += upsert_jobs(conn, page.get("BackupJobs", []))
+    logging.info(f"Synced {count} backup jobs created after {created_after.isoformat()}")
+    return count
+
+
+# -------------------- Reports --------------------
+def failure_rate(conn, since):
+    """Failure rate per (resource_type, account_id) for jobs created since `since`."""
+    placeholders = ",".join("?" for _ in FAILED_STATES)
+    cur = conn.execute(
+        f"""
+        SELECT resource_type, account_id, COUNT(*) AS total,
+               SUM(CASE WHEN state IN ({placeholders}) THEN 1 ELSE 0 END) AS failed
+        FROM backup_jobs
+        WHERE creation_date >= ?
+        GROUP BY resource_type, account_id
+        ORDER BY resource_type, account_id
+        """,
+        (*FAILED_STATES, _iso(since)),
+    )
+    return [
+        {
+            "resource_type": resource_type,
+            "account_id": account_id,
+            "total": total,
+            "failed": failed,
+            "failure_rate": round(failed / total, 4) if total else 0.0,
+        }
+        for resource_type, account_id, total, failed in cur
+    ]
+
+
+def _jobs_by_resource(conn, since):
+    cur = conn.execute(
+        """
+        SELECT resource_arn, resource_name, state, creation_date, completion_date
+        FROM backup_jobs
+        WHERE creation_date >= ?
+        ORDER BY resource_arn, creation_date
+        """,
+        (_iso(since),),
+    )
+    jobs = {}
+    for resource_arn, resource_name, state, created, completed in cur:
+        jobs.setdefault(resource_arn, []).append((resource_name, state, created, completed))
+    return jobs
+
+
+def consecutive_failures(conn, since, minimum=2):
+    """Resources whose most recent finished jobs failed `minimum` or more times in a row."""
+    out = []
+    for resource_arn, jobs in _jobs_by_resource(conn, since).items():
+        streak = 0
+        for _, state, _, _ in reversed(jobs):
+            if state in FAILED_STATES:
+                streak += 1
+            elif state == "COMPLETED":
+                break
+        if streak >= minimum:
+            out.append({"resource_arn": resource_arn, "resource_name": jobs[-1][0], "consecutive_failures": streak})
+    return sorted(out, key=lambda r: r["consecutive_failures"], reverse=True)
+
+
+def time_to_success(conn, since):
+    """Hours from the first failure in a failure run to the next COMPLETED job, per resource."""
+    out = []
+    for resource_arn, jobs in _jobs_by_resource(conn, since).items():
+        first_failure = None
+        for resource_name, state, created, completed in jobs:
+            if state in FAILED_STATES and first_failure is None:
+                first_failure = created
+            elif state == "COMPLETED" and first_failure is not None:
+                delta = datetime.fromisoformat(completed or created) - datetime.fromisoformat(first_failure)
+                out.append({
+                    "resource_arn": resource_arn,
+                    "resource_name": resource_name,
+                    "failed_at": first_failure,
+                    "recovered_at": completed or created,
+                    "hours_to_success": round(delta.total_seconds() / 3600, 2),
+                })
+                first_failure = None
+    return out
+
+
+@instrumented
+@profiled
+def script_handler(event, context):
+    try:
+        conn = open_store()
+        synced = sync_jobs(conn)
+        saved = save_store(conn)
+
+        since = datetime.now(timezone.utc) - timedelta(days=int(event.get("report_days", 7)))
+        report = {
+            "synced": synced,
+            "saved": saved,
+            "failure_rate": failure_rate(conn, since),
+            "consecutive_failures": consecutive_failures(conn, since),
+            "time_to_success": time_to_success(conn, since),
+        }
+        conn.close()
+        logging.info(json.dumps(report, default=str))
+        return report
+
+    except Exception as e:
+        logging.error(
+            f"An error occurred while syncing backup job history: {str(e)}\n{traceback.format_exc()}"
+        )
+        raise
@@ -1,10 +1,12 @@
-import boto3
 import json
 from datetime import datetime, timezone
+from lazy_clients import LazyClient
+from api_metrics import instrumented
+from profiling import profiled
 
-config = boto3.client('config')
-ec2 = boto3.client('ec2')
-cloudwatch = boto3.client('cloudwatch')
+config = LazyClient('config')
+ec2 = LazyClient('ec2')
+cloudwatch = LazyClient('cloudwatch')
 
 def check_metric_exists(instance_id):
     try:
@@ -20,6 +22,8 @@ def check_metric_exists(instance_id):
         print(f"⚠️ Error checking metric for {instance_id}: {e}")
         return False
 
+@instrumented
+@profiled
 def lambda_handler(event, context):
     result_token = event.get('resultToken', 'TESTMODE')
     evaluations = []
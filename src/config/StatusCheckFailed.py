@@ -1,10 +1,14 @@
-import boto3
 from datetime import datetime, timezone
+from lazy_clients import LazyClient
+from api_metrics import instrumented
+from profiling import profiled
 
-config = boto3.client('config')
-ec2 = boto3.client('ec2')
-cloudwatch = boto3.client('cloudwatch')
+config = LazyClient('config')
+ec2 = LazyClient('ec2')
+cloudwatch = LazyClient('cloudwatch')
 
+@instrumented
+@profiled
 def lambda_handler(event, context):
     result_token = event.get('resultToken', 'TESTMODE')
     evaluations = []
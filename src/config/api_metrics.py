@@ -0,0 +1,252 @@
+"""
+AWS API call accounting for the Lambda/SSM handlers.
+
+Hooks botocore's before-call / after-call / needs-retry events and aggregates, per
+service operation, the number of calls, p50/p95 latency, retries, throttles and
+errors. Mark a handler with one decorator:
+
+    from api_metrics import instrumented
+
+    @instrumented
+    def lambda_handler(event, context):
+        ...
+
+At handler exit one Embedded Metric Format record per operation is printed to stdout
+(picked up by CloudWatch Logs from Lambda) and a compact summary is logged. summary()
+returns the same numbers as a dict for local runs and tests.
+
+Like profiling.py, this file ships next to the Config rule handlers in src/config and is
+symlinked into src/, src/OMBASR and src/config/security-hub. The src/ scripts that can
+run inline in SSM import it behind try/except ImportError with a pass-through decorator.
+
+The hooks are off unless API_METRICS_ENABLED=true, because every operation seen becomes
+a billed CloudWatch custom metric; turn it on for the functions being investigated.
+
+Environment:
+    API_METRICS_ENABLED    true/false (default false) - turn the hooks on
+    API_METRICS_EMF        true/false (default true) - print EMF records at handler exit
+    API_METRICS_NAMESPACE  CloudWatch namespace (default HCOps/AwsApiCalls)
+"""
+import os
+import sys
+import json
+import time
+import threading
+import functools
+
+import boto3
+from botocore.client import BaseClient
+
+METRICS_ENABLED = os.getenv('API_METRICS_ENABLED', 'false').lower() == 'true'
+EMF_ENABLED = os.getenv('API_METRICS_EMF', 'true').lower() == 'true'
+EMF_NAMESPACE = os.getenv('API_METRICS_NAMESPACE', 'HCOps/AwsApiCalls')
+
+THROTTLE_CODES = {
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestThrottledException',
+    'TooManyRequestsException', 'ProvisionedThroughputExceededException', 'RequestLimitExceeded',
+    'SlowDown', 'RequestThrottled', 'PriorRequestNotComplete', 'LimitExceededException',
+}
+
+_START_KEY = 'api_metrics_start'
+_lock = threading.Lock()
+_stats = {}
+
+
+# ------------------------------
+# Aggregation
+# ------------------------------
+def _entry(service, operation):
+    key = (service, operation)
+    entry = _stats.get(key)
+    if entry is None:
+        entry = _stats[key] = {'calls': 0, 'latencies': [], 'retries': 0, 'throttles': 0, 'errors': 0}
+    return entry
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def reset():
+    """Drop everything collected so far (called at the start of each invocation)."""
+    with _lock:
+        _stats.clear()
+
+
+def summary():
+    """Return {'service.Operation': {calls, p50_ms, p95_ms, retries, throttles, errors}}."""
+    with _lock:
+        return {
+            f"{service}.{operation}": {
+                'calls': entry['calls'],
+                'p50_ms': round(_percentile(entry['latencies'], 50), 2),
+                'p95_ms': round(_percentile(entry['latencies'], 95), 2),
+                'retries': entry['retries'],
+                'throttles': entry['throttles'],
+                'errors': entry['errors'],
+            }
+            for (service, operation), entry in sorted(_stats.items())
+        }
+
+
+# ------------------------------
+# botocore event handlers
+# ------------------------------
+def _service_name(model):
+    return model.service_model.service_name
+
+
+def _before_call(model, context, **kwargs):
+    context[_START_KEY] = (_service_name(model), model.name, time.perf_counter())
+
+
+def _record(context, parsed=None, failed=False):
+    started = context.pop(_START_KEY, None)
+    if started is None:
+        return
+    service, operation, start = started
+    parsed = parsed if isinstance(parsed, dict) else {}
+    with _lock:
+        entry = _entry(service, operation)
+        entry['calls'] += 1
+        entry['latencies'].append((time.perf_counter() - start) * 1000)
+        entry['retries'] += parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+        if failed or parsed.get('Error', {}).get('Code'):
+            entry['errors'] += 1
+
+
+def _after_call(context, parsed=None, **kwargs):
+    _record(context, parsed=parsed)
+
+
+def _after_call_error(context, **kwargs):
+    # Connection/timeout failures after botocore gave up retrying; no model is passed here.
+    _record(context, failed=True)
+
+
+def _needs_retry(response=None, operation=None, **kwargs):
+    # Called after every attempt; only look, never decide (return None).
+    if not response or operation is None:
+        return None
+    code = (response[1] or {}).get('Error', {}).get('Code')
+    if code in THROTTLE_CODES:
+        with _lock:
+            _entry(_service_name(operation), operation.name)['throttles'] += 1
+    return None
+
+
+def _register(events):
+    # First, so the timer starts even when another before-call handler short-circuits the request.
+    events.register_first('before-call.*.*', _before_call, unique_id='api-metrics-before-call')
+    events.register('after-call.*.*', _after_call, unique_id='api-metrics-after-call')
+    events.register('after-call-error.*.*', _after_call_error, unique_id='api-metrics-after-call-error')
+    events.register('needs-retry.*.*', _needs_retry, unique_id='api-metrics-needs-retry')
+
+
+def instrument_client(client):
+    """Attach the hooks to an already-created client (idempotent)."""
+    if METRICS_ENABLED:
+        _register(client.meta.events)
+    return client
+
+
+def instrument_session(session=None):
+    """Attach the hooks to a boto3 session so clients created from it afterwards are counted."""
+    if METRICS_ENABLED:
+        session = session or boto3._get_default_session()
+        _register(session.events)
+    return session
+
+
+def _instrument_module_clients(module_name):
+    # Most handlers create their clients at import time, before the decorator runs,
+    # and clients copy the session's event emitter on creation.
+    # LazyClient (lazy_clients.py) builds its client on first use; hook it when that happens.
+    module = sys.modules.get(module_name)
+    for value in list(vars(module).values()) if module else []:
+        if isinstance(value, BaseClient):
+            instrument_client(value)
+        elif callable(getattr(type(value), 'when_created', None)):
+            value.when_created(instrument_client)
+
+
+# ------------------------------
+# Output
+# ------------------------------
+def build_emf_records(function_name=None):
+    """Return one EMF record per service operation seen in this invocation."""
+    timestamp = int(round(time.time() * 1000))
+    dimensions = ['Service', 'Operation'] + (['FunctionName'] if function_name else [])
+    records = []
+    for name, stats in summary().items():
+        service, operation = name.split('.', 1)
+        record = {
+            '_aws': {
+                'Timestamp': timestamp,
+                'CloudWatchMetrics': [{
+                    'Namespace': EMF_NAMESPACE,
+                    'Dimensions': [dimensions],
+                    'Metrics': [
+                        {'Name': 'Calls', 'Unit': 'Count'},
+                        {'Name': 'LatencyP50', 'Unit': 'Milliseconds'},
+                        {'Name': 'LatencyP95', 'Unit': 'Milliseconds'},
+                        {'Name': 'Retries', 'Unit': 'Count'},
+                        {'Name': 'Throttles', 'Unit': 'Count'},
+                        {'Name': 'Errors', 'Unit': 'Count'},
+                    ],
+                }],
+            },
+            'Service': service,
+            'Operation': operation,
+            'Calls': stats['calls'],
+            'LatencyP50': stats['p50_ms'],
+            'LatencyP95': stats['p95_ms'],
+            'Retries': stats['retries'],
+            'Throttles': stats['throttles'],
+            'Errors': stats['errors'],
+        }
+        if function_name:
+            record['FunctionName'] = function_name
+        records.append(record)
+    return records
+
+
+def flush(function_name=None):
+    """Print the EMF records and a one-line summary for this invocation."""
+    stats = summary()
+    if EMF_ENABLED:
+        for record in build_emf_records(function_name):
+            print(json.dumps(record))
+    total = sum(s['calls'] for s in stats.values())
+    throttles = sum(s['throttles'] for s in stats.values())
+    print(f"📊 AWS API calls: {total} across {len(stats)} operations, {throttles} throttled")
+    for name, s in sorted(stats.items(), key=lambda kv: -kv[1]['calls']):
+        print(f"   {name}: {s['calls']} calls, p50 {s['p50_ms']}ms, p95 {s['p95_ms']}ms, "
+              f"{s['retries']} retries, {s['throttles']} throttles, {s['errors']} errors")
+    return stats
+
+
+def instrumented(handler):
+    """Decorator: count AWS API calls made during each invocation and emit them on exit."""
+    if not METRICS_ENABLED:
+        return handler
+
+    instrument_session()
+    _instrument_module_clients(handler.__module__)
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        reset()
+        try:
+            return handler(event, context)
+        finally:
+            try:
+                flush(getattr(context, 'function_name', None))
+            except Exception as e:
+                print(f"⚠️ Could not emit API call metrics: {e}")
+
+    return wrapper
@@ -1,26 +1,74 @@
+import os
 import boto3
-from datetime import datetime, timezone
+from fnmatch import fnmatch
+from datetime import datetime, timezone, timedelta
+from api_metrics import instrumented
+from profiling import profiled
 
 # AWS clients
 config = boto3.client('config')
 ec2 = boto3.client('ec2')
 backup = boto3.client('backup')
 
+# 0 disables the staleness check; otherwise the last backup must be newer than this
+MAX_BACKUP_AGE_HOURS = int(os.getenv('MAX_BACKUP_AGE_HOURS', '0'))
+# When true, an instance must also be selected by a backup plan to be COMPLIANT
+REQUIRE_PLAN_SELECTION = os.getenv('REQUIRE_PLAN_SELECTION', 'false').strip().lower() in ('1', 'true', 'yes')
+
 def get_account_id_from_arn(arn):
     # Extracts the AWS account ID from the Lambda's ARN
     return arn.split(":")[4]
 
-def is_instance_protected(instance_arn):
-    try:
-        response = backup.list_recovery_points_by_resource(
-            ResourceArn=instance_arn,
-            MaxResults=1
-        )
-        return len(response.get('RecoveryPoints', [])) > 0
-    except Exception as e:
-        print(f"Error checking backup for {instance_arn}: {str(e)}")
-        return False
+def get_protected_resources():
+    """
+    Page list_protected_resources once and return {resource_arn: last_backup_time}
+    for EC2 instances that have at least one recovery point.
+    """
+    protected = {}
+    paginator = backup.get_paginator('list_protected_resources')
+    for page in paginator.paginate():
+        for resource in page.get('Results', []):
+            if resource.get('ResourceType') == 'EC2':
+                protected[resource['ResourceArn']] = resource.get('LastBackupTime')
+    return protected
+
+def get_plan_selections():
+    """Return a list of (resource_patterns, tag_conditions) for every backup plan selection."""
+    selections = []
+    for plans_page in backup.get_paginator('list_backup_plans').paginate():
+        for plan in plans_page.get('BackupPlansList', []):
+            selections_pages = backup.get_paginator('list_backup_selections').paginate(
+                BackupPlanId=plan['BackupPlanId']
+            )
+            for selections_page in selections_pages:
+                for item in selections_page.get('BackupSelectionsList', []):
+                    selection = backup.get_backup_selection(
+                        BackupPlanId=plan['BackupPlanId'],
+                        SelectionId=item['SelectionId']
+                    )['BackupSelection']
+                    # ConditionKey is either 'aws:ResourceTag/<key>' or the bare tag key
+                    tag_conditions = [
+                        (cond['ConditionKey'].split('aws:ResourceTag/', 1)[-1], cond['ConditionValue'])
+                        for cond in selection.get('ListOfTags', [])
+                        if cond.get('ConditionType') == 'STRINGEQUALS'
+                    ]
+                    selections.append((selection.get('Resources', []), tag_conditions))
+    return selections
+
+def is_selected_by_plan(instance_arn, tags, selections):
+    """True if any backup plan selection matches the instance ARN or one of its tags."""
+    for resource_patterns, tag_conditions in selections:
+        if any(fnmatch(instance_arn, pattern) for pattern in resource_patterns):
+            return True
+        if any(tags.get(key) == value for key, value in tag_conditions):
+            return True
+    return False
 
+def is_instance_protected(instance_arn, protected_resources):
+    return instance_arn in protected_resources
+
+@instrumented
+@profiled
 def lambda_handler(event, context):
     result_token = event.get('resultToken', 'TESTMODE')
     evaluations = []
@@ -28,34 +76,54 @@ def lambda_handler(event, context):
     region = boto3.session.Session().region_name
     account_id = get_account_id_from_arn(context.invoked_function_arn)
 
+    # Build the protected-resource index once instead of one lookup per instance
+    try:
+        protected_resources = get_protected_resources()
+        selections = get_plan_selections() if REQUIRE_PLAN_SELECTION else []
+    except Exception as e:
+        print(f"Error listing protected resources: {str(e)}")
+        return
+
     # Get EC2 instances tagged with ConfigRule=True
     try:
-        instances = ec2.describe_instances(
-            Filters=[{'Name': 'tag:ConfigRule', 'Values': ['True']}]
-        )
+        instances = []
+        paginator = ec2.get_paginator('describe_instances')
+        for page in paginator.paginate(Filters=[{'Name': 'tag:ConfigRule', 'Values': ['True']}]):
+            for reservation in page['Reservations']:
+                instances.extend(reservation['Instances'])
     except Exception as e:
         print(f"Error describing instances: {str(e)}")
         return
 
-    for reservation in instances['Reservations']:
-        for instance in reservation['Instances']:
-            instance_id = instance['InstanceId']
-            timestamp = datetime.now(timezone.utc)
-            instance_arn = f"arn:aws:ec2:{region}:{account_id}:instance/{instance_id}"
+    now = datetime.now(timezone.utc)
+    for instance in instances:
+        instance_id = instance['InstanceId']
+        instance_arn = f"arn:aws:ec2:{region}:{account_id}:instance/{instance_id}"
+        tags = {tag['Key']: tag['Value'] for tag in instance.get('Tags', [])}
 
-            compliance_type = 'COMPLIANT' if is_instance_protected(instance_arn) else 'NON_COMPLIANT'
-            annotation = "Backup recovery point exists" if compliance_type == 'COMPLIANT' else "No backup found"
+        if not is_instance_protected(instance_arn, protected_resources):
+            compliance_type, annotation = 'NON_COMPLIANT', "No backup found"
+        elif REQUIRE_PLAN_SELECTION and not is_selected_by_plan(instance_arn, tags, selections):
+            compliance_type, annotation = 'NON_COMPLIANT', "Backup exists but instance is not selected by any backup plan"
+        else:
+            last_backup = protected_resources[instance_arn]
+            if MAX_BACKUP_AGE_HOURS and (not last_backup or last_backup < now - timedelta(hours=MAX_BACKUP_AGE_HOURS)):
+                compliance_type = 'NON_COMPLIANT'
+                annotation = f"Last backup is older than {MAX_BACKUP_AGE_HOURS}h (Last: {last_backup})"
+            else:
+                compliance_type, annotation = 'COMPLIANT', "Backup recovery point exists"
 
-            evaluations.append({
-                'ComplianceResourceType': 'AWS::EC2::Instance',
-                'ComplianceResourceId': instance_id,
-                'ComplianceType': compliance_type,
-                'Annotation': annotation,
-                'OrderingTimestamp': timestamp
-            })
+        evaluations.append({
+            'ComplianceResourceType': 'AWS::EC2::Instance',
+            'ComplianceResourceId': instance_id,
+            'ComplianceType': compliance_type,
+            'Annotation': annotation,
+            'OrderingTimestamp': now
+        })
 
-    if evaluations:
+    # put_evaluations accepts at most 100 evaluations per call
+    for i in range(0, len(evaluations), 100):
         try:
-            config.put_evaluations(Evaluations=evaluations, ResultToken=result_token)
+            config.put_evaluations(Evaluations=evaluations[i:i + 100], ResultToken=result_token)
         except Exception as e:
             print(f"Error putting evaluations: {str(e)}")
@@ -0,0 +1,122 @@
+import boto3
+import os
+import json
+import urllib3
+from concurrent.futures import ThreadPoolExecutor
+from api_metrics import instrumented
+from profiling import profiled
+
+config = boto3.client('config')
+http = urllib3.PoolManager()
+
+MAX_WORKERS = int(os.getenv('MAX_TAG_WORKERS', '8'))
+
+
+def send_response(event, context, status, data, physical_resource_id=None, reason=None):
+    response_url = event['ResponseURL']
+
+    body = {
+        'Status': status,
+        'Reason': reason or f'See CloudWatch log stream: {context.log_stream_name}',
+        'PhysicalResourceId': physical_resource_id or context.log_stream_name,
+        'StackId': event['StackId'],
+        'RequestId': event['RequestId'],
+        'LogicalResourceId': event['LogicalResourceId'],
+        'NoEcho': False,
+        'Data': data
+    }
+
+    json_body = json.dumps(body)
+    headers = {
+        'content-type': '',
+        'content-length': str(len(json_body))
+    }
+
+    try:
+        response = http.request('PUT', response_url, body=json_body.encode('utf-8'), headers=headers)
+        print(f"✅ Sent CloudFormation response: {response.status}")
+    except Exception as e:
+        print(f"❌ Failed to send CloudFormation response: {str(e)}")
+
+
+def desired_tags(props):
+    """Tags from the resource properties, falling back to TAG_* environment variables."""
+    if props.get('Tags'):
+        return {k: str(v) for k, v in props['Tags'].items()}
+    return {key.replace('TAG_', '', 1): value for key, value in os.environ.items() if key.startswith('TAG_')}
+
+
+def resolve_rule_arns(props):
+    """Explicit RuleArns plus every Config rule whose name starts with RulePrefix."""
+    arns = set(props.get('RuleArns', []))
+    prefix = props.get('RulePrefix')
+    if prefix:
+        paginator = config.get_paginator('describe_config_rules')
+        for page in paginator.paginate():
+            for rule in page['ConfigRules']:
+                if rule['ConfigRuleName'].startswith(prefix):
+                    arns.add(rule['ConfigRuleArn'])
+    return sorted(arns)
+
+
+def current_tags(arn):
+    tags, token = {}, None
+    while True:
+        kwargs = {'ResourceArn': arn}
+        if token:
+            kwargs['NextToken'] = token
+        response = config.list_tags_for_resource(**kwargs)
+        tags.update({t['Key']: t['Value'] for t in response.get('Tags', [])})
+        token = response.get('NextToken')
+        if not token:
+            return tags
+
+
+def sync_rule_tags(arn, wanted, managed_keys):
+    """Apply only the tag changes needed for one rule; returns what was changed."""
+    have = current_tags(arn)
+    to_add = [{'Key': k, 'Value': v} for k, v in wanted.items() if have.get(k) != v]
+    # Only remove keys this resource used to manage, never unrelated tags
+    to_remove = [k for k in managed_keys if k not in wanted and k in have]
+
+    if to_add:
+        config.tag_resource(ResourceArn=arn, Tags=to_add)
+    if to_remove:
+        config.untag_resource(ResourceArn=arn, TagKeys=to_remove)
+    return {'arn': arn, 'added': len(to_add), 'removed': len(to_remove)}
+
+
+@instrumented
+@profiled
+def lambda_handler(event, context):
+    print("📦 Received event:")
+    print(json.dumps(event))
+
+    request_type = event.get('RequestType')
+    props = event.get('ResourceProperties', {})
+    old_props = event.get('OldResourceProperties', {})
+    physical_id = event.get('PhysicalResourceId') or f"BulkConfigRuleTags-{props.get('RulePrefix', 'rules')}"
+
+    try:
+        if request_type in ('Create', 'Update'):
+            wanted = desired_tags(props)
+            managed_keys = set(desired_tags(old_props)) if request_type == 'Update' else set()
+            arns = resolve_rule_arns(props)
+            print(f"🏷️ Syncing {len(wanted)} tags on {len(arns)} Config rules")
+
+            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as exe:
+                results = list(exe.map(lambda arn: sync_rule_tags(arn, wanted, managed_keys), arns))
+
+            changed = [r for r in results if r['added'] or r['removed']]
+            print(f"✅ {len(changed)} of {len(arns)} rules changed")
+            data = {'RulesEvaluated': len(arns), 'RulesChanged': len(changed)}
+
+        else:
+            print("🧹 Delete event — skipping tag removal for safety.")
+            data = {}
+
+        send_response(event, context, "SUCCESS", data, physical_resource_id=physical_id)
+
+    except Exception as e:
+        print("❌ Exception occurred:", str(e))
+        send_response(event, context, "FAILED", {"Message": str(e)}, physical_resource_id=physical_id)
@@ -0,0 +1,144 @@
+import os
+import json
+import time
+import threading
+import boto3
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from api_metrics import instrumented
+from profiling import profiled
+
+config = boto3.client('config')
+logs_client = boto3.client('logs')
+s3 = boto3.client('s3')
+
+ORPHAN_RULE_NAME = os.getenv('ORPHAN_RULE_NAME', 'hcops-confirule-cleanup-orphan-loggroup')
+MAX_WORKERS = int(os.getenv('MAX_DELETE_WORKERS', '8'))
+MAX_DELETES_PER_SECOND = float(os.getenv('MAX_DELETES_PER_SECOND', '5'))  # DeleteLogGroup is throttled per account
+SNAPSHOT_BUCKET = os.getenv('SNAPSHOT_BUCKET', '')  # empty = no snapshot before delete
+SNAPSHOT_PREFIX = os.getenv('SNAPSHOT_PREFIX', 'orphan-log-groups')
+
+
+def parse_flag(value):
+    """'true'/'1'/'yes' (any case) or a real bool; 'false', '0', '' and None are False."""
+    if isinstance(value, bool):
+        return value
+    return str(value or '').strip().lower() in ('1', 'true', 'yes')
+
+
+DRY_RUN = parse_flag(os.getenv('DRY_RUN', 'false'))
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across all worker threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self.lock = threading.Lock()
+        self.next_at = 0.0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def get_non_compliant_log_groups(rule_name):
+    """Return the NON_COMPLIANT log group names reported by the orphan rule."""
+    names = []
+    paginator = config.get_paginator('get_compliance_details_by_config_rule')
+    for page in paginator.paginate(ConfigRuleName=rule_name, ComplianceTypes=['NON_COMPLIANT']):
+        for result in page['EvaluationResults']:
+            qualifier = result['EvaluationResultIdentifier']['EvaluationResultQualifier']
+            if qualifier.get('ResourceType') == 'AWS::Logs::LogGroup':
+                names.append(qualifier['ResourceId'])
+    return names
+
+
+def still_non_compliant(log_group_name, rule_name):
+    """Re-read the rule's verdict right before deleting; the group may have been fixed since the listing."""
+    paginator = config.get_paginator('get_compliance_details_by_resource')
+    for page in paginator.paginate(ResourceType='AWS::Logs::LogGroup', ResourceId=log_group_name,
+                                   ComplianceTypes=['NON_COMPLIANT']):
+        for result in page['EvaluationResults']:
+            qualifier = result['EvaluationResultIdentifier']['EvaluationResultQualifier']
+            if qualifier.get('ConfigRuleName') == rule_name:
+                return True
+    return False
+
+
+def snapshot_log_group(log_group_name, run_id):
+    """Write the log group's settings (retention, tags, filters) to S3 so it can be recreated."""
+    # The prefix also matches every group nested under this name, so page until the exact match
+    paginator = logs_client.get_paginator('describe_log_groups')
+    group = next(
+        (g for page in paginator.paginate(logGroupNamePrefix=log_group_name)
+         for g in page['logGroups'] if g['logGroupName'] == log_group_name),
+        None
+    )
+    if group is None:
+        return None
+    arn = group.get('logGroupArn') or group['arn'].rstrip('*').rstrip(':')
+    snapshot = {
+        'logGroup': group,
+        'tags': logs_client.list_tags_for_resource(resourceArn=arn).get('tags', {}),
+        'metricFilters': logs_client.describe_metric_filters(logGroupName=log_group_name).get('metricFilters', []),
+        'subscriptionFilters': logs_client.describe_subscription_filters(logGroupName=log_group_name).get('subscriptionFilters', []),
+    }
+    key = f"{SNAPSHOT_PREFIX}/{run_id}/{log_group_name.strip('/').replace('/', '_')}.json"
+    s3.put_object(Bucket=SNAPSHOT_BUCKET, Key=key, Body=json.dumps(snapshot, default=str).encode('utf-8'))
+    return key
+
+
+def cleanup_log_group(log_group_name, limiter, run_id, dry_run, rule_name):
+    if dry_run:
+        return {'logGroupName': log_group_name, 'status': 'DRY_RUN'}
+    try:
+        if not still_non_compliant(log_group_name, rule_name):
+            return {'logGroupName': log_group_name, 'status': 'SKIPPED_NOT_NON_COMPLIANT'}
+        snapshot_key = snapshot_log_group(log_group_name, run_id) if SNAPSHOT_BUCKET else None
+        limiter.wait()
+        logs_client.delete_log_group(logGroupName=log_group_name)
+        return {'logGroupName': log_group_name, 'status': 'DELETED', 'snapshot': snapshot_key}
+    except logs_client.exceptions.ResourceNotFoundException:
+        return {'logGroupName': log_group_name, 'status': 'NOT_FOUND'}
+    except Exception as e:
+        return {'logGroupName': log_group_name, 'status': 'FAILED', 'error': str(e)}
+
+
+@instrumented
+@profiled
+def lambda_handler(event, context):
+    dry_run = parse_flag(event.get('dry_run', DRY_RUN))
+    run_id = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    rule_name = event.get('ConfigRuleName', ORPHAN_RULE_NAME)
+
+    # Explicit names win; otherwise take the orphan rule's NON_COMPLIANT set.
+    # Either way a group is only deleted if the rule still reports it NON_COMPLIANT.
+    log_group_names = event.get('LogGroupNames') or get_non_compliant_log_groups(rule_name)
+    log_group_names = sorted(set(log_group_names))
+
+    limiter = RateLimiter(MAX_DELETES_PER_SECOND)
+    results = []
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as exe:
+        futs = [exe.submit(cleanup_log_group, name, limiter, run_id, dry_run, rule_name) for name in log_group_names]
+        for fut in as_completed(futs):
+            results.append(fut.result())
+
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    summary = {
+        'runId': run_id,
+        'dryRun': dry_run,
+        'total': len(log_group_names),
+        'counts': counts,
+        'failed': [r for r in results if r['status'] == 'FAILED'],
+        'deleted': sorted(r['logGroupName'] for r in results if r['status'] in ('DELETED', 'DRY_RUN')),
+    }
+    # One summary line for the whole wave
+    print(json.dumps(summary))
+    return summary
@@ -1,9 +1,13 @@
 import boto3
 import json
 import os
+from api_metrics import instrumented
+from profiling import profiled
 
 logs_client = boto3.client('logs')
 
+@instrumented
+@profiled
 def lambda_handler(event, context):
     # Extract rule name from the CloudTrail event
     try:
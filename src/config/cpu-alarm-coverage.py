@@ -0,0 +1,69 @@
+import os
+import boto3
+
+from evaluation_sinks import EvaluationResult, configured_sinks, publish
+from inventory import Inventory
+from api_metrics import instrumented
+from profiling import profiled, stage
+
+ec2 = boto3.client('ec2')
+cloudwatch = boto3.client('cloudwatch')
+
+RULE_NAME = os.getenv('GENERATOR_ID', 'hcops-configrule-cpu-alarm-coverage')
+
+inventory = Inventory()
+
+def cpu_alarmed_instances(alarms):
+    """Set of instance IDs that have a CPUUtilization alarm."""
+    instance_ids = set()
+    for alarm in alarms:
+        if alarm.get('MetricName') != 'CPUUtilization':
+            continue
+        for dimension in alarm.get('Dimensions', []):
+            if dimension['Name'] == 'InstanceId':
+                instance_ids.add(dimension['Value'])
+    return instance_ids
+
+@instrumented
+@profiled
+def lambda_handler(event, context):
+    """
+    Evaluate CPUUtilization alarm coverage once and publish the results to every configured
+    sink (AWS Config, Security Hub, JSONL), replacing separate CPUUtilization and
+    CpuAlarmMissingeval passes.
+    """
+    result_token = event.get('resultToken', 'TESTMODE')
+    region = os.environ['AWS_REGION']
+    account_id = context.invoked_function_arn.split(":")[4]
+
+    # Both sweeps are independent: run them concurrently, then evaluate in memory
+    with stage("inventory"):
+        alarms, instances = inventory.run(
+            inventory.paginate(cloudwatch, 'describe_alarms', 'MetricAlarms', AlarmTypes=['MetricAlarm']),
+            inventory.paginate(ec2, 'describe_instances', 'Reservations[].Instances[]',
+                               Filters=[{'Name': 'tag:ConfigRule', 'Values': ['True']}]),
+        )
+
+    with stage("evaluate"):
+        alarmed = cpu_alarmed_instances(alarms)
+        results = []
+        for instance in instances:
+            instance_id = instance['InstanceId']
+            compliant = instance_id in alarmed
+            results.append(EvaluationResult(
+                resource_type='AWS::EC2::Instance',
+                resource_id=instance_id,
+                compliant=compliant,
+                annotation="CPUUtilization alarm is present" if compliant else "Missing CPUUtilization alarm",
+                ordering_timestamp=instance['LaunchTime'],
+                resource_arn=f"arn:aws:ec2:{region}:{account_id}:instance/{instance_id}"
+            ))
+
+    sinks = configured_sinks(result_token, RULE_NAME, account_id, region)
+    with stage("submit"):
+        published = publish(results, sinks)
+    return {
+        'status': 'completed',
+        'evaluated': len(results),
+        'sinks': published
+    }
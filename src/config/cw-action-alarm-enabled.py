@@ -1,17 +1,24 @@
-import boto3
-import botocore
+import botocore.config
 from collections import defaultdict
 
+from evaluation_cache import EvaluationCache
+from inventory import Inventory
+from lazy_clients import LazyClient
+from api_metrics import instrumented
+from profiling import profiled, stage
+
 boto_config = botocore.config.Config(
     retries={'max_attempts': 5, 'mode': 'standard'}
 )
 
-ec2 = boto3.client('ec2', config=boto_config)
-cloudwatch = boto3.client('cloudwatch', config=boto_config)
-config = boto3.client('config', config=boto_config)
+ec2 = LazyClient('ec2', config=boto_config)
+cloudwatch = LazyClient('cloudwatch', config=boto_config)
+config = LazyClient('config', config=boto_config)
 
 MAX_CONFIG_BATCH_SIZE = 100
 
+inventory = Inventory()
+
 # Expected metric coverage
 ALLOWED_METRICS = [
     'disk_used_percent',
@@ -23,26 +30,25 @@ ALLOWED_METRICS = [
     'DISK_FREE'
 ]
 
-def get_config_rule_instance_ids():
-    instance_ids = []
-    try:
-        response = ec2.describe_instances(
-            Filters=[{'Name': 'tag:ConfigRule', 'Values': ['True']}]
-        )
-        for reservation in response['Reservations']:
-            for instance in reservation['Instances']:
-                instance_ids.append(instance['InstanceId'])
-    except Exception as e:
-        print(f"Error fetching EC2 instances: {e}")
-    return instance_ids
-
 def chunk_evaluations(evaluations, chunk_size=100):
     for i in range(0, len(evaluations), chunk_size):
         yield evaluations[i:i + chunk_size]
 
+@instrumented
+@profiled
 def lambda_handler(event, context):
     result_token = event.get('resultToken', 'TESTMODE')
-    instance_ids = get_config_rule_instance_ids()
+    # Instances and alarms are independent listings, so they are fetched concurrently
+    try:
+        with stage("inventory"):
+            instance_ids, all_alarms = inventory.run(
+                inventory.paginate(ec2, 'describe_instances', 'Reservations[].Instances[].InstanceId',
+                                   Filters=[{'Name': 'tag:ConfigRule', 'Values': ['True']}]),
+                inventory.paginate(cloudwatch, 'describe_alarms', 'MetricAlarms', AlarmTypes=['MetricAlarm']),
+            )
+    except Exception as e:
+        print(f"Error during inventory: {e}")
+        return {"error": str(e)}
 
     if not instance_ids:
         print("No instances found with tag ConfigRule=True.")
@@ -59,71 +65,73 @@ def lambda_handler(event, context):
     metric_instance_map = defaultdict(lambda: defaultdict(int))
 
     try:
-        paginator = cloudwatch.get_paginator('describe_alarms')
-        all_alarms = []
-        for page in paginator.paginate(AlarmTypes=['MetricAlarm']):
-            all_alarms.extend(page['MetricAlarms'])
-
         print(f"Total alarms fetched from CloudWatch: {len(all_alarms)}")
 
-        for alarm in all_alarms:
-            alarm_name = alarm['AlarmName']
-            metric_name = alarm.get('MetricName')
-            dimensions = alarm.get('Dimensions', [])
-
-            if metric_name not in ALLOWED_METRICS:
-                total_alarms_skipped += 1
-                continue
-
-            instance_id = None
-            for d in dimensions:
-                if d.get('Name') == 'InstanceId':
-                    instance_id = d.get('Value')
-                    break
-
-            if not instance_id or instance_id not in instance_ids:
-                total_alarms_skipped += 1
-                continue
-
-            metric_instance_map[instance_id][metric_name] += 1
-            total_alarms_matched += 1
-
-            print(f"Matched alarm '{alarm_name}' for instance {instance_id} with metric '{metric_name}'")
-
-            # ➤ Print and evaluate ActionsEnabled
-            actions_enabled = alarm.get('ActionsEnabled', True)
-            print(f"    ➤ ActionsEnabled: {actions_enabled}")
-
-            if actions_enabled:
-                compliance_type = 'COMPLIANT'
-                annotation = f"Metric '{metric_name}' has alarm actions enabled (ActionsEnabled=True)."
-            else:
-                compliance_type = 'NON_COMPLIANT'
-                annotation = f"Metric '{metric_name}' has alarm actions disabled (ActionsEnabled=False)."
-
-            evaluations.append({
-                'ComplianceResourceType': 'AWS::CloudWatch::Alarm',
-                'ComplianceResourceId': alarm_name,
-                'ComplianceType': compliance_type,
-                'Annotation': annotation,
-                'OrderingTimestamp': alarm['AlarmConfigurationUpdatedTimestamp']
-            })
+        with stage("evaluate"):
+            for alarm in all_alarms:
+                alarm_name = alarm['AlarmName']
+                metric_name = alarm.get('MetricName')
+                dimensions = alarm.get('Dimensions', [])
+
+                if metric_name not in ALLOWED_METRICS:
+                    total_alarms_skipped += 1
+                    continue
+
+                instance_id = None
+                for d in dimensions:
+                    if d.get('Name') == 'InstanceId':
+                        instance_id = d.get('Value')
+                        break
+
+                if not instance_id or instance_id not in instance_ids:
+                    total_alarms_skipped += 1
+                    continue
+
+                metric_instance_map[instance_id][metric_name] += 1
+                total_alarms_matched += 1
+
+                print(f"Matched alarm '{alarm_name}' for instance {instance_id} with metric '{metric_name}'")
+
+                # ➤ Print and evaluate ActionsEnabled
+                actions_enabled = alarm.get('ActionsEnabled', True)
+                print(f"    ➤ ActionsEnabled: {actions_enabled}")
+
+                if actions_enabled:
+                    compliance_type = 'COMPLIANT'
+                    annotation = f"Metric '{metric_name}' has alarm actions enabled (ActionsEnabled=True)."
+                else:
+                    compliance_type = 'NON_COMPLIANT'
+                    annotation = f"Metric '{metric_name}' has alarm actions disabled (ActionsEnabled=False)."
+
+                evaluations.append({
+                    'ComplianceResourceType': 'AWS::CloudWatch::Alarm',
+                    'ComplianceResourceId': alarm_name,
+                    'ComplianceType': compliance_type,
+                    'Annotation': annotation,
+                    'OrderingTimestamp': alarm['AlarmConfigurationUpdatedTimestamp']
+                })
 
     except Exception as e:
         print(f"Error during alarm evaluation: {e}")
         return {"error": str(e)}
 
-    if result_token != 'TESTMODE' and evaluations:
-        for chunk in chunk_evaluations(evaluations, MAX_CONFIG_BATCH_SIZE):
-            try:
-                config.put_evaluations(
-                    Evaluations=chunk,
-                    ResultToken=result_token
-                )
-            except Exception as e:
-                print(f"Failed to submit evaluation chunk: {e}")
-
-        print(f"Submitted {len(evaluations)} evaluations to AWS Config.")
+    submitted = 0
+    with stage("submit"):
+        if result_token != 'TESTMODE' and evaluations:
+            cache = EvaluationCache.for_event(event)
+            for chunk in chunk_evaluations(cache.filter(evaluations), MAX_CONFIG_BATCH_SIZE):
+                try:
+                    config.put_evaluations(
+                        Evaluations=chunk,
+                        ResultToken=result_token
+                    )
+                    cache.mark_submitted(chunk)
+                    submitted += len(chunk)
+                except Exception as e:
+                    print(f"Failed to submit evaluation chunk: {e}")
+            cache.save()
+
+            print(f"Submitted {submitted} of {len(evaluations)} evaluations to AWS Config.")
 
     print("\n=== Alarm Coverage per Instance and Metric ===")
     for instance_id in instance_ids:
@@ -141,5 +149,5 @@ def lambda_handler(event, context):
         "instances_evaluated": len(instance_ids),
         "alarms_matched": total_alarms_matched,
         "alarms_skipped": total_alarms_skipped,
-        "evaluations_submitted": len(evaluations)
+        "evaluations_submitted": submitted
     }
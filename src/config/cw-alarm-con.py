@@ -1,5 +1,7 @@
 import boto3
 import botocore
+from api_metrics import instrumented
+from profiling import profiled
 
 # Retry-safe configuration
 boto_config = botocore.config.Config(
@@ -26,6 +28,8 @@ def get_config_rule_instance_ids():
         print(f"❌ Error fetching EC2 instances: {e}")
     return instance_ids
 
+@instrumented
+@profiled
 def lambda_handler(event, context):
     result_token = event.get('resultToken', 'TESTMODE')
     instance_ids = get_config_rule_instance_ids()
@@ -1,5 +1,7 @@
 import boto3
 import botocore
+from api_metrics import instrumented
+from profiling import profiled, stage
 
 boto_config = botocore.config.Config(
     retries={'max_attempts': 5, 'mode': 'standard'}
@@ -52,6 +54,8 @@ def chunk_evaluations(evaluations, chunk_size=100):
     for i in range(0, len(evaluations), chunk_size):
         yield evaluations[i:i + chunk_size]
 
+@instrumented
+@profiled
 def lambda_handler(event, context):
     result_token = event.get('resultToken', 'TESTMODE')
     instance_map = get_instances_with_platform_and_ami()
@@ -241,6 +245,8 @@ def chunk_evaluations(evaluations, chunk_size=100):
     for i in range(0, len(evaluations), chunk_size):
         yield evaluations[i:i + chunk_size]
 
+@instrumented
+@profiled
 def lambda_handler(event, context):
     result_token = event.get('resultToken', 'TESTMODE')
     instance_map = get_tagged_instances_with_platform()
@@ -361,6 +367,8 @@ def chunk_evaluations(evaluations, chunk_size=100):
     for i in range(0, len(evaluations), chunk_size):
         yield evaluations[i:i + chunk_size]
 
+@instrumented
+@profiled
 def lambda_handler(event, context):
     result_token = event.get('resultToken', 'TESTMODE')
     instance_ids = get_config_rule_instance_ids()
@@ -479,6 +487,8 @@ def get_alarms_for_instance(instance_id):
         print(f"❌ Error fetching alarms for {instance_id}: {e}")
     return matching_alarms
 
+@instrumented
+@profiled
 def lambda_handler(event, context):
     instance_ids = get_config_rule_instances()
 
@@ -509,6 +519,8 @@ def lambda_handler(event, context):
 import boto3
 import botocore
 
+from evaluation_cache import EvaluationCache
+
 # Retry-safe configuration
 boto_config = botocore.config.Config(
     retries={
@@ -540,9 +552,12 @@ def chunk_evaluations(evaluations, chunk_size=100):
     for i in range(0, len(evaluations), chunk_size):
         yield evaluations[i:i + chunk_size]
 
+@instrumented
+@profiled
 def lambda_handler(event, context):
     result_token = event.get('resultToken', 'TESTMODE')
-    instance_ids = get_config_rule_instance_ids()
+    with stage("inventory"):
+        instance_ids = get_config_rule_instance_ids()
 
     if not instance_ids:
         print("ℹ️ No instances found with tag ConfigRule=True.")
@@ -551,57 +566,65 @@ def lambda_handler(event, context):
     evaluations = []
 
     try:
-        paginator = cloudwatch.get_paginator('describe_alarms')
-        for page in paginator.paginate(AlarmTypes=['MetricAlarm']):
-            for alarm in page['MetricAlarms']:
-                alarm_name = alarm['AlarmName']
+        with stage("evaluate"):
+            paginator = cloudwatch.get_paginator('describe_alarms')
+            for page in paginator.paginate(AlarmTypes=['MetricAlarm']):
+                for alarm in page['MetricAlarms']:
+                    alarm_name = alarm['AlarmName']
 
-                # Filter: Only process alarms tied to tagged EC2s
-                if not any(alarm_name.startswith(instance_id) for instance_id in instance_ids):
-                    continue
+                    # Filter: Only process alarms tied to tagged EC2s
+                    if not any(alarm_name.startswith(instance_id) for instance_id in instance_ids):
+                        continue
 
-                # Action checks
-                has_alarm = bool(alarm.get('AlarmActions'))
-                has_ok = bool(alarm.get('OKActions'))
-                has_insufficient = bool(alarm.get('InsufficientDataActions'))
+                    # Action checks
+                    has_alarm = bool(alarm.get('AlarmActions'))
+                    has_ok = bool(alarm.get('OKActions'))
+                    has_insufficient = bool(alarm.get('InsufficientDataActions'))
 
-                if has_alarm and has_ok and has_insufficient:
-                    compliance_type = 'COMPLIANT'
-                    annotation = "✅ All required alarm actions are configured."
-                else:
-                    compliance_type = 'NON_COMPLIANT'
-                    missing = []
-                    if not has_alarm: missing.append("ALARM")
-                    if not has_ok: missing.append("OK")
-                    if not has_insufficient: missing.append("INSUFFICIENT_DATA")
-                    annotation = f"⚠️ Missing actions for: {', '.join(missing)}"
+                    if has_alarm and has_ok and has_insufficient:
+                        compliance_type = 'COMPLIANT'
+                        annotation = "✅ All required alarm actions are configured."
+                    else:
+                        compliance_type = 'NON_COMPLIANT'
+                        missing = []
+                        if not has_alarm: missing.append("ALARM")
+                        if not has_ok: missing.append("OK")
+                        if not has_insufficient: missing.append("INSUFFICIENT_DATA")
+                        annotation = f"⚠️ Missing actions for: {', '.join(missing)}"
 
-                evaluations.append({
-                    'ComplianceResourceType': 'AWS::CloudWatch::Alarm',
-                    'ComplianceResourceId': alarm_name,
-                    'ComplianceType': compliance_type,
-                    'Annotation': annotation,
-                    'OrderingTimestamp': alarm['AlarmConfigurationUpdatedTimestamp']
-                })
+                    evaluations.append({
+                        'ComplianceResourceType': 'AWS::CloudWatch::Alarm',
+                        'ComplianceResourceId': alarm_name,
+                        'ComplianceType': compliance_type,
+                        'Annotation': annotation,
+                        'OrderingTimestamp': alarm['AlarmConfigurationUpdatedTimestamp']
+                    })
 
     except Exception as e:
         print(f"❌ Error during alarm evaluation: {e}")
         return {"error": str(e)}
 
-    # Submit evaluations in chunks
-    if result_token != 'TESTMODE' and evaluations:
-        for chunk in chunk_evaluations(evaluations, MAX_CONFIG_BATCH_SIZE):
-            try:
-                config.put_evaluations(
-                    Evaluations=chunk,
-                    ResultToken=result_token
-                )
-            except Exception as e:
-                print(f"❌ Failed to submit evaluation chunk: {e}")
-
-        print(f"✅ Submitted {len(evaluations)} evaluations to AWS Config.")
+    # Submit only changed (or refresh-due) evaluations in chunks
+    submitted = 0
+    with stage("submit"):
+        if result_token != 'TESTMODE' and evaluations:
+            cache = EvaluationCache.for_event(event)
+            for chunk in chunk_evaluations(cache.filter(evaluations), MAX_CONFIG_BATCH_SIZE):
+                try:
+                    config.put_evaluations(
+                        Evaluations=chunk,
+                        ResultToken=result_token
+                    )
+                    cache.mark_submitted(chunk)
+                    submitted += len(chunk)
+                except Exception as e:
+                    print(f"❌ Failed to submit evaluation chunk: {e}")
+            cache.save()
+
+            print(f"✅ Submitted {submitted} of {len(evaluations)} evaluations to AWS Config (rest unchanged).")
 
     return {
         "status": "completed",
-        "evaluated_alarms": len(evaluations)
+        "evaluated_alarms": len(evaluations),
+        "evaluations_submitted": submitted
     }
@@ -1,6 +1,8 @@
 import boto3
 import botocore
 from collections import defaultdict
+from api_metrics import instrumented
+from profiling import profiled
 
 boto_config = botocore.config.Config(
     retries={'max_attempts': 5, 'mode': 'standard'}
@@ -40,6 +42,8 @@ def chunk_evaluations(evaluations, chunk_size=100):
     for i in range(0, len(evaluations), chunk_size):
         yield evaluations[i:i + chunk_size]
 
+@instrumented
+@profiled
 def lambda_handler(event, context):
     result_token = event.get('resultToken', 'TESTMODE')
     instance_ids = get_config_rule_instance_ids()
@@ -1,6 +1,10 @@
 import json
 import boto3
+from api_metrics import instrumented
+from profiling import profiled
 
+@instrumented
+@profiled
 def lambda_handler(event, context):
     config = boto3.client('config')
     cloudwatch = boto3.client('cloudwatch')
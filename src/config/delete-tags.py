@@ -1,9 +1,54 @@
+import os
 import boto3
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from api_metrics import instrumented
+from profiling import profiled
 
 config = boto3.client('config')
 logs_client = boto3.client('logs')
+tagging_client = boto3.client('resourcegroupstaggingapi')
 
+# TAGGING_API: a few get_resources pages for every tagged log group
+# PER_GROUP:   list_tags_for_resource per log group with bounded concurrency
+TAG_LOOKUP = os.getenv('TAG_LOOKUP', 'TAGGING_API').strip().upper()
+MAX_TAG_WORKERS = int(os.getenv('MAX_TAG_WORKERS', '8'))
+
+def get_config_rule_names():
+    """Page describe_config_rules once and return every rule name in the account/region."""
+    names = set()
+    paginator = config.get_paginator('describe_config_rules')
+    for page in paginator.paginate():
+        for rule in page['ConfigRules']:
+            names.add(rule['ConfigRuleName'])
+    return names
+
+def _log_group_arn(group):
+    # describe_log_groups 'arn' ends with ':*'; the tagging APIs expect it without
+    return group.get('logGroupArn') or group['arn'].rstrip('*').rstrip(':')
+
+def get_tagged_log_group_arns():
+    """Return the ARNs of all log groups tagged ConfigRule=True via the Resource Groups Tagging API."""
+    arns = set()
+    paginator = tagging_client.get_paginator('get_resources')
+    for page in paginator.paginate(
+        ResourceTypeFilters=['logs:log-group'],
+        TagFilters=[{'Key': 'ConfigRule', 'Values': ['True']}]
+    ):
+        for mapping in page['ResourceTagMappingList']:
+            arns.add(mapping['ResourceARN'])
+    return arns
+
+def _has_config_rule_tag(arn):
+    try:
+        tags = logs_client.list_tags_for_resource(resourceArn=arn).get('tags', {})
+    except Exception as e:
+        print(f"Could not fetch tags for {arn}: {e}")
+        return False
+    return tags.get('ConfigRule') == 'True'
+
+@instrumented
+@profiled
 def lambda_handler(event, context):
     result_token = event.get('resultToken', 'TESTMODE')
     evaluations = []
@@ -11,51 +56,54 @@ def lambda_handler(event, context):
     # ✅ Filter only for log groups starting with /aws/lambda/hcops-
     paginator = logs_client.get_paginator('describe_log_groups')
 
-    for page in paginator.paginate(logGroupNamePrefix='/aws/lambda/hcops-'):
-        for group in page['logGroups']:
-            log_group_name = group['logGroupName']
-
-            # ✅ Further restrict to only those ending with -tags
-            if not log_group_name.endswith('-tags'):
-                continue
-
-            # Get tags for the log group
-            try:
-                tags = logs_client.list_tags_log_group(logGroupName=log_group_name).get('tags', {})
-            except Exception as e:
-                print(f"Could not fetch tags for {log_group_name}: {e}")
-                continue
-
-            # Filter only log groups with tag ConfigRule=True
-            if tags.get('ConfigRule') != 'True':
-                continue
-
-            # Extract base name of the rule
-            base_name = log_group_name.split('/')[-1].replace('-tags', '')
-
-            # Check if Config rule exists
-            try:
-                config.describe_config_rules(ConfigRuleNames=[base_name])
-                compliance_type = 'COMPLIANT'
-                annotation = f"Config rule '{base_name}' exists for tagged log group."
-            except config.exceptions.NoSuchConfigRuleException:
-                compliance_type = 'NON_COMPLIANT'
-                annotation = f"Tagged log group '{log_group_name}' has no matching Config rule."
-
-            evaluations.append({
-                'ComplianceResourceType': 'AWS::Logs::LogGroup',
-                'ComplianceResourceId': log_group_name,
-                'ComplianceType': compliance_type,
-                'Annotation': annotation,
-                'OrderingTimestamp': datetime.now(timezone.utc)
-            })
-
-    # Submit evaluations to AWS Config
+    # ✅ Further restrict to only those ending with -tags
+    candidates = [
+        group
+        for page in paginator.paginate(logGroupNamePrefix='/aws/lambda/hcops-')
+        for group in page['logGroups']
+        if group['logGroupName'].endswith('-tags')
+    ]
+
+    # Filter only log groups with tag ConfigRule=True
+    if TAG_LOOKUP == 'PER_GROUP':
+        with ThreadPoolExecutor(max_workers=MAX_TAG_WORKERS) as exe:
+            flags = exe.map(lambda g: _has_config_rule_tag(_log_group_arn(g)), candidates)
+            tagged = [group for group, flag in zip(candidates, flags) if flag]
+    else:
+        tagged_arns = get_tagged_log_group_arns()
+        tagged = [group for group in candidates if _log_group_arn(group) in tagged_arns]
+
+    rule_names = get_config_rule_names()
+
+    for group in tagged:
+        log_group_name = group['logGroupName']
+
+        # Extract base name of the rule
+        base_name = log_group_name.split('/')[-1].replace('-tags', '')
+
+        # Check if Config rule exists
+        if base_name in rule_names:
+            compliance_type = 'COMPLIANT'
+            annotation = f"Config rule '{base_name}' exists for tagged log group."
+        else:
+            compliance_type = 'NON_COMPLIANT'
+            annotation = f"Tagged log group '{log_group_name}' has no matching Config rule."
+
+        evaluations.append({
+            'ComplianceResourceType': 'AWS::Logs::LogGroup',
+            'ComplianceResourceId': log_group_name,
+            'ComplianceType': compliance_type,
+            'Annotation': annotation,
+            'OrderingTimestamp': datetime.now(timezone.utc)
+        })
+
+    # Submit evaluations to AWS Config (at most 100 per call)
     if result_token != 'TESTMODE' and evaluations:
-        config.put_evaluations(
-            Evaluations=evaluations,
-            ResultToken=result_token
-        )
+        for i in range(0, len(evaluations), 100):
+            config.put_evaluations(
+                Evaluations=evaluations[i:i + 100],
+                ResultToken=result_token
+            )
 
     return {
         'status': 'completed',
@@ -1,84 +1,154 @@
+import os
+import json
 import boto3
 from datetime import datetime, timezone, timedelta
+from api_metrics import instrumented
+from profiling import profiled
 
 config = boto3.client('config')
 ec2 = boto3.client('ec2')
 
+SNAPSHOT_INDEX_PATH = os.getenv('SNAPSHOT_INDEX_PATH', '/tmp/snapshot-index.json')
+# Deleted snapshots are only dropped from the index by a full sweep
+FULL_REFRESH_HOURS = int(os.getenv('SNAPSHOT_INDEX_FULL_REFRESH_HOURS', '24'))
+
+def _load_snapshot_index():
+    try:
+        with open(SNAPSHOT_INDEX_PATH) as fh:
+            data = json.load(fh)
+        return (
+            data['volumes'],
+            datetime.fromisoformat(data['watermark']),
+            datetime.fromisoformat(data['full_sweep_at'])
+        )
+    except (OSError, ValueError, KeyError):
+        return None
+
+def _save_snapshot_index(volumes, watermark, full_sweep_at):
+    try:
+        with open(SNAPSHOT_INDEX_PATH + '.tmp', 'w') as fh:
+            json.dump({
+                'volumes': volumes,
+                'watermark': watermark.isoformat(),
+                'full_sweep_at': full_sweep_at.isoformat()
+            }, fh)
+        os.replace(SNAPSHOT_INDEX_PATH + '.tmp', SNAPSHOT_INDEX_PATH)
+    except OSError as e:
+        print(f"Snapshot index not cached: {str(e)}")
+
+def _sweep_snapshots(volumes, filters=None):
+    """Page describe_snapshots(OwnerIds=['self']) and keep the newest snapshot per volume."""
+    paginator = ec2.get_paginator('describe_snapshots')
+    kwargs = {'OwnerIds': ['self']}
+    if filters:
+        kwargs['Filters'] = filters
+    for page in paginator.paginate(**kwargs):
+        for snapshot in page['Snapshots']:
+            volume_id = snapshot.get('VolumeId')
+            start_time = snapshot['StartTime'].isoformat()
+            current = volumes.get(volume_id)
+            # ISO-8601 UTC strings compare in time order
+            if volume_id and (current is None or start_time > current[1]):
+                volumes[volume_id] = [snapshot['SnapshotId'], start_time]
+    return volumes
+
+def get_snapshot_index(now):
+    """
+    Return {volume_id: [snapshot_id, start_time_iso]} for the newest snapshot of each volume.
+    A warm container only fetches snapshots started since the cached watermark.
+    """
+    cached = _load_snapshot_index()
+    if cached and now - cached[2] < timedelta(hours=FULL_REFRESH_HOURS):
+        volumes, watermark, full_sweep_at = cached
+        # start-time accepts wildcards, so bound the sweep to the days since the watermark
+        days = []
+        day = watermark.date()
+        while day <= now.date():
+            days.append(f"{day.isoformat()}*")
+            day += timedelta(days=1)
+        _sweep_snapshots(volumes, [{'Name': 'start-time', 'Values': days}])
+    else:
+        volumes, full_sweep_at = _sweep_snapshots({}), now
+
+    _save_snapshot_index(volumes, now, full_sweep_at)
+    return volumes
+
+@instrumented
+@profiled
 def lambda_handler(event, context):
     result_token = event.get('resultToken', 'TESTMODE')
     evaluations = []
+    now = datetime.now(timezone.utc)
+    snapshot_index = get_snapshot_index(now)
 
     # Get all EC2s with tag ConfigRule=True
-    response = ec2.describe_instances(
-        Filters=[
-            {'Name': 'tag:ConfigRule', 'Values': ['True']}
-        ]
-    )
-
-    for reservation in response['Reservations']:
-        for instance in reservation['Instances']:
-            instance_id = instance['InstanceId']
-            timestamp = instance['LaunchTime']
-            compliance_type = 'NON_COMPLIANT'
-            annotation = ''
-            root_volume_id = None
-
-            # Fetch tags and root volume
-            tags = {tag['Key']: tag['Value'] for tag in instance.get('Tags', [])}
-            snapshot_required_tag = tags.get('snapshot_required')
-
-            root_device_name = instance.get('RootDeviceName')
-            block_devices = instance.get('BlockDeviceMappings', [])
-            for device in block_devices:
-                if device['DeviceName'] == root_device_name and 'Ebs' in device:
-                    root_volume_id = device['Ebs']['VolumeId']
-                    break
-
-            # Validate tag presence and value
-            if snapshot_required_tag is None:
-                annotation = f"Tag 'snapshot_required' is missing (Root volume: {root_volume_id or 'not found'})"
-            elif snapshot_required_tag != 'Yes':
-                annotation = f"Tag 'snapshot_required' is not set to 'Yes' (Found: '{snapshot_required_tag}'; Root volume: {root_volume_id or 'not found'})"
-            elif not root_volume_id:
-                annotation = f"Root volume not found for instance {instance_id}"
+    instances = []
+    paginator = ec2.get_paginator('describe_instances')
+    for page in paginator.paginate(Filters=[{'Name': 'tag:ConfigRule', 'Values': ['True']}]):
+        for reservation in page['Reservations']:
+            instances.extend(reservation['Instances'])
+
+    for instance in instances:
+        instance_id = instance['InstanceId']
+        timestamp = instance['LaunchTime']
+        compliance_type = 'NON_COMPLIANT'
+        annotation = ''
+        root_volume_id = None
+
+        # Fetch tags and root volume
+        tags = {tag['Key']: tag['Value'] for tag in instance.get('Tags', [])}
+        snapshot_required_tag = tags.get('snapshot_required')
+
+        root_device_name = instance.get('RootDeviceName')
+        block_devices = instance.get('BlockDeviceMappings', [])
+        for device in block_devices:
+            if device['DeviceName'] == root_device_name and 'Ebs' in device:
+                root_volume_id = device['Ebs']['VolumeId']
+                break
+
+        # Validate tag presence and value
+        if snapshot_required_tag is None:
+            annotation = f"Tag 'snapshot_required' is missing (Root volume: {root_volume_id or 'not found'})"
+        elif snapshot_required_tag != 'Yes':
+            annotation = f"Tag 'snapshot_required' is not set to 'Yes' (Found: '{snapshot_required_tag}'; Root volume: {root_volume_id or 'not found'})"
+        elif not root_volume_id:
+            annotation = f"Root volume not found for instance {instance_id}"
+        else:
+            # Look up the newest snapshot for the root volume
+            latest_snapshot = snapshot_index.get(root_volume_id)
+
+            if not latest_snapshot:
+                annotation = f"No snapshots found for root volume {root_volume_id}"
             else:
-                # Check snapshots for the root volume
-                snapshots = ec2.describe_snapshots(
-                    Filters=[{'Name': 'volume-id', 'Values': [root_volume_id]}],
-                    OwnerIds=['self']
-                )['Snapshots']
-
-                if not snapshots:
-                    annotation = f"No snapshots found for root volume {root_volume_id}"
+                snapshot_id, start_time = latest_snapshot[0], datetime.fromisoformat(latest_snapshot[1])
+
+                if start_time >= now - timedelta(days=1):
+                    compliance_type = 'COMPLIANT'
+                    annotation = (
+                        f"Snapshot found for root volume {root_volume_id}: "
+                        f"{snapshot_id} on {start_time}"
+                    )
                 else:
-                    latest_snapshot = max(snapshots, key=lambda x: x['StartTime'])
-                    now = datetime.now(timezone.utc)
-
-                    if latest_snapshot['StartTime'] >= now - timedelta(days=1):
-                        compliance_type = 'COMPLIANT'
-                        annotation = (
-                            f"Snapshot found for root volume {root_volume_id}: "
-                            f"{latest_snapshot['SnapshotId']} on {latest_snapshot['StartTime']}"
-                        )
-                    else:
-                        annotation = (
-                            f"Only outdated snapshots found for root volume {root_volume_id}. "
-                            f"Latest: {latest_snapshot['SnapshotId']} on {latest_snapshot['StartTime']}"
-                        )
-
-            evaluations.append({
-                'ComplianceResourceType': 'AWS::EC2::Instance',
-                'ComplianceResourceId': instance_id,
-                'ComplianceType': compliance_type,
-                'Annotation': annotation,
-                'OrderingTimestamp': timestamp
-            })
-
-    if result_token != 'TESTMODE' and evaluations:
-        config.put_evaluations(
-            Evaluations=evaluations,
-            ResultToken=result_token
-        )
+                    annotation = (
+                        f"Only outdated snapshots found for root volume {root_volume_id}. "
+                        f"Latest: {snapshot_id} on {start_time}"
+                    )
+
+        evaluations.append({
+            'ComplianceResourceType': 'AWS::EC2::Instance',
+            'ComplianceResourceId': instance_id,
+            'ComplianceType': compliance_type,
+            'Annotation': annotation,
+            'OrderingTimestamp': timestamp
+        })
+
+    # put_evaluations accepts at most 100 evaluations per call
+    if result_token != 'TESTMODE':
+        for i in range(0, len(evaluations), 100):
+            try:
+                config.put_evaluations(Evaluations=evaluations[i:i + 100], ResultToken=result_token)
+            except Exception as e:
+                print(f"Error putting evaluations: {str(e)}")
 
     return {
         'status': 'completed',
@@ -0,0 +1,105 @@
+"""
+Result cache for periodic Config rules.
+
+Remembers, per (rule, resource), a hash of the last submitted compliance type and
+annotation plus when it was sent. filter() keeps only evaluations that changed or
+whose last submission is older than EVAL_CACHE_REFRESH_HOURS, so unchanged results
+are not resubmitted (and billed) every cycle while every resource is still refreshed
+well inside Config's staleness window.
+
+The cache is keyed by the rule's configRuleId (unique per rule creation), so a rule that
+is deleted and recreated under the same name starts with an empty cache instead of
+inheriting one that would suppress its first evaluations. Entries older than the refresh
+window are evicted on save; they would be resubmitted anyway.
+
+The cache lives in /tmp for warm starts; set EVAL_CACHE_BUCKET to keep a durable copy
+in S3 across cold starts.
+
+    cache = EvaluationCache.for_event(event)
+"""
+import os
+import json
+import time
+import hashlib
+
+import boto3
+
+CACHE_DIR = os.getenv('EVAL_CACHE_DIR', '/tmp')
+CACHE_BUCKET = os.getenv('EVAL_CACHE_BUCKET', '')
+CACHE_PREFIX = os.getenv('EVAL_CACHE_PREFIX', 'config-evaluation-cache')
+REFRESH_HOURS = float(os.getenv('EVAL_CACHE_REFRESH_HOURS', '144'))
+
+
+def _digest(evaluation):
+    payload = f"{evaluation['ComplianceType']}|{evaluation.get('Annotation', '')}"
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def _key(evaluation):
+    return f"{evaluation['ComplianceResourceType']}|{evaluation['ComplianceResourceId']}"
+
+
+class EvaluationCache:
+
+    def __init__(self, rule_name, rule_id=None):
+        self.rule_name = rule_name or 'unknown-rule'
+        cache_name = f"{self.rule_name}-{rule_id}" if rule_id else self.rule_name
+        self.path = os.path.join(CACHE_DIR, f"eval-cache-{cache_name}.json")
+        self.s3_key = f"{CACHE_PREFIX}/{cache_name}.json"
+        self.entries = self._load()
+
+    @classmethod
+    def for_event(cls, event, default_name=None):
+        """Cache for the rule that sent this Config event (configRuleId, else the tail of configRuleArn)."""
+        rule_id = event.get('configRuleId') or (event.get('configRuleArn') or '').rsplit('/', 1)[-1] or None
+        return cls(event.get('configRuleName') or default_name, rule_id)
+
+    def _load(self):
+        try:
+            with open(self.path) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            pass
+        if CACHE_BUCKET:
+            try:
+                body = boto3.client('s3').get_object(Bucket=CACHE_BUCKET, Key=self.s3_key)['Body'].read()
+                return json.loads(body)
+            except Exception as e:
+                print(f"No durable evaluation cache loaded for {self.rule_name}: {e}")
+        return {}
+
+    def filter(self, evaluations, now=None):
+        """Return the evaluations that changed since their last submission or are due for refresh."""
+        now = now or time.time()
+        refresh_before = now - REFRESH_HOURS * 3600
+        due = []
+        for evaluation in evaluations:
+            entry = self.entries.get(_key(evaluation))
+            if not entry or entry[0] != _digest(evaluation) or entry[1] < refresh_before:
+                due.append(evaluation)
+        return due
+
+    def mark_submitted(self, evaluations, now=None):
+        now = now or time.time()
+        for evaluation in evaluations:
+            self.entries[_key(evaluation)] = [_digest(evaluation), now]
+
+    def evict_expired(self, now=None):
+        """Drop entries past the refresh window (resources that are gone, or due for resubmission anyway)."""
+        refresh_before = (now or time.time()) - REFRESH_HOURS * 3600
+        self.entries = {key: entry for key, entry in self.entries.items() if entry[1] >= refresh_before}
+
+    def save(self, now=None):
+        """Write the cache; never raises, since put_evaluations has already happened by now."""
+        self.evict_expired(now)
+        body = json.dumps(self.entries, separators=(',', ':'))
+        try:
+            with open(self.path, 'w') as fh:
+                fh.write(body)
+        except OSError as e:
+            print(f"Evaluation cache not written locally: {e}")
+        if CACHE_BUCKET:
+            try:
+                boto3.client('s3').put_object(Bucket=CACHE_BUCKET, Key=self.s3_key, Body=body.encode('utf-8'))
+            except Exception as e:
+                print(f"Evaluation cache not written to S3 for {self.rule_name}: {e}")
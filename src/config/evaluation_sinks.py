@@ -0,0 +1,146 @@
+"""
+Output layer for Config-style evaluators.
+
+An evaluator produces one list of EvaluationResult records per run and hands it to
+publish(), which fans the same results out to every configured sink concurrently:
+
+    config      -> AWS Config put_evaluations (needs the rule's resultToken)
+    securityhub -> Security Hub ASFF findings, change-only (see securityhub_findings.py)
+    jsonl       -> a local JSON Lines file (tests / offline runs)
+
+Sinks are selected with EVALUATION_SINKS (comma separated, default "config").
+"""
+import os
+import json
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+import securityhub_findings
+
+CONFIG_BATCH_SIZE = 100  # put_evaluations limit
+# Fingerprint store of the securityhub sink: /tmp for warm starts, optional S3 copy
+FINDING_STORE_DIR = os.getenv('FINDING_STORE_DIR', '/tmp')
+FINDING_STORE_BUCKET = os.getenv('FINGERPRINT_BUCKET', '')
+
+
+class EvaluationResult(dict):
+    """One compliance result, independent of where it is published."""
+
+    def __init__(self, resource_type, resource_id, compliant, annotation, ordering_timestamp, resource_arn=None, created_at=None):
+        super().__init__(
+            resource_type=resource_type,
+            resource_id=resource_id,
+            compliant=compliant,
+            annotation=annotation,
+            ordering_timestamp=ordering_timestamp,
+            resource_arn=resource_arn,
+            created_at=created_at or ordering_timestamp
+        )
+
+
+def _iso_z(value):
+    return value.astimezone(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+class ConfigSink:
+    name = 'config'
+
+    def __init__(self, result_token, client=None):
+        self.result_token = result_token
+        self.client = client or boto3.client('config')
+
+    def publish(self, results):
+        if self.result_token == 'TESTMODE':
+            return {'submitted': 0}
+        evaluations = [{
+            'ComplianceResourceType': r['resource_type'],
+            'ComplianceResourceId': r['resource_id'],
+            'ComplianceType': 'COMPLIANT' if r['compliant'] else 'NON_COMPLIANT',
+            'Annotation': r['annotation'][:256],
+            'OrderingTimestamp': r['ordering_timestamp']
+        } for r in results]
+        for i in range(0, len(evaluations), CONFIG_BATCH_SIZE):
+            self.client.put_evaluations(Evaluations=evaluations[i:i + CONFIG_BATCH_SIZE], ResultToken=self.result_token)
+        return {'submitted': len(evaluations)}
+
+
+class SecurityHubSink:
+    """
+    Failing resources become ACTIVE/FAILED findings, published change-only through
+    securityhub_findings (new, changed or refresh-due findings are imported); resources that
+    failed in an earlier run and now pass or are gone are archived as PASSED. Finding IDs
+    match CpuAlarmMissingeval's, so repeated runs update rather than duplicate.
+    """
+    name = 'securityhub'
+
+    def __init__(self, rule, account_id, region, client=None):
+        self.rule = rule
+        self.account_id = account_id
+        self.region = region
+        self.client = client or boto3.client('securityhub')
+
+    def to_finding(self, r):
+        resource = {
+            "Type": securityhub_findings.asff_resource_type(r['resource_type']),
+            "Id": r['resource_arn'] or r['resource_id'],
+            "Partition": "aws",
+            "Region": self.region
+        }
+        return securityhub_findings.build_finding(
+            self.rule, self.account_id, self.region, r['resource_id'], _iso_z(r['created_at']), resource, r['compliant'])
+
+    def archived(self, resource_id, created_at, resource):
+        return securityhub_findings.build_finding(
+            self.rule, self.account_id, self.region, resource_id, created_at, resource, passed=True)
+
+    def publish(self, results):
+        store = securityhub_findings.FindingStore(
+            os.path.join(FINDING_STORE_DIR, f"securityhub-findings-{self.rule}.json"),
+            FINDING_STORE_BUCKET, f"securityhub/{self.rule}.json")
+        failing = [(r['resource_id'], self.to_finding(r)) for r in results if not r['compliant']]
+        return securityhub_findings.sync_findings(self.client, store, failing, self.archived, self.rule)
+
+
+class JsonlSink:
+    name = 'jsonl'
+
+    def __init__(self, path):
+        self.path = path
+
+    def publish(self, results):
+        with open(self.path, 'a') as fh:
+            for r in results:
+                fh.write(json.dumps(r, default=str) + "\n")
+        return {'written': len(results)}
+
+
+def configured_sinks(result_token, rule, account_id, region, names=None):
+    names = names or [n.strip().lower() for n in os.getenv('EVALUATION_SINKS', 'config').split(',') if n.strip()]
+    sinks = []
+    for name in names:
+        if name == 'config':
+            sinks.append(ConfigSink(result_token))
+        elif name == 'securityhub':
+            sinks.append(SecurityHubSink(rule, account_id, region))
+        elif name == 'jsonl':
+            sinks.append(JsonlSink(os.getenv('EVALUATION_JSONL_PATH', '/tmp/evaluations.jsonl')))
+        else:
+            print(f"Unknown evaluation sink ignored: {name}")
+    return sinks
+
+
+def publish(results, sinks):
+    """Publish the same results to every sink concurrently; one failing sink does not block the others."""
+    def run(sink):
+        try:
+            return sink.name, sink.publish(results)
+        except Exception as e:
+            print(f"Sink {sink.name} failed: {e}")
+            return sink.name, {'error': str(e)}
+
+    if not sinks:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(sinks)) as exe:
+        return dict(exe.map(run, sinks))
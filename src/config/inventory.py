@@ -0,0 +1,119 @@
+"""
+Asyncio inventory engine over the existing (synchronous) boto3 clients.
+
+Independent listings run concurrently instead of one after another, so a sweep takes
+roughly as long as its longest paginator chain rather than the sum of all calls:
+
+    from inventory import Inventory
+
+    inventory = Inventory()
+    instances, alarms = inventory.run(
+        inventory.paginate(ec2, 'describe_instances', 'Reservations[].Instances[]',
+                           Filters=[{'Name': 'tag:ConfigRule', 'Values': ['True']}]),
+        inventory.paginate(cloudwatch, 'describe_alarms', 'MetricAlarms', AlarmTypes=['MetricAlarm']),
+    )
+    tags = inventory.run(inventory.each(logs, 'list_tags_for_resource', [{'resourceArn': a} for a in arns]))
+
+Each blocking boto3 call runs on a shared thread pool. Every call, including every page of
+a paginator, holds a permit from its service's semaphore, so one slow listing cannot
+starve the others and no service gets more concurrent calls than its limit. Limits are
+capped at the client's max_pool_connections so urllib3 does not discard connections.
+boto3 clients are thread-safe, so the handlers' module-level clients are used as they are.
+
+Environment:
+    INVENTORY_CONCURRENCY  default concurrent calls per service (default 8)
+    INVENTORY_LIMITS       per-service overrides, e.g. "ec2=10,cloudwatch=4,config=2"
+    INVENTORY_MAX_THREADS  size of the shared worker pool (default 32)
+"""
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import jmespath
+
+DEFAULT_CONCURRENCY = int(os.getenv("INVENTORY_CONCURRENCY", "8"))
+SERVICE_LIMITS = {
+    name.strip(): int(limit)
+    for name, _, limit in (item.partition("=") for item in os.getenv("INVENTORY_LIMITS", "").split(","))
+    if name.strip() and limit.strip()
+}
+MAX_THREADS = int(os.getenv("INVENTORY_MAX_THREADS", "32"))
+
+_executor = None
+_DONE = object()
+
+
+def _get_executor():
+    # Shared across invocations so warm starts reuse the worker threads.
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=MAX_THREADS, thread_name_prefix="inventory")
+    return _executor
+
+
+class Inventory:
+
+    def __init__(self, limits=None, default_limit=DEFAULT_CONCURRENCY):
+        self.limits = dict(SERVICE_LIMITS, **(limits or {}))
+        self.default_limit = default_limit
+        self._semaphores = {}
+
+    # ------------------------------
+    # Adapter for boto3 clients
+    # ------------------------------
+    def _semaphore(self, client):
+        service = client.meta.service_model.service_name
+        if service not in self._semaphores:
+            limit = self.limits.get(service, self.default_limit)
+            self._semaphores[service] = asyncio.Semaphore(max(1, min(limit, client.meta.config.max_pool_connections)))
+        return self._semaphores[service]
+
+    async def _blocking(self, client, fn, *args, **kwargs):
+        async with self._semaphore(client):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(_get_executor(), functools.partial(fn, *args, **kwargs))
+
+    async def call(self, client, operation, **params):
+        """One API call, e.g. await inventory.call(ec2, 'describe_regions')."""
+        return await self._blocking(client, getattr(client, operation), **params)
+
+    async def paginate(self, client, operation, expression=None, **params):
+        """All pages of a paginated operation; items selected by a JMESPath expression (or whole pages)."""
+        pages = iter(client.get_paginator(operation).paginate(**params))
+        items = []
+        while True:
+            page = await self._blocking(client, next, pages, _DONE)
+            if page is _DONE:
+                return items
+            if expression is None:
+                items.append(page)
+            else:
+                items.extend(jmespath.search(expression, page) or [])
+
+    async def each(self, client, operation, params_list, expression=None, return_exceptions=True):
+        """The same operation once per parameter set, concurrently (per-item lookups).
+
+        Results come back in input order; with return_exceptions a failed item yields its
+        exception instead of cancelling the rest.
+        """
+        async def one(params):
+            response = await self.call(client, operation, **params)
+            return jmespath.search(expression, response) if expression else response
+
+        return await asyncio.gather(*(one(p) for p in params_list), return_exceptions=return_exceptions)
+
+    # ------------------------------
+    # Entry point for sync handlers
+    # ------------------------------
+    async def gather(self, *needs, return_exceptions=False):
+        return await asyncio.gather(*needs, return_exceptions=return_exceptions)
+
+    def run(self, *needs, return_exceptions=False):
+        """Run the given inventory coroutines concurrently from synchronous code and return their results.
+
+        A single coroutine returns its result directly; several return a list in the same order.
+        """
+        self._semaphores = {}  # semaphores belong to the event loop asyncio.run creates
+        results = asyncio.run(self.gather(*needs, return_exceptions=return_exceptions))
+        return results[0] if len(needs) == 1 else results
@@ -0,0 +1,45 @@
+"""
+Deferred boto3 clients for the Config rule evaluators.
+
+    ec2 = LazyClient('ec2')
+    cloudwatch = LazyClient('cloudwatch', config=boto_config)
+
+Call sites stay as they are (ec2.describe_instances(...)); the real client is built on
+the first attribute access and then reused by warm invocations. A TESTMODE run never
+builds the config client, and a run with no matching instances never builds cloudwatch.
+Code that needs to configure the client (api_metrics hooks) registers with when_created().
+"""
+import threading
+
+import boto3
+
+
+class LazyClient:
+
+    def __init__(self, service_name, **client_kwargs):
+        self._service_name = service_name
+        self._client_kwargs = client_kwargs
+        self._client = None
+        self._on_create = []
+        self._lock = threading.Lock()
+
+    def _get(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    client = boto3.client(self._service_name, **self._client_kwargs)
+                    for callback in self._on_create:
+                        callback(client)
+                    self._client = client
+        return self._client
+
+    def when_created(self, callback):
+        """Run callback(client) once the real client exists (now, if it already does)."""
+        with self._lock:
+            if self._client is None:
+                self._on_create.append(callback)
+                return
+        callback(self._client)
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
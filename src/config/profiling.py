@@ -0,0 +1,207 @@
+"""
+Opt-in profiling for the Lambda / SSM script handlers.
+
+    from profiling import profiled, stage
+
+    @profiled
+    def lambda_handler(event, context):
+        with stage("inventory"):
+            ...
+        with stage("evaluate"):
+            ...
+
+This file ships in the evaluations bundle next to the Config rule handlers; src/,
+src/OMBASR and src/config/security-hub reach it through symlinks, so every handler
+directory imports it plainly. Only the scripts in src/ that can also run inline (SSM
+aws:executeScript) import it behind `try/except ImportError` with a pass-through
+`profiled`.
+
+Nothing is collected unless PROFILE is set, so the decorator and stage() cost nothing in
+normal runs. PROFILE is a comma-separated list (or "all"):
+
+    stages       wall-clock time per named stage (nested stages are reported as parent/child)
+    cprofile     cProfile of the handler thread; top-N functions go to the log and/or a
+                 pstats file in PROFILE_DIR (load with python -m pstats <file>)
+    tracemalloc  peak traced memory and the top allocation sites
+
+When the Lambda context is available, a partial report is also emitted
+PROFILE_TIMEOUT_MARGIN_MS before the function would time out, so a rule that times out
+in production still leaves a profile in its log.
+
+cProfile only sees the handler's own thread; time spent in ThreadPoolExecutor workers shows
+up as waiting in as_completed / result().
+
+Environment:
+    PROFILE                    stages,cprofile,tracemalloc | all (default: off)
+    PROFILE_TOP_N              rows of cProfile / tracemalloc output (default 25)
+    PROFILE_SORT               pstats sort key (default cumulative)
+    PROFILE_OUTPUT             log | file | both - where cProfile stats go (default log)
+    PROFILE_DIR                directory for pstats files (default /tmp)
+    PROFILE_TIMEOUT_MARGIN_MS  emit a partial report this long before timeout (default 2000)
+"""
+import os
+import io
+import json
+import time
+import threading
+import functools
+import contextlib
+
+_modes = {m.strip().lower() for m in os.getenv("PROFILE", "").split(",") if m.strip()}
+if "all" in _modes:
+    _modes = {"stages", "cprofile", "tracemalloc"}
+
+PROFILE_STAGES = "stages" in _modes
+PROFILE_CPROFILE = "cprofile" in _modes
+PROFILE_TRACEMALLOC = "tracemalloc" in _modes
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "25"))
+PROFILE_SORT = os.getenv("PROFILE_SORT", "cumulative")
+PROFILE_OUTPUT = os.getenv("PROFILE_OUTPUT", "log").lower()
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp")
+PROFILE_TIMEOUT_MARGIN_MS = int(os.getenv("PROFILE_TIMEOUT_MARGIN_MS", "2000"))
+
+_lock = threading.Lock()
+_local = threading.local()
+_stages = {}      # "parent/child" -> {"ms": float, "count": int}
+_open = {}        # "parent/child" -> start perf_counter, for the timeout report
+
+
+# ------------------------------
+# Stage spans
+# ------------------------------
+@contextlib.contextmanager
+def _stage(name):
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    path = "/".join(stack + [name])
+    stack.append(name)
+    start = time.perf_counter()
+    with _lock:
+        _open[path] = start
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter() - start) * 1000
+        stack.pop()
+        with _lock:
+            _open.pop(path, None)
+            entry = _stages.setdefault(path, {"ms": 0.0, "count": 0})
+            entry["ms"] += elapsed
+            entry["count"] += 1
+
+
+def stage(name):
+    """Time a named block of the handler; a no-op unless PROFILE includes stages."""
+    return _stage(name) if PROFILE_STAGES else contextlib.nullcontext()
+
+
+# ------------------------------
+# Reporting
+# ------------------------------
+class _Snapshot:
+    """Feeds pstats a copy of a still-running profiler without disabling it."""
+
+    def __init__(self, profiler):
+        profiler.snapshot_stats()
+        self.stats = profiler.stats
+
+    def create_stats(self):
+        pass
+
+
+def _cprofile_report(profiler, name, partial):
+    import pstats
+
+    stats = pstats.Stats(_Snapshot(profiler) if partial else profiler)
+    if PROFILE_OUTPUT in ("file", "both"):
+        path = os.path.join(PROFILE_DIR, f"profile-{name}-{int(time.time())}{'-partial' if partial else ''}.pstats")
+        stats.dump_stats(path)
+        print(f"🔬 cProfile stats written to {path}")
+    if PROFILE_OUTPUT in ("log", "both"):
+        out = io.StringIO()
+        stats.stream = out
+        stats.sort_stats(PROFILE_SORT).print_stats(PROFILE_TOP_N)
+        print(f"🔬 cProfile top {PROFILE_TOP_N} by {PROFILE_SORT} ({name}{', partial' if partial else ''}):\n{out.getvalue()}")
+
+
+def _tracemalloc_report():
+    import tracemalloc
+
+    current, peak = tracemalloc.get_traced_memory()
+    top = tracemalloc.take_snapshot().statistics("lineno")[:PROFILE_TOP_N]
+    return {
+        "current_kb": round(current / 1024, 1),
+        "peak_kb": round(peak / 1024, 1),
+        "top": [f"{s.traceback[0].filename}:{s.traceback[0].lineno} {round(s.size / 1024, 1)}KB x{s.count}" for s in top],
+    }
+
+
+def _report(name, started, profiler=None, partial=False):
+    record = {"profile": name, "total_ms": round((time.perf_counter() - started) * 1000, 1), "partial": partial}
+    if PROFILE_STAGES:
+        now = time.perf_counter()
+        with _lock:
+            record["stages_ms"] = {path: round(e["ms"], 1) for path, e in _stages.items()}
+            record["stage_counts"] = {path: e["count"] for path, e in _stages.items() if e["count"] > 1}
+            if _open:
+                record["open_stages_ms"] = {path: round((now - t) * 1000, 1) for path, t in _open.items()}
+    if PROFILE_TRACEMALLOC:
+        record["tracemalloc"] = _tracemalloc_report()
+    print("🔬 " + json.dumps(record))
+    if profiler is not None:
+        _cprofile_report(profiler, name, partial)
+
+
+# ------------------------------
+# Decorator
+# ------------------------------
+def profiled(handler):
+    """Decorator: profile each invocation according to PROFILE; returns the handler untouched when off."""
+    if not _modes:
+        return handler
+
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        name = getattr(context, "function_name", None) or f"{handler.__module__}.{handler.__name__}"
+        with _lock:
+            _stages.clear()
+            _open.clear()
+        started = time.perf_counter()
+
+        if PROFILE_TRACEMALLOC:
+            import tracemalloc
+            tracemalloc.start()
+            tracemalloc.reset_peak()
+
+        profiler = None
+        if PROFILE_CPROFILE:
+            import cProfile
+            profiler = cProfile.Profile()
+
+        timer = None
+        remaining = getattr(context, "get_remaining_time_in_millis", None)
+        if remaining is not None:
+            delay = (remaining() - PROFILE_TIMEOUT_MARGIN_MS) / 1000
+            if delay > 0:
+                timer = threading.Timer(delay, _report, args=(name, started, profiler, True))
+                timer.daemon = True
+                timer.start()
+
+        try:
+            if profiler is not None:
+                return profiler.runcall(handler, event, context)
+            return handler(event, context)
+        finally:
+            if timer is not None:
+                timer.cancel()
+                timer.join()  # a partial report already in progress finishes before the final one
+            try:
+                _report(name, started, profiler)
+            except Exception as e:
+                print(f"⚠️ Could not write profile report: {e}")
+            if PROFILE_TRACEMALLOC:
+                import tracemalloc
+                tracemalloc.stop()
+
+    return wrapper
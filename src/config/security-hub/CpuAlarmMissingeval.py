@@ -1,70 +1,64 @@
 import boto3
 import os
-import datetime
-import uuid
-import json
+
+from securityhub_findings import FindingStore, asff_resource_type, build_finding, sync_findings
+from api_metrics import instrumented
+from profiling import profiled
 
 ec2 = boto3.client('ec2')
 cloudwatch = boto3.client('cloudwatch')
 securityhub = boto3.client('securityhub')
+s3 = boto3.client('s3')
+
+# Fingerprint store: /tmp copy for warm starts, S3 object as the durable copy (local file only when unset)
+FINGERPRINT_PATH = os.getenv('FINGERPRINT_PATH', '/tmp/cpu-alarm-findings.json')
+FINGERPRINT_BUCKET = os.getenv('FINGERPRINT_BUCKET', '')
+FINGERPRINT_KEY = os.getenv('FINGERPRINT_KEY', 'securityhub/cpu-alarm-findings.json')
+
+def instance_finding(rule, account_id, region, instance_id, created_at, passed=False):
+    resource = {
+        "Type": asff_resource_type("AWS::EC2::Instance"),
+        "Id": f"arn:aws:ec2:{region}:{account_id}:instance/{instance_id}",
+        "Partition": "aws",
+        "Region": region
+    }
+    return build_finding(rule, account_id, region, instance_id, created_at, resource, passed)
 
+@instrumented
+@profiled
 def lambda_handler(event, context):
     region = os.environ['AWS_REGION']
     account_id = context.invoked_function_arn.split(":")[4]
+    rule = os.environ["GENERATOR_ID"]
     
-    response = ec2.describe_instances(Filters=[
-        {'Name': 'tag:ConfigRule', 'Values': ['True']}
-    ])
-    
-    findings = []
-
-    for reservation in response['Reservations']:
-        for instance in reservation['Instances']:
-            instance_id = instance['InstanceId']
-            instance_arn = f"arn:aws:ec2:{region}:{account_id}:instance/{instance_id}"
-            launch_time = instance['LaunchTime'].isoformat() + "Z"
+    # One paginated alarm listing, indexed by instance, instead of a describe_alarms call per instance
+    instances_with_cpu_alarm = set()
+    for page in cloudwatch.get_paginator('describe_alarms').paginate(AlarmTypes=['MetricAlarm']):
+        for alarm in page['MetricAlarms']:
+            if alarm.get('MetricName') != 'CPUUtilization':
+                continue
+            for dimension in alarm.get('Dimensions', []):
+                if dimension['Name'] == 'InstanceId':
+                    instances_with_cpu_alarm.add(dimension['Value'])
 
-            # Default: non-compliant
-            compliant = False
+    store = FindingStore(FINGERPRINT_PATH, FINGERPRINT_BUCKET, FINGERPRINT_KEY, s3)
+    failing = []
 
-            alarms = cloudwatch.describe_alarms(AlarmTypes=['MetricAlarm'])['MetricAlarms']
-            for alarm in alarms:
-                dimensions = {d['Name']: d['Value'] for d in alarm.get('Dimensions', [])}
-                if dimensions.get('InstanceId') == instance_id and alarm.get('MetricName') == 'CPUUtilization':
-                    compliant = True
-                    break
+    paginator = ec2.get_paginator('describe_instances')
+    for page in paginator.paginate(Filters=[{'Name': 'tag:ConfigRule', 'Values': ['True']}]):
+        for reservation in page['Reservations']:
+            for instance in reservation['Instances']:
+                instance_id = instance['InstanceId']
+                launch_time = instance['LaunchTime'].strftime("%Y-%m-%dT%H:%M:%S.%fZ")
 
-            if not compliant:
-                findings.append({
-                    "SchemaVersion": "2018-10-08",
-                    "Id": str(uuid.uuid4()),
-                    "ProductArn": os.environ["SECURITY_HUB_PRODUCT_ARN"],
-                    "GeneratorId": os.environ["GENERATOR_ID"],
-                    "AwsAccountId": account_id,
-                    "Types": ["Software and Configuration Checks/AWS Security Best Practices"],
-                    "CreatedAt": launch_time,
-                    "UpdatedAt": datetime.datetime.utcnow().isoformat() + "Z",
-                    "Severity": { "Label": os.environ["SEVERITY"] },
-                    "Title": os.environ["COMPLIANCE_TITLE"],
-                    "Description": os.environ["COMPLIANCE_DESCRIPTION"],
-                    "Resources": [{
-                        "Type": "AwsEc2Instance",
-                        "Id": instance_arn,
-                        "Partition": "aws",
-                        "Region": region
-                    }],
-                    "Compliance": {
-                        "Status": "FAILED",
-                        "SecurityControlId": os.environ.get("SECURITY_CONTROL_ID", ""),
-                        "RelatedRequirements": json.loads(os.environ.get("RELATED_REQUIREMENTS", "[]"))
-                    },
-                    "RecordState": "ACTIVE"
-                })
+                if instance_id not in instances_with_cpu_alarm:
+                    failing.append((instance_id, instance_finding(rule, account_id, region, instance_id, launch_time)))
 
-    if findings:
-        securityhub.batch_import_findings(Findings=findings)
-
-    return {
-        'status': 'completed',
-        'findings_sent': len(findings)
-    }
+    # Only new, changed or refresh-due findings are imported; findings from the last run
+    # that are no longer failing are archived as PASSED / INFORMATIONAL
+    stats = sync_findings(
+        securityhub, store, failing,
+        lambda instance_id, created_at, _: instance_finding(rule, account_id, region, instance_id, created_at, passed=True),
+        "CpuAlarmMissingeval"
+    )
+    return dict(status='completed', **stats)
@@ -0,0 +1 @@
+../api_metrics.py
\ No newline at end of file
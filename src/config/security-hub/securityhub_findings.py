@@ -0,0 +1 @@
+../securityhub_findings.py
\ No newline at end of file
@@ -0,0 +1,255 @@
+"""
+Change-only publication of Security Hub findings, shared by CpuAlarmMissingeval.py and
+the securityhub sink in evaluation_sinks.py.
+
+A FindingStore remembers, per finding ID, the fingerprint of the last ACTIVE finding
+imported for a resource and when it was imported:
+
+    {finding_id: [fingerprint, resource_id, created_at, imported_at, resource]}
+
+sync_findings() then imports only ACTIVE findings that are new, changed, or older than
+FINDING_REFRESH_HOURS (Security Hub deletes findings not updated for 90 days), and
+archives as PASSED/RESOLVED the findings of resources that are no longer failing.
+Imports go out in chunks of 100 with bounded concurrency, and only the findings
+Security Hub reports as failed are retried.
+
+build_finding() is the one place an ASFF finding is assembled, so ACTIVE findings and
+the archived PASSED ones carry the same severity (INFORMATIONAL once passed) and resource
+types whichever handler publishes them.
+
+The store lives in /tmp for warm starts; give it a bucket to keep a durable copy in S3.
+This file ships in the evaluations bundle; src/config/security-hub reaches it through a
+symlink.
+"""
+import os
+import json
+import time
+import hashlib
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+IMPORT_BATCH_SIZE = 100  # batch_import_findings / batch_update_findings accept at most 100 findings per call
+MAX_IMPORT_WORKERS = int(os.getenv('MAX_IMPORT_WORKERS', '4'))
+MAX_IMPORT_ATTEMPTS = int(os.getenv('MAX_IMPORT_ATTEMPTS', '3'))
+FINDING_REFRESH_HOURS = float(os.getenv('FINDING_REFRESH_HOURS', '168'))
+
+# Config resource types with a matching ASFF Resources[].Type; everything else is published as Other
+ASFF_RESOURCE_TYPES = {
+    'AWS::Backup::BackupPlan': 'AwsBackupBackupPlan',
+    'AWS::Backup::BackupVault': 'AwsBackupBackupVault',
+    'AWS::Backup::RecoveryPoint': 'AwsBackupRecoveryPoint',
+    'AWS::CloudTrail::Trail': 'AwsCloudTrailTrail',
+    'AWS::CloudWatch::Alarm': 'AwsCloudWatchAlarm',
+    'AWS::DynamoDB::Table': 'AwsDynamoDbTable',
+    'AWS::EC2::EIP': 'AwsEc2Eip',
+    'AWS::EC2::Instance': 'AwsEc2Instance',
+    'AWS::EC2::NetworkInterface': 'AwsEc2NetworkInterface',
+    'AWS::EC2::SecurityGroup': 'AwsEc2SecurityGroup',
+    'AWS::EC2::Subnet': 'AwsEc2Subnet',
+    'AWS::EC2::Volume': 'AwsEc2Volume',
+    'AWS::EC2::VPC': 'AwsEc2Vpc',
+    'AWS::IAM::Policy': 'AwsIamPolicy',
+    'AWS::IAM::Role': 'AwsIamRole',
+    'AWS::IAM::User': 'AwsIamUser',
+    'AWS::KMS::Key': 'AwsKmsKey',
+    'AWS::Lambda::Function': 'AwsLambdaFunction',
+    'AWS::RDS::DBCluster': 'AwsRdsDbCluster',
+    'AWS::RDS::DBInstance': 'AwsRdsDbInstance',
+    'AWS::RDS::DBSnapshot': 'AwsRdsDbSnapshot',
+    'AWS::S3::Bucket': 'AwsS3Bucket',
+    'AWS::SNS::Topic': 'AwsSnsTopic',
+    'AWS::SQS::Queue': 'AwsSqsQueue',
+    'AWS::SSM::PatchCompliance': 'AwsSsmPatchCompliance',
+}
+
+
+def finding_id(rule, account_id, region, resource_id):
+    """Stable finding ID so each periodic run updates the same finding instead of creating a new one."""
+    return f"{rule}/{account_id}/{region}/{resource_id}"
+
+
+def asff_resource_type(resource_type):
+    """AWS::EC2::Instance -> AwsEc2Instance; types without an ASFF equivalent (e.g. AWS::Logs::LogGroup) are Other."""
+    return ASFF_RESOURCE_TYPES.get(resource_type, 'Other')
+
+
+def build_finding(rule, account_id, region, resource_id, created_at, resource, passed=False):
+    """
+    ASFF finding for one resource: ACTIVE/FAILED with the SEVERITY label, or, once the
+    resource passes, ARCHIVED/PASSED with INFORMATIONAL severity.
+    """
+    return {
+        "SchemaVersion": "2018-10-08",
+        "Id": finding_id(rule, account_id, region, resource_id),
+        "ProductArn": os.environ["SECURITY_HUB_PRODUCT_ARN"],
+        "GeneratorId": rule,
+        "AwsAccountId": account_id,
+        "Types": ["Software and Configuration Checks/AWS Security Best Practices"],
+        "CreatedAt": created_at,
+        "UpdatedAt": datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+        "Severity": {"Label": "INFORMATIONAL" if passed else os.environ["SEVERITY"]},
+        "Title": os.environ["COMPLIANCE_TITLE"],
+        "Description": os.environ["COMPLIANCE_DESCRIPTION"],
+        "Resources": [resource or {"Type": "Other", "Id": resource_id, "Partition": "aws", "Region": region}],
+        "Compliance": {
+            "Status": "PASSED" if passed else "FAILED",
+            "SecurityControlId": os.environ.get("SECURITY_CONTROL_ID", ""),
+            "RelatedRequirements": json.loads(os.environ.get("RELATED_REQUIREMENTS", "[]"))
+        },
+        "RecordState": "ARCHIVED" if passed else "ACTIVE"
+    }
+
+
+def fingerprint(finding):
+    """Hash of everything that matters in a finding; UpdatedAt changes every run and is excluded."""
+    stable = {k: v for k, v in finding.items() if k != 'UpdatedAt'}
+    return hashlib.sha256(json.dumps(stable, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def due_for_import(stored, entry, now):
+    """True for a new or changed finding, or one last imported more than FINDING_REFRESH_HOURS ago."""
+    if not stored or stored[:3] != entry[:3] or len(stored) < 4:
+        return True
+    return stored[3] < now - FINDING_REFRESH_HOURS * 3600
+
+
+# ------------------------------
+# Fingerprint store
+# ------------------------------
+class FindingStore:
+
+    def __init__(self, path, bucket='', key='', s3=None):
+        self.path = path
+        self.bucket = bucket
+        self.key = key
+        self.s3 = s3
+        self.entries = self._load()
+
+    def _s3(self):
+        if self.s3 is None:
+            self.s3 = boto3.client('s3')
+        return self.s3
+
+    def _load(self):
+        try:
+            with open(self.path) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            pass
+        if self.bucket:
+            try:
+                body = self._s3().get_object(Bucket=self.bucket, Key=self.key)['Body'].read()
+                return json.loads(body)
+            except Exception as e:
+                print(f"No durable fingerprint store loaded: {e}")
+        return {}
+
+    def save(self):
+        body = json.dumps(self.entries, separators=(",", ":"))
+        with open(self.path, 'w') as fh:
+            fh.write(body)
+        if self.bucket:
+            self._s3().put_object(Bucket=self.bucket, Key=self.key, Body=body.encode('utf-8'))
+
+
+# ------------------------------
+# Security Hub calls
+# ------------------------------
+def _import_batch(client, batch):
+    """Import one batch, retrying only the findings Security Hub reports as failed. Returns the final failures."""
+    pending = batch
+    for attempt in range(MAX_IMPORT_ATTEMPTS):
+        failed = client.batch_import_findings(Findings=pending).get('FailedFindings', [])
+        if not failed:
+            return []
+        failed_ids = {f['Id'] for f in failed}
+        pending = [f for f in pending if f['Id'] in failed_ids]
+        if attempt + 1 < MAX_IMPORT_ATTEMPTS:
+            time.sleep(2 ** attempt)
+    for f in failed:
+        print(f"Failed to import finding {f['Id']}: {f.get('ErrorCode')} {f.get('ErrorMessage')}")
+    return failed
+
+
+def import_findings(client, findings):
+    """Send findings in chunks of 100 with bounded concurrency; returns the findings that never imported."""
+    batches = [findings[i:i + IMPORT_BATCH_SIZE] for i in range(0, len(findings), IMPORT_BATCH_SIZE)]
+    if not batches:
+        return []
+    with ThreadPoolExecutor(max_workers=MAX_IMPORT_WORKERS) as exe:
+        return [f for failed in exe.map(lambda batch: _import_batch(client, batch), batches) for f in failed]
+
+
+def resolve_workflow(client, findings, updated_by):
+    """Mark recovered findings RESOLVED in batches of 100 via batch_update_findings."""
+    identifiers = [{"Id": f["Id"], "ProductArn": f["ProductArn"]} for f in findings]
+    for i in range(0, len(identifiers), IMPORT_BATCH_SIZE):
+        response = client.batch_update_findings(
+            FindingIdentifiers=identifiers[i:i + IMPORT_BATCH_SIZE],
+            Workflow={"Status": "RESOLVED"},
+            Note={"Text": "Resource is compliant again or no longer exists.", "UpdatedBy": updated_by}
+        )
+        for f in response.get('UnprocessedFindings', []):
+            print(f"Failed to resolve finding {f['FindingIdentifier']['Id']}: {f.get('ErrorMessage')}")
+
+
+# ------------------------------
+# Change-only sync
+# ------------------------------
+def plan(entries, failing, now):
+    """
+    Split the ACTIVE findings of this run into those to import and the store entries to keep.
+
+    failing is a list of (resource_id, finding). Returns (to_import, current, recovered_ids):
+    current maps every failing finding ID to its new store entry, and recovered_ids are the
+    stored findings whose resource is no longer failing.
+    """
+    to_import, current = [], {}
+    for resource_id, finding in failing:
+        entry = [fingerprint(finding), resource_id, finding["CreatedAt"]]
+        stored = entries.get(finding["Id"])
+        if due_for_import(stored, entry, now):
+            to_import.append(finding)
+            entry.append(now)
+        else:
+            entry.append(stored[3])
+        entry.append(finding["Resources"][0])
+        current[finding["Id"]] = entry
+    recovered_ids = [fid for fid in entries if fid not in current]
+    return to_import, current, recovered_ids
+
+
+def sync_findings(client, store, failing, build_archived, updated_by, now=None):
+    """
+    Publish the ACTIVE findings that need it, archive the ones that recovered and save the store.
+
+    build_archived(resource_id, created_at, resource) returns the ARCHIVED/PASSED finding for a
+    stored entry whose resource is compliant again or gone (resource is None for entries written
+    by older versions). Failed imports are kept out of the store so the next run retries them.
+    """
+    now = now or time.time()
+    findings, current, recovered_ids = plan(store.entries, failing, now)
+    recovered = []
+    for fid in recovered_ids:
+        entry = store.entries[fid]
+        recovered.append(build_archived(entry[1], entry[2], entry[4] if len(entry) > 4 else None))
+
+    failed = import_findings(client, findings + recovered)
+    failed_ids = {f['Id'] for f in failed}
+    resolved = [f for f in recovered if f["Id"] not in failed_ids]
+    if resolved:
+        resolve_workflow(client, resolved, updated_by)
+
+    entries = {fid: entry for fid, entry in current.items() if fid not in failed_ids}
+    entries.update({fid: store.entries[fid] for fid in failed_ids if fid in store.entries})
+    store.entries = entries
+    store.save()
+
+    return {
+        'findings_sent': len(findings) - len(failed_ids & {f["Id"] for f in findings}),
+        'findings_archived': len(resolved),
+        'findings_unchanged': len(current) - len(findings),
+        'findings_failed': len(failed)
+    }
@@ -1,7 +1,11 @@
 import boto3
+from api_metrics import instrumented
+from profiling import profiled
 
 config = boto3.client('config')
 
+@instrumented
+@profiled
 def handler(event, context):
     try:
         # Extract rule name from the event payload
@@ -1,9 +1,13 @@
 import boto3
 import os
+from api_metrics import instrumented
+from profiling import profiled
 
 config = boto3.client('config')
 logs = boto3.client('logs')
 
+@instrumented
+@profiled
 def handler(event, context):
     rule_arn = os.environ.get("CONFIG_RULE_ARN")
     function_name = context.function_name
@@ -1,30 +1,123 @@
 import boto3
 import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from api_metrics import instrumented
+from profiling import profiled
 
 config = boto3.client('config')
 
+MAX_WORKERS = int(os.getenv('MAX_TAG_WORKERS', '8'))
+DESCRIBE_BATCH_SIZE = 25  # describe_config_rules accepts at most 25 names per call
+
+# Define tags to apply
+TAGS = [
+    {'Key': 'Environment', 'Value': 'Production'},
+    {'Key': 'Team', 'Value': 'CloudOps'}
+]
+
+
+def rule_from_event(event):
+    """Return (rule_name, rule_arn or None) from a PutConfigRule EventBridge event."""
+    detail = event['detail']
+    rule = detail['requestParameters']['configRule']
+    # Config rule ARNs end in the rule ID, not the name, so only trust an ARN the event carries
+    rule_arn = rule.get('configRuleArn') or (detail.get('responseElements') or {}).get('configRuleArn')
+    return rule['configRuleName'], rule_arn
+
+
+def resolve_rule_arns(rule_names):
+    """Resolve many rule names to ARNs with batched describe_config_rules calls."""
+    arns = {}
+    names = sorted(rule_names)
+    for i in range(0, len(names), DESCRIBE_BATCH_SIZE):
+        chunk = names[i:i + DESCRIBE_BATCH_SIZE]
+        try:
+            rules = config.describe_config_rules(ConfigRuleNames=chunk)['ConfigRules']
+        except config.exceptions.NoSuchConfigRuleException:
+            # One missing name fails the whole call; fall back to per-name lookups for this chunk
+            rules = []
+            for name in chunk:
+                try:
+                    rules.extend(config.describe_config_rules(ConfigRuleNames=[name])['ConfigRules'])
+                except config.exceptions.NoSuchConfigRuleException:
+                    print(f"❌ Config rule not found: {name}")
+        for rule in rules:
+            arns[rule['ConfigRuleName']] = rule['ConfigRuleArn']
+    return arns
+
+
+def batch_handler(event, context):
+    """
+    SQS-batched mode: tag every rule in the batch once, de-duplicated by rule name,
+    and report only the failed messages so SQS retries just those.
+    """
+    messages_by_rule = {}
+    known_arns = {}
+    failures = []
+
+    for record in event['Records']:
+        try:
+            rule_name, rule_arn = rule_from_event(json.loads(record['body']))
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"❌ Unparseable message {record['messageId']}: {e}")
+            failures.append(record['messageId'])
+            continue
+        messages_by_rule.setdefault(rule_name, []).append(record['messageId'])
+        if rule_arn:
+            known_arns[rule_name] = rule_arn
+
+    print(f"📥 {len(event['Records'])} messages for {len(messages_by_rule)} distinct rules")
+
+    missing = set(messages_by_rule) - set(known_arns)
+    if missing:
+        try:
+            known_arns.update(resolve_rule_arns(missing))
+        except Exception as e:
+            print(f"❌ Error resolving rule ARNs: {str(e)}")
+
+    def tag(rule_name):
+        rule_arn = known_arns.get(rule_name)
+        if not rule_arn:
+            return rule_name, False
+        try:
+            config.tag_resource(ResourceArn=rule_arn, Tags=TAGS)
+            print(f"🏷️ Tags applied successfully to: {rule_arn}")
+            return rule_name, True
+        except Exception as e:
+            print(f"❌ Error tagging Config Rule {rule_name}: {str(e)}")
+            return rule_name, False
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as exe:
+        for rule_name, ok in exe.map(tag, list(messages_by_rule)):
+            if not ok:
+                failures.extend(messages_by_rule[rule_name])
+
+    return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failures]}
+
+
+@instrumented
+@profiled
 def lambda_handler(event, context):
+    if 'Records' in event:
+        return batch_handler(event, context)
+
     print("📥 Event received:")
     print(json.dumps(event))
 
     try:
         # Extract the config rule name from the event
-        rule_name = event['detail']['requestParameters']['configRule']['configRuleName']
+        rule_name, rule_arn = rule_from_event(event)
         print(f"🔍 Config rule name: {rule_name}")
 
-        # Get the rule ARN using DescribeConfigRules
-        response = config.describe_config_rules(ConfigRuleNames=[rule_name])
-        rule_arn = response['ConfigRules'][0]['ConfigRuleArn']
+        # Get the rule ARN using DescribeConfigRules when the event does not carry it
+        if not rule_arn:
+            response = config.describe_config_rules(ConfigRuleNames=[rule_name])
+            rule_arn = response['ConfigRules'][0]['ConfigRuleArn']
         print(f"📌 Found rule ARN: {rule_arn}")
 
-        # Define tags to apply
-        tags = [
-            {'Key': 'Environment', 'Value': 'Production'},
-            {'Key': 'Team', 'Value': 'CloudOps'}
-        ]
-
         # Apply tags
-        config.tag_resource(ResourceArn=rule_arn, Tags=tags)
+        config.tag_resource(ResourceArn=rule_arn, Tags=TAGS)
         print(f"🏷️ Tags applied successfully to: {rule_arn}")
 
         return {
@@ -4,6 +4,8 @@ import boto3
 import os
 import json
 import urllib3
+from api_metrics import instrumented
+from profiling import profiled
 
 config = boto3.client('config')
 http = urllib3.PoolManager()
@@ -35,6 +37,8 @@ def send_response(event, context, status, data, physical_resource_id=None, reaso
         print(f"❌ Failed to send CloudFormation response: {str(e)}")
 
 
+@instrumented
+@profiled
 def lambda_handler(event, context):
     print("📦 Received event:")
     print(json.dumps(event))
@@ -101,6 +105,8 @@ import cfnresponse
 
 config = boto3.client('config')
 
+@instrumented
+@profiled
 def lambda_handler(event, context):
     print("📦 Received event:")
     print(json.dumps(event))
@@ -155,6 +161,8 @@ import boto3
 import os
 import json
 
+@instrumented
+@profiled
 def lambda_handler(event, context):
     config = boto3.client('config')
     rule_arn = os.environ['CONFIG_RULE_ARN']
@@ -201,6 +209,8 @@ import os
 
 config = boto3.client('config')
 
+@instrumented
+@profiled
 def lambda_handler(event, context):
     arn = os.environ['CONFIG_RULE_ARN']
     if event['RequestType'] == 'Create':
@@ -220,6 +230,8 @@ def lambda_handler(event, context):
 import boto3
 import os
 
+@instrumented
+@profiled
 def lambda_handler(event, context):
     config = boto3.client('config')
     rule_arn = os.environ['CONFIG_RULE_ARN']
@@ -14,7 +14,22 @@ export function getCleanupOrphanLogGroupsPolicies(ruleName: string, accountID: s
             Action: [
               'logs:DescribeLogGroups',
               'logs:DeleteLogGroup',
-              'logs:ListTagsLogGroup'
+              'logs:ListTagsLogGroup',
+              'logs:ListTagsForResource',
+              'logs:DescribeMetricFilters',
+              'logs:DescribeSubscriptionFilters'
+            ],
+            Resource: '*'
+          },
+
+          // 🔎 Bulk orphan evaluation and cleanup (delete-tags.py / cleanup-orphans.py)
+          {
+            Sid: 'BulkOrphanLookup',
+            Effect: 'Allow',
+            Action: [
+              'tag:GetResources',
+              'config:DescribeConfigRules',
+              'config:GetComplianceDetailsByConfigRule'
             ],
             Resource: '*'
           },
@@ -1,10 +1,149 @@
 import boto3
+import os
+import json
 import time
+import hashlib
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+try:
+    from api_metrics import instrumented
+except ImportError:  # inline / single-file deployment: no API call metrics
+    def instrumented(handler):
+        return handler
+
+# Query engine tuning (env overridable)
+MAX_CONCURRENT_QUERIES = int(os.getenv("MAX_CONCURRENT_QUERIES", "5"))   # stay under the account's concurrent Insights limit
+SHARD_SECONDS = int(os.getenv("SHARD_SECONDS", "3600"))                    # shard width, also the cache time bucket
+QUERY_TIMEOUT_SECONDS = int(os.getenv("QUERY_TIMEOUT_SECONDS", "600"))     # overall deadline per shard query
+POLL_INITIAL_SECONDS = 0.5
+POLL_MAX_SECONDS = 8
+CACHE_DIR = os.getenv("INSIGHTS_CACHE_DIR", "/tmp/insights-cache")
+CACHE_SETTLE_SECONDS = 300  # shards ending closer to "now" than this may still receive events; never cache them
+# Per-shard stats rows can't simply be concatenated (counts/avgs/percentiles per group would be split)
+AGGREGATION_RE = re.compile(r"(^|\|)\s*stats\s", re.IGNORECASE)
+
+
+def split_time_range(start_time, end_time, shard_seconds=SHARD_SECONDS):
+    """Split [start_time, end_time) (epoch seconds) into shards aligned to shard_seconds buckets."""
+    shards = []
+    cursor = start_time
+    while cursor < end_time:
+        bucket_end = (cursor // shard_seconds + 1) * shard_seconds
+        shard_end = min(bucket_end, end_time)
+        shards.append((cursor, shard_end))
+        cursor = shard_end
+    return shards
+
+
+def is_aggregation(query_string):
+    """True for queries with a stats command; those run unsharded over the whole range."""
+    return bool(AGGREGATION_RE.search(query_string))
+
+
+def _is_full_bucket(shard, shard_seconds=SHARD_SECONDS):
+    """Only whole, aligned buckets recur between runs; the partial edge shards never hit the cache."""
+    return shard[0] % shard_seconds == 0 and shard[1] - shard[0] == shard_seconds
+
+
+def _cache_path(query_string, log_group_names, shard):
+    key = json.dumps([query_string.strip(), sorted(log_group_names), shard[0], shard[1]])
+    return os.path.join(CACHE_DIR, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+
+
+def _cache_get(query_string, log_group_names, shard):
+    try:
+        with open(_cache_path(query_string, log_group_names, shard)) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _cache_put(query_string, log_group_names, shard, rows):
+    if not _is_full_bucket(shard) or shard[1] > time.time() - CACHE_SETTLE_SECONDS:
+        return
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        path = _cache_path(query_string, log_group_names, shard)
+        with open(path + ".tmp", "w") as fh:
+            json.dump(rows, fh)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        print(f"Cache write skipped: {e}")
+
+
+def run_shard_query(client, log_group_names, query_string, shard, timeout=QUERY_TIMEOUT_SECONDS):
+    """Run one Insights query over a single shard, polling with exponential backoff until a deadline."""
+    cached = _cache_get(query_string, log_group_names, shard)
+    if cached is not None:
+        return cached
+
+    response = client.start_query(
+        logGroupNames=log_group_names,
+        startTime=shard[0],
+        endTime=shard[1],
+        queryString=query_string
+    )
+    query_id = response['queryId']
+    print(f"Started query {query_id} for shard {shard[0]}-{shard[1]}")
+
+    deadline = time.monotonic() + timeout
+    delay = POLL_INITIAL_SECONDS
+    while True:
+        result = client.get_query_results(queryId=query_id)
+        status = result['status']
+
+        if status == 'Complete':
+            # Filter out @ptr field
+            rows = [
+                {col['field']: col['value'] for col in row if col['field'] != '@ptr'}
+                for row in result['results']
+            ]
+            _cache_put(query_string, log_group_names, shard, rows)
+            return rows
+        if status not in ('Running', 'Scheduled'):
+            raise Exception(f"Query {query_id} failed with status: {status}")
+        if time.monotonic() + delay > deadline:
+            try:
+                client.stop_query(queryId=query_id)
+            except Exception:
+                pass
+            raise TimeoutError(f"Query {query_id} did not complete within {timeout}s")
+
+        time.sleep(delay)
+        delay = min(delay * 2, POLL_MAX_SECONDS)
+
+
+def run_sharded_query(client, log_group_names, query_string, start_time, end_time,
+                      max_workers=MAX_CONCURRENT_QUERIES, sort_field='@timestamp', descending=True, limit=None):
+    """Run query_string over every shard of the time range concurrently and merge the results."""
+    if is_aggregation(query_string):
+        print("Aggregation query: running it over the whole range without sharding")
+        shards = [(start_time, end_time)]
+    else:
+        shards = split_time_range(start_time, end_time)
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(shards)))) as exe:
+        futs = {exe.submit(run_shard_query, client, log_group_names, query_string, s): s for s in shards}
+        for fut in as_completed(futs):
+            results.extend(fut.result())
+
+    if sort_field:
+        results.sort(key=lambda r: r.get(sort_field, ''), reverse=descending)
+    if limit:
+        results = results[:limit]
+    return results
+
+
+@instrumented
 def script_handler(event, context):
     """
     AWS Lambda handler to execute a CloudWatch Logs Insights query.
 
+    The time range is split into SHARD_SECONDS shards that run concurrently; whole,
+    settled buckets are cached in /tmp so overlapping windows only query the partial edge
+    shards and the new buckets. Queries with a stats command are not sharded.
+
     Parameters:
         event (dict): Event data passed to the Lambda function.
         context (LambdaContext): Context object provided by AWS Lambda.
@@ -15,56 +154,35 @@ def script_handler(event, context):
     client = boto3.client('logs')
 
     # Extract parameters from the event
-    log_group_name = event.get('log_group_name', '/aws/your-log-group-name')
+    log_group_names = event.get('log_group_names') or [event.get('log_group_name', '/aws/your-log-group-name')]
     time_range = event.get('time_range', 3600)  # Default: Last 1 hour
+    limit = event.get('limit', 50)
     query_string = event.get('query_string', """
-    fields @timestamp, @message
-    | parse @message /Resource Name: (?<resource_name>[^,]+), Resource ID: (?<resource_id>[^,]+), Status: (?<status>[^,]+), Job ID: (?<job_id>[^,]+), Resource Type: (?<resource_type>[^,]+), Message: (?<error_message>.+)/
-    | filter status = "FAILED" and resource_type = "RDS"
+    fields @timestamp, resource_name, resource_id, status, job_id, resource_type, message as error_message
+    | filter event_type = "backup_job" and status = "FAILED" and resource_type = "RDS"
     | sort @timestamp desc
-    | display @timestamp, resource_name, resource_id, status, job_id, resource_type, error_message
     | limit 50
     """)
 
-    # Define the time range
-    end_time = int(time.time() * 1000)  # Current time in milliseconds
-    start_time = end_time - (time_range * 1000)  # Start time
+    # Define the time range (Insights takes epoch seconds)
+    end_time = int(time.time())  # Current time
+    start_time = end_time - time_range  # Start time
 
     try:
-        # Start the query
-        response = client.start_query(
-            logGroupName=log_group_name,
-            startTime=start_time,
-            endTime=end_time,
-            queryString=query_string
+        results = run_sharded_query(
+            client,
+            log_group_names,
+            query_string,
+            start_time,
+            end_time,
+            max_workers=int(event.get('max_concurrent_queries', MAX_CONCURRENT_QUERIES)),
+            limit=limit
         )
-        query_id = response['queryId']
-        print(f"Started query with ID: {query_id}")
-
-        # Poll for query results
-        while True:
-            result = client.get_query_results(queryId=query_id)
-            status = result['status']
-
-            if status == 'Running':
-                print("Query is running...")
-            elif status == 'Complete':
-                print("Query completed successfully.")
-                results = []
-                for row in result['results']:
-                    # Filter out @ptr field
-                    data = {col['field']: col['value'] for col in row if col['field'] != '@ptr'}
-                    results.append(data)
-                return {
-                    "status": "success",
-                    "results": results
-                }
-            elif status == 'Scheduled':
-                print("Query is scheduled. Waiting for execution...")
-            else:
-                raise Exception(f"Query failed with status: {status}")
-
-            time.sleep(2)  # Wait 2 seconds before checking again
+        print(f"Query completed successfully with {len(results)} rows.")
+        return {
+            "status": "success",
+            "results": results
+        }
 
     except Exception as e:
         print(f"Error: {e}")
@@ -1,3 +1,16 @@
+-- Structured (JSON) backup job events: fields are discovered natively, no parse needed
+fields @timestamp, account_id, resource_name, resource_id, status, job_id, resource_type, message, region
+| filter event_type = "backup_job" and status = "FAILED" and resource_type = "RDS"
+| sort @timestamp desc
+| limit 50
+
+fields @timestamp, status, resource_type
+| filter event_type = "backup_job" and status in ["FAILED", "ABORTED", "EXPIRED"]
+| stats count(*) as job_count by bin(1h) as time_period, status, resource_type
+| sort time_period asc
+
+-- Legacy free-text backup job lines
+
 fields @timestamp, @message
 | parse @message "Account ID: * Resource Name: * Resource ARN: * Status: * Job ID: * Resource Type: * Message: * Support Team: * Region: *" as account_id, resource_name, resource_arn, status, job_id, resource_type, message, support_team, region
 | filter status = "FAILED" 
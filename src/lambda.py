@@ -1,6 +1,13 @@
 import json
 import boto3
 import os
+import time
+
+try:
+    from api_metrics import instrumented
+except ImportError:  # inline / single-file deployment: no API call metrics
+    def instrumented(handler):
+        return handler
 
 # Initialize AWS clients
 ssm_client = boto3.client('ssm')
@@ -10,13 +17,132 @@ sns_client = boto3.client('sns')
 SNS_TOPIC_ARN = os.getenv('SNS_TOPIC_ARN', 'arn:aws:sns:us-east-1:123456789012:default-topic')
 SSM_DOCUMENT_NAME = os.getenv('SSM_DOCUMENT_NAME', 'Your-SSM-Document-Name')
 
+# Batch dispatch settings
+MAX_CONCURRENCY = os.getenv('MAX_CONCURRENCY', '10%')
+MAX_ERRORS = os.getenv('MAX_ERRORS', '10%')
+TARGETS_PER_EXECUTION = 50                                   # ParameterValues target limit
+START_INTERVAL_SECONDS = float(os.getenv('START_INTERVAL_SECONDS', '0.5'))  # spacing between StartAutomationExecution calls
+TRACK_SECONDS = int(os.getenv('TRACK_SECONDS', '0'))         # 0 = report execution IDs without waiting for results
+TERMINAL_STATUSES = ('Success', 'Failed', 'TimedOut', 'Cancelled', 'CompletedWithSuccess', 'CompletedWithFailure')
+
+
+def instance_id_from_config_event(config_event):
+    invoking_event = json.loads(config_event["invokingEvent"])
+    return invoking_event["configurationItem"]["resourceId"]
+
+
+def start_rate_controlled_executions(instance_ids):
+    """
+    Start one rate-controlled automation per chunk of up to 50 instances.
+    Returns ({execution_id: instance_ids}, [errors]); a failed chunk does not stop the rest.
+    """
+    executions, errors = {}, []
+    for i in range(0, len(instance_ids), TARGETS_PER_EXECUTION):
+        chunk = instance_ids[i:i + TARGETS_PER_EXECUTION]
+        if i:
+            time.sleep(START_INTERVAL_SECONDS)
+        try:
+            response = ssm_client.start_automation_execution(
+                DocumentName=SSM_DOCUMENT_NAME,
+                TargetParameterName="InstanceId",
+                Targets=[{"Key": "ParameterValues", "Values": chunk}],
+                MaxConcurrency=MAX_CONCURRENCY,
+                MaxErrors=MAX_ERRORS
+            )
+            executions[response["AutomationExecutionId"]] = chunk
+        except Exception as e:
+            print(f"Error starting remediation for {len(chunk)} instances: {str(e)}")
+            errors.append(str(e))
+    return executions, errors
+
+
+def track_executions(execution_ids, timeout=TRACK_SECONDS):
+    """Poll execution status with backoff until all are terminal or the timeout passes."""
+    statuses = {execution_id: "Pending" for execution_id in execution_ids}
+    deadline = time.monotonic() + timeout
+    delay = 2
+    while timeout:
+        for execution_id, status in statuses.items():
+            if status not in TERMINAL_STATUSES:
+                try:
+                    execution = ssm_client.get_automation_execution(AutomationExecutionId=execution_id)
+                    statuses[execution_id] = execution["AutomationExecution"]["AutomationExecutionStatus"]
+                except Exception as e:
+                    # Keep the last known status; the next poll tries again
+                    print(f"Error tracking execution {execution_id}: {str(e)}")
+        if all(status in TERMINAL_STATUSES for status in statuses.values()):
+            break
+        if time.monotonic() + delay > deadline:
+            break
+        time.sleep(delay)
+        delay = min(delay * 2, 30)
+    return statuses
+
+
+def batch_handler(event, context):
+    """
+    Accumulate non-compliant instance IDs from an SQS batch of Config events (or an
+    explicit InstanceIds list), remediate them with a few rate-controlled automations,
+    and publish one aggregated notification.
+    """
+    ids_by_message = {}
+    failures = []
+    for record in event.get("Records", []):
+        try:
+            ids_by_message[record["messageId"]] = instance_id_from_config_event(json.loads(record["body"]))
+        except (KeyError, TypeError, ValueError) as e:
+            print(f"Skipping unparseable message {record.get('messageId')}: {e}")
+            failures.append(record.get("messageId"))
+
+    instance_ids = sorted(set(event.get("InstanceIds", [])) | set(ids_by_message.values()))
+    print(f"Dispatching remediation for {len(instance_ids)} instances")
+
+    executions, errors = start_rate_controlled_executions(instance_ids)
+
+    # Messages whose instance was not covered by a started execution are retried by SQS
+    started = {instance_id for chunk in executions.values() for instance_id in chunk}
+    failures.extend(m for m, instance_id in ids_by_message.items() if instance_id not in started)
+
+    # The automations are already running: nothing below may fail the batch, or SQS would
+    # redeliver it and every instance in it would be remediated a second time
+    try:
+        statuses = track_executions(list(executions))
+    except Exception as e:
+        print(f"Error tracking remediation executions: {str(e)}")
+        statuses = {execution_id: "Pending" for execution_id in executions}
+
+    lines = [f"Remediation dispatched for {len(started)} of {len(instance_ids)} instances "
+             f"via {len(executions)} SSM executions (document {SSM_DOCUMENT_NAME})."]
+    for execution_id, chunk in executions.items():
+        lines.append(f"{execution_id} [{statuses.get(execution_id, 'Pending')}]: {', '.join(chunk)}")
+    for error in errors:
+        lines.append(f"Error: {error}")
+
+    try:
+        sns_client.publish(
+            TopicArn=SNS_TOPIC_ARN,
+            Message="\n".join(lines),
+            Subject="EBS Optimization Remediation Failed" if errors else "EBS Optimization Remediation Triggered"
+        )
+    except Exception as e:
+        print(f"Error sending remediation notification: {str(e)}")
+
+    return {
+        "status": "Error" if errors else "Remediation started",
+        "executions": statuses,
+        "batchItemFailures": [{"itemIdentifier": m} for m in failures]
+    }
+
+@instrumented
 def lambda_handler(event, context):
+    if "Records" in event or "InstanceIds" in event:
+        return batch_handler(event, context)
+
     try:
         print("Received event: ", json.dumps(event))
 
         # Extract EC2 instance ID from AWS Config event
-        invoking_event = json.loads(event["invokingEvent"])
-        instance_id = invoking_event["configurationItem"]["resourceId"]
+        instance_id = instance_id_from_config_event(event)
 
         # Start SSM Automation to remediate EC2 instance
         response = ssm_client.start_automation_execution(
@@ -1,10 +1,258 @@
 import boto3
+import os
 import time
+from datetime import datetime, timezone, timedelta
+
+try:
+    from api_metrics import instrumented
+except ImportError:  # inline / single-file deployment: no API call metrics
+    def instrumented(handler):
+        return handler
 
 ssm = boto3.client('ssm')
 ec2 = boto3.client('ec2')
 
+CHECK_CMD = 'Get-Service AmazonSSMAgent | Select-Object -ExpandProperty Status'
+RESTART_CMD = 'powershell.exe -ExecutionPolicy Bypass -File "C:\\Scripts\\AutoStart-SSMAgent.ps1"'
+MAX_CONCURRENCY = os.getenv('MAX_CONCURRENCY', '50')
+MAX_ERRORS = os.getenv('MAX_ERRORS', '100%')     # one unhealthy host must not stop the rest of the fleet
+SEND_COMMAND_TARGET_LIMIT = 50                   # send_command accepts at most 50 InstanceIds
+WAIT_SECONDS = int(os.getenv('WAIT_SECONDS', '120'))
+TERMINAL_STATUSES = ('Success', 'Cancelled', 'TimedOut', 'Failed')
+UNREACHABLE_DETAILS = ('DeliveryTimedOut', 'Undeliverable')
+STALE_PING_MINUTES = int(os.getenv('STALE_PING_MINUTES', '15'))
+
+
+def _describe_windows(instance_ids, windows):
+    paginator = ec2.get_paginator('describe_instances')
+    for page in paginator.paginate(InstanceIds=instance_ids):
+        for reservation in page['Reservations']:
+            for instance in reservation['Instances']:
+                if instance.get('Platform', 'Linux').lower() == 'windows':
+                    windows.add(instance['InstanceId'])
+
+
+def get_windows_instances(instance_ids):
+    """
+    Return (windows, errors): the subset of instance_ids running Windows, using paginated
+    describe_instances, and {instance_id: message} for IDs that could not be described.
+    One unknown or malformed ID fails its whole chunk, so a failed chunk is retried per instance.
+    """
+    windows, errors = set(), {}
+    for i in range(0, len(instance_ids), 1000):
+        chunk = instance_ids[i:i + 1000]
+        try:
+            _describe_windows(chunk, windows)
+        except Exception as e:
+            print(f"⚠️ describe_instances failed for {len(chunk)} instances, retrying one by one: {e}")
+            for instance_id in chunk:
+                try:
+                    _describe_windows([instance_id], windows)
+                except Exception as e:
+                    errors[instance_id] = f"Failed to get instance platform: {e}"
+    return windows, errors
+
+
+def _send_command(instance_ids, commands, timeout_seconds):
+    response = ssm.send_command(
+        InstanceIds=instance_ids,
+        DocumentName="AWS-RunPowerShellScript",
+        Parameters={'commands': commands},
+        TimeoutSeconds=timeout_seconds,
+        MaxConcurrency=MAX_CONCURRENCY,
+        MaxErrors=MAX_ERRORS
+    )
+    return response['Command']['CommandId']
+
+
+def send_fleet_command(instance_ids, commands, timeout_seconds):
+    """
+    Send one rate-controlled PowerShell command per 50 instances. Returns (command_ids, errors).
+    send_command rejects a whole chunk if any host is not SSM-managed, so a rejected chunk is
+    resent per instance and only the instances that still fail end up in errors.
+    """
+    command_ids, errors = [], {}
+    for i in range(0, len(instance_ids), SEND_COMMAND_TARGET_LIMIT):
+        chunk = instance_ids[i:i + SEND_COMMAND_TARGET_LIMIT]
+        try:
+            command_ids.append(_send_command(chunk, commands, timeout_seconds))
+        except Exception as e:
+            print(f"⚠️ send_command failed for {len(chunk)} instances, retrying one by one: {e}")
+            for instance_id in chunk:
+                try:
+                    command_ids.append(_send_command([instance_id], commands, timeout_seconds))
+                except Exception as e:
+                    errors[instance_id] = f"Failed to send command: {e}"
+    return command_ids, errors
+
+
+def collect_invocations(command_ids, expected, deadline):
+    """
+    Page list_command_invocations with backoff until every expected instance has a terminal
+    result or the deadline passes. Returns {instance_id: invocation}.
+    """
+    results = {}
+    delay = 1
+    while True:
+        for command_id in command_ids:
+            paginator = ssm.get_paginator('list_command_invocations')
+            try:
+                for page in paginator.paginate(CommandId=command_id, Details=True):
+                    for invocation in page['CommandInvocations']:
+                        results[invocation['InstanceId']] = invocation
+            except Exception as e:
+                # Keep what was collected; the next poll (or the deadline) covers this command
+                print(f"⚠️ list_command_invocations failed for {command_id}: {e}")
+
+        done = all(results.get(i, {}).get('Status') in TERMINAL_STATUSES for i in expected)
+        if done or time.monotonic() + delay > deadline:
+            return results
+        time.sleep(delay)
+        delay = min(delay * 2, 15)
+
+
+def _invocation_output(invocation):
+    plugins = invocation.get('CommandPlugins') or [{}]
+    return (plugins[0].get('Output') or '').strip()
+
+
+def fleet_handler(event, context):
+    """Check the SSM Agent on many Windows instances with one command, then restart only those that need it."""
+    deadline = time.monotonic() + int(event.get('WaitSeconds', WAIT_SECONDS))
+    instance_ids = sorted(set(event['InstanceIds']))
+    results = {}
+
+    windows, errors = get_windows_instances(instance_ids)
+    for instance_id in instance_ids:
+        if instance_id in errors:
+            results[instance_id] = {"status": "error", "message": errors[instance_id]}
+        elif instance_id not in windows:
+            results[instance_id] = {"status": "unsupported"}
+    targets = sorted(windows)
+    if not targets:
+        return {"status": "completed", "results": results}
+
+    # 1. One batched status check for the whole fleet
+    check_ids, errors = send_fleet_command(targets, [CHECK_CMD], 30)
+    checks = collect_invocations(check_ids, [i for i in targets if i not in errors], deadline)
+
+    needs_restart = []
+    for instance_id in targets:
+        invocation = checks.get(instance_id)
+        if instance_id in errors:
+            results[instance_id] = {"status": "error", "message": errors[instance_id]}
+        elif invocation is None or invocation.get('Status') not in TERMINAL_STATUSES:
+            results[instance_id] = {"status": "pending", "message": "No check result before the deadline"}
+        elif invocation.get('StatusDetails') in UNREACHABLE_DETAILS:
+            results[instance_id] = {"status": "unreachable", "command_status": invocation['StatusDetails']}
+        elif 'running' in _invocation_output(invocation).lower():
+            results[instance_id] = {"status": "running"}
+        else:
+            needs_restart.append(instance_id)
+
+    # 2. One batched restart for the instances that need it
+    restarted = 0
+    if needs_restart:
+        restart_ids, errors = send_fleet_command(needs_restart, [RESTART_CMD], 60)
+        restarted = len(needs_restart) - len(errors)
+        restarts = collect_invocations(restart_ids, [i for i in needs_restart if i not in errors], deadline)
+        for instance_id in needs_restart:
+            if instance_id in errors:
+                results[instance_id] = {"status": "error", "message": errors[instance_id]}
+                continue
+            invocation = restarts.get(instance_id, {})
+            status = invocation.get('Status', 'Pending')
+            results[instance_id] = {
+                "status": "invoked_restart_script" if status == 'Success' else "invoke_failed",
+                "command_status": status,
+                "stdout": _invocation_output(invocation)
+            }
+
+    return {"status": "completed", "restarted": restarted, "results": results}
+
+
+def get_agent_health():
+    """Page describe_instance_information once for every Windows managed instance's agent state."""
+    health = {}
+    paginator = ssm.get_paginator('describe_instance_information')
+    for page in paginator.paginate(Filters=[{'Key': 'PlatformTypes', 'Values': ['Windows']}]):
+        for info in page['InstanceInformationList']:
+            health[info['InstanceId']] = {
+                "ping_status": info.get('PingStatus'),
+                "last_ping": info.get('LastPingDateTime'),
+                "agent_version": info.get('AgentVersion')
+            }
+    return health
+
+
+def get_running_windows_instances(tag_filters=None):
+    """Return the IDs of running Windows instances, optionally narrowed by EC2 tag filters."""
+    filters = [
+        {'Name': 'platform', 'Values': ['windows']},
+        {'Name': 'instance-state-name', 'Values': ['running']}
+    ] + list(tag_filters or [])
+    instance_ids = []
+    paginator = ec2.get_paginator('describe_instances')
+    for page in paginator.paginate(Filters=filters):
+        for reservation in page['Reservations']:
+            instance_ids.extend(i['InstanceId'] for i in reservation['Instances'])
+    return instance_ids
+
+
+def health_sweep_handler(event, context):
+    """
+    Join the EC2 inventory with SSM agent health from a few list calls and report hosts whose
+    agent is missing, not Online, or has a stale ping. With Remediate=true, only those hosts
+    go through the fleet check/restart flow.
+    """
+    health = get_agent_health()
+    stale_before = datetime.now(timezone.utc) - timedelta(minutes=STALE_PING_MINUTES)
+
+    unhealthy = {}
+    for instance_id in get_running_windows_instances(event.get('Filters')):
+        info = health.get(instance_id)
+        if info is None:
+            unhealthy[instance_id] = {"reason": "not_registered"}
+        elif info['ping_status'] != 'Online':
+            unhealthy[instance_id] = {"reason": (info['ping_status'] or 'unknown').lower(), **info}
+        elif info['last_ping'] and info['last_ping'] < stale_before:
+            unhealthy[instance_id] = {"reason": "stale_ping", **info}
+
+    response = {
+        "status": "completed",
+        "managed": len(health),
+        "unhealthy": {i: {k: str(v) for k, v in d.items()} for i, d in unhealthy.items()}
+    }
+    # Unregistered hosts cannot receive commands; only registered ones are worth a restart attempt
+    targets = [i for i, d in unhealthy.items() if d['reason'] != 'not_registered']
+    if event.get('Remediate') and targets:
+        response["remediation"] = fleet_handler({**event, "InstanceIds": targets}, context)
+    return response
+
+
+def wait_for_invocation(command_id, instance_id, timeout):
+    """Return the instance's invocation once it reaches a terminal status (or the latest one at timeout)."""
+    deadline = time.monotonic() + timeout
+    delay = 1
+    while True:
+        try:
+            result = ssm.get_command_invocation(CommandId=command_id, InstanceId=instance_id)
+            if result.get('Status') in TERMINAL_STATUSES or time.monotonic() + delay > deadline:
+                return result
+        except ssm.exceptions.InvocationDoesNotExist:
+            # The invocation is registered asynchronously right after send_command
+            if time.monotonic() + delay > deadline:
+                raise
+        time.sleep(delay)
+        delay = min(delay * 2, 10)
+
+@instrumented
 def lambda_handler(event, context):
+    if event.get('HealthSweep'):
+        return health_sweep_handler(event, context)
+    if event.get('InstanceIds'):
+        return fleet_handler(event, context)
+
     instance_id = event.get('InstanceId')
     if not instance_id:
         return {"status": "error", "message": "InstanceId not provided in the event"}
@@ -23,22 +271,19 @@ def lambda_handler(event, context):
 
     # 2. Check if SSM Agent is running
     try:
-        check_cmd = 'Get-Service AmazonSSMAgent | Select-Object -ExpandProperty Status'
         check_response = ssm.send_command(
             InstanceIds=[instance_id],
             DocumentName="AWS-RunPowerShellScript",
-            Parameters={'commands': [check_cmd]},
+            Parameters={'commands': [CHECK_CMD]},
             TimeoutSeconds=30
         )
 
         command_id = check_response['Command']['CommandId']
-        time.sleep(3)
-
-        result = ssm.get_command_invocation(CommandId=command_id, InstanceId=instance_id)
+        result = wait_for_invocation(command_id, instance_id, 45)
         status_output = result.get('StandardOutputContent', '').strip().lower()
-        command_status = result.get('Status')
+        command_status = result.get('StatusDetails') or result.get('Status')
 
-        if command_status in ['DeliveryTimedOut', 'Undeliverable']:
+        if command_status in UNREACHABLE_DETAILS:
             return {
                 "status": "unreachable",
                 "message": "SSM Agent is down. Cannot send command.",
@@ -56,21 +301,15 @@ def lambda_handler(event, context):
 
     # 3. Agent is stopped – invoke the pre-created PowerShell script to restart it
     try:
-        invoke_script = [
-            'powershell.exe -ExecutionPolicy Bypass -File "C:\\Scripts\\AutoStart-SSMAgent.ps1"'
-        ]
-
         restart_response = ssm.send_command(
             InstanceIds=[instance_id],
             DocumentName="AWS-RunPowerShellScript",
-            Parameters={'commands': invoke_script},
+            Parameters={'commands': [RESTART_CMD]},
             TimeoutSeconds=60
         )
 
         restart_command_id = restart_response['Command']['CommandId']
-        time.sleep(5)
-
-        result = ssm.get_command_invocation(CommandId=restart_command_id, InstanceId=instance_id)
+        result = wait_for_invocation(restart_command_id, instance_id, 75)
 
         if result['Status'] == 'Success':
             return {
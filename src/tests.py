@@ -1,43 +1,73 @@
 import boto3
+import sys
 import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Initialize AWS Config client
 client = boto3.client('config')
 
-def wait_for_remediation_completion(config_rule_name):
-    """Waits for ongoing remediation execution to complete."""
+ACTIVE_STATES = ("QUEUED", "IN_PROGRESS")
+TERMINAL_STATES = ("SUCCEEDED", "FAILED")
+POLL_INITIAL_SECONDS = 2
+POLL_MAX_SECONDS = 30
+
+def resolve_rule_names(rule_names=None, prefix=None):
+    """Explicit rule names plus every Config rule whose name starts with prefix."""
+    names = set(rule_names or [])
+    if prefix:
+        paginator = client.get_paginator('describe_config_rules')
+        for page in paginator.paginate():
+            for rule in page['ConfigRules']:
+                if rule['ConfigRuleName'].startswith(prefix):
+                    names.add(rule['ConfigRuleName'])
+    return sorted(names)
+
+def _remediation_in_progress(config_rule_name):
+    """True if any remediation execution for the rule is still queued or running.
+
+    SUCCEEDED / FAILED executions are settled even if a step was left PENDING (a failed
+    execution never runs its remaining steps); steps are only consulted when the
+    execution reports no State yet.
+    """
+    paginator = client.get_paginator('describe_remediation_execution_status')
+    for page in paginator.paginate(ConfigRuleName=config_rule_name):
+        for status in page.get("RemediationExecutionStatuses", []):
+            state = status.get("State")
+            if state in TERMINAL_STATES:
+                continue
+            if state in ACTIVE_STATES:
+                return True
+            if any(step.get("StepStatus") in ("PENDING", "IN_PROGRESS")
+                   for step in status.get("RemediationExecutionStepStatuses", [])):
+                return True
+    return False
+
+def wait_for_remediation_completion(config_rule_name, deadline=None):
+    """Waits for ongoing remediation execution to complete, backing off exponentially until deadline."""
     print(f"Checking remediation execution status for: {config_rule_name}")
 
+    delay = POLL_INITIAL_SECONDS
     while True:
         try:
-            response = client.describe_remediation_execution_status(
-                ConfigRuleName=config_rule_name
-            )
+            if not _remediation_in_progress(config_rule_name):
+                print(f"Remediation execution completed: {config_rule_name}")
+                return True
 
-            if "RemediationExecutionStatuses" not in response or not response["RemediationExecutionStatuses"]:
-                print("No active remediation found.")
-                return
+            if deadline and time.monotonic() + delay > deadline:
+                print(f"Deadline reached while remediation still in progress: {config_rule_name}")
+                return False
 
-            # Check if any resource is still in progress
-            in_progress = any(
-                status["RemediationExecutionStepStatuses"][0]["StepStatus"] == "IN_PROGRESS"
-                for status in response["RemediationExecutionStatuses"]
-                if "RemediationExecutionStepStatuses" in status and status["RemediationExecutionStepStatuses"]
-            )
-
-            if not in_progress:
-                print("Remediation execution completed.")
-                return
-
-            print("Remediation is still in progress... waiting 10 seconds.")
-            time.sleep(10)
+            print(f"Remediation is still in progress for {config_rule_name}... waiting {delay} seconds.")
+            time.sleep(delay)
+            delay = min(delay * 2, POLL_MAX_SECONDS)
 
         except client.exceptions.NoSuchRemediationConfigurationException:
-            print("No remediation found for this rule.")
-            return
+            print(f"No remediation found for this rule: {config_rule_name}")
+            return True
         except Exception as e:
-            print(f"Error checking remediation status: {str(e)}")
-            return
+            print(f"Error checking remediation status for {config_rule_name}: {str(e)}")
+            return False
 
 def delete_remediation_configuration(config_rule_name):
     """Deletes remediation configuration for the given config rule."""
@@ -51,26 +81,66 @@ def delete_remediation_configuration(config_rule_name):
     except Exception as e:
         print(f"Error deleting remediation configuration: {str(e)}")
 
-def delete_config_rule(config_rule_name):
-    """Deletes the AWS Config rule."""
-    try:
-        response = client.delete_config_rule(
-            ConfigRuleName=config_rule_name
-        )
-        print(f"Successfully deleted config rule: {config_rule_name}")
-    except client.exceptions.NoSuchConfigRuleException:
-        print(f"Config rule not found: {config_rule_name}")
-    except Exception as e:
-        print(f"Error deleting config rule: {str(e)}")
-
-if __name__ == "__main__":
-    config_rule_name = "your-config-rule-name"  # Change this to your actual Config Rule name
+def delete_config_rule(config_rule_name, deadline=None):
+    """Deletes the AWS Config rule, retrying with backoff while Config still reports it in use."""
+    delay = POLL_INITIAL_SECONDS
+    while True:
+        try:
+            response = client.delete_config_rule(
+                ConfigRuleName=config_rule_name
+            )
+            print(f"Successfully deleted config rule: {config_rule_name}")
+            return True
+        except client.exceptions.NoSuchConfigRuleException:
+            print(f"Config rule not found: {config_rule_name}")
+            return True
+        except client.exceptions.ResourceInUseException:
+            if deadline and time.monotonic() + delay > deadline:
+                print(f"Deadline reached; config rule still in use: {config_rule_name}")
+                return False
+            time.sleep(delay)
+            delay = min(delay * 2, POLL_MAX_SECONDS)
+        except Exception as e:
+            print(f"Error deleting config rule: {str(e)}")
+            return False
 
+def teardown_rule(config_rule_name, deadline):
     # Step 1: Wait for remediation execution to complete
-    wait_for_remediation_completion(config_rule_name)
+    if not wait_for_remediation_completion(config_rule_name, deadline):
+        return config_rule_name, False
 
     # Step 2: Delete remediation configuration
     delete_remediation_configuration(config_rule_name)
 
     # Step 3: Delete the config rule
-    delete_config_rule(config_rule_name)
+    return config_rule_name, delete_config_rule(config_rule_name, deadline)
+
+def teardown(rule_names, max_workers=10, timeout=900):
+    """Tear down many rules concurrently under one overall deadline; returns {rule_name: succeeded}."""
+    deadline = time.monotonic() + timeout
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as exe:
+        futs = [exe.submit(teardown_rule, name, deadline) for name in rule_names]
+        for fut in as_completed(futs):
+            name, ok = fut.result()
+            results[name] = ok
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Delete AWS Config rules and their remediation configurations.")
+    parser.add_argument("rules", nargs="*", help="Config rule names to tear down")
+    parser.add_argument("--prefix", help="Also tear down every rule whose name starts with this prefix")
+    parser.add_argument("--workers", type=int, default=10)
+    parser.add_argument("--timeout", type=int, default=900, help="Overall deadline in seconds")
+    args = parser.parse_args()
+
+    config_rule_names = resolve_rule_names(args.rules, args.prefix)
+    if not config_rule_names:
+        parser.error("no Config rules given or matched")
+
+    results = teardown(config_rule_names, max_workers=args.workers, timeout=args.timeout)
+    failed = sorted(name for name, ok in results.items() if not ok)
+    print(f"Torn down {len(results) - len(failed)} of {len(results)} rules")
+    if failed:
+        print("Failed: " + ", ".join(failed))
+        sys.exit(1)
@@ -1,9 +1,42 @@
 import boto3
 
+FILTER_VALUE_LIMIT = 200  # keep each resource-id filter well within the API's filter size limits
+
+def bulk_snapshot_required(ec2_client, instance_ids):
+    """Answer Snapshot_Required for many instances with paginated describe_tags sweeps."""
+    results = {instance_id: False for instance_id in instance_ids}
+    paginator = ec2_client.get_paginator('describe_tags')
+    for i in range(0, len(instance_ids), FILTER_VALUE_LIMIT):
+        for page in paginator.paginate(Filters=[
+            {'Name': 'resource-id', 'Values': instance_ids[i:i + FILTER_VALUE_LIMIT]},
+            {'Name': 'key', 'Values': ['Snapshot_Required']}
+        ]):
+            for tag in page['Tags']:
+                if tag['Value'] == 'Yes':
+                    results[tag['ResourceId']] = True
+    return results
+
+def instances_matching(ec2_client, filters):
+    instance_ids = []
+    paginator = ec2_client.get_paginator('describe_instances')
+    for page in paginator.paginate(Filters=filters):
+        for reservation in page['Reservations']:
+            instance_ids.extend(i['InstanceId'] for i in reservation['Instances'])
+    return instance_ids
+
 def check_snapshot_required_tag(events, context):
-    instance_id = events['InstanceId']
     ec2_client = boto3.client('ec2')
 
+    # Bulk mode: a list of instance IDs or EC2 filters (e.g. tag:Environment) for a whole fleet
+    if events.get('InstanceIds') or events.get('Filters'):
+        try:
+            instance_ids = list(events.get('InstanceIds') or instances_matching(ec2_client, events['Filters']))
+            return {'Results': bulk_snapshot_required(ec2_client, instance_ids)}
+        except Exception as e:
+            return {'Status': 'Failed', 'Error': str(e)}
+
+    instance_id = events['InstanceId']
+
     try:
         response = ec2_client.describe_instances(InstanceIds=[instance_id])
         instance = response['Reservations'][0]['Instances'][0]
@@ -0,0 +1,17 @@
+"""
+The handlers are standalone Lambda scripts, not a package: put their directories on
+sys.path so the shared modules import the way they do inside a deployment bundle.
+Appended, not prepended, so src/email.py cannot shadow the stdlib email package.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+for path in ("src", os.path.join("src", "config"), os.path.join("src", "config", "security-hub")):
+    sys.path.append(os.path.join(ROOT, path))
@@ -0,0 +1,72 @@
+import hashlib
+import io
+
+import pytest
+from botocore.exceptions import ClientError
+
+import backup_history
+
+
+class FakeBody(io.BytesIO):
+    def iter_chunks(self):
+        yield self.getvalue()
+
+
+class FakeS3:
+    """One object with S3's If-Match / If-None-Match semantics."""
+
+    def __init__(self):
+        self.body = None
+        self.etag = None
+
+    def get_object(self, Bucket, Key):
+        if self.body is None:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        return {"Body": FakeBody(self.body), "ETag": self.etag}
+
+    def put_object(self, Bucket, Key, Body, IfMatch=None, IfNoneMatch=None):
+        if (IfNoneMatch == "*" and self.body is not None) or (IfMatch and IfMatch != self.etag):
+            raise ClientError({"Error": {"Code": "PreconditionFailed"}}, "PutObject")
+        self.body = Body.read()
+        self.etag = hashlib.md5(self.body).hexdigest()
+        return {"ETag": self.etag}
+
+
+def job(job_id, state="COMPLETED", completed="2024-01-01T02:00:00+00:00"):
+    return {"BackupJobId": job_id, "State": state, "CreationDate": "2024-01-01T01:00:00+00:00", "CompletionDate": completed}
+
+
+def job_states(conn):
+    return dict(conn.execute("SELECT job_id, state FROM backup_jobs"))
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    fake = FakeS3()
+    monkeypatch.setattr(backup_history, "s3_client", fake)
+    monkeypatch.setattr(backup_history, "S3_BUCKET", "history-bucket")
+    monkeypatch.setattr(backup_history, "_etags", {})
+    return fake
+
+
+def test_overlapping_runs_keep_each_others_jobs(s3, tmp_path):
+    first = backup_history.open_store(str(tmp_path / "a.sqlite3"))
+    second = backup_history.open_store(str(tmp_path / "b.sqlite3"))
+    backup_history.upsert_jobs(first, [job("job-1"), job("job-2", "RUNNING", None)])
+    backup_history.upsert_jobs(second, [job("job-2"), job("job-3")])
+
+    assert backup_history.save_store(first, str(tmp_path / "a.sqlite3"))
+    assert backup_history.save_store(second, str(tmp_path / "b.sqlite3"))
+
+    reread = backup_history.open_store(str(tmp_path / "c.sqlite3"))
+    assert job_states(reread) == {"job-1": "COMPLETED", "job-2": "COMPLETED", "job-3": "COMPLETED"}
+
+
+def test_upload_errors_are_reported_not_raised(s3, tmp_path, monkeypatch):
+    def denied(**kwargs):
+        raise ClientError({"Error": {"Code": "AccessDenied"}}, "PutObject")
+
+    monkeypatch.setattr(s3, "put_object", denied)
+    conn = backup_history.open_store(str(tmp_path / "a.sqlite3"))
+    backup_history.upsert_jobs(conn, [job("job-1")])
+    assert backup_history.save_store(conn, str(tmp_path / "a.sqlite3")) is False
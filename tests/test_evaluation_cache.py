@@ -0,0 +1,83 @@
+import pytest
+
+import evaluation_cache
+from evaluation_cache import EvaluationCache
+
+NOW = 1_700_000_000.0
+
+
+def evaluation(resource_id, compliance="NON_COMPLIANT", annotation="Missing alarm"):
+    return {
+        "ComplianceResourceType": "AWS::EC2::Instance",
+        "ComplianceResourceId": resource_id,
+        "ComplianceType": compliance,
+        "Annotation": annotation,
+    }
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(evaluation_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(evaluation_cache, "CACHE_BUCKET", "")
+    return EvaluationCache("test-rule")
+
+
+def test_new_results_are_submitted(cache):
+    evaluations = [evaluation("i-1"), evaluation("i-2")]
+    assert cache.filter(evaluations, now=NOW) == evaluations
+
+
+def test_unchanged_results_are_suppressed(cache):
+    cache.mark_submitted([evaluation("i-1")], now=NOW)
+    assert cache.filter([evaluation("i-1")], now=NOW + 3600) == []
+
+
+@pytest.mark.parametrize("changed", [
+    evaluation("i-1", compliance="COMPLIANT"),
+    evaluation("i-1", annotation="Alarm has no actions"),
+])
+def test_changed_results_are_submitted(cache, changed):
+    cache.mark_submitted([evaluation("i-1")], now=NOW)
+    assert cache.filter([changed], now=NOW + 3600) == [changed]
+
+
+def test_unchanged_results_are_resubmitted_when_refresh_is_due(cache):
+    cache.mark_submitted([evaluation("i-1")], now=NOW)
+    refresh = evaluation_cache.REFRESH_HOURS * 3600
+    assert cache.filter([evaluation("i-1")], now=NOW + refresh - 60) == []
+    assert cache.filter([evaluation("i-1")], now=NOW + refresh + 60) == [evaluation("i-1")]
+
+
+def test_cache_survives_a_cold_start(cache):
+    cache.mark_submitted([evaluation("i-1")], now=NOW)
+    cache.save(now=NOW)
+    assert EvaluationCache("test-rule").filter([evaluation("i-1")], now=NOW) == []
+
+
+def test_recreated_rule_does_not_inherit_the_cache(cache):
+    old = EvaluationCache.for_event({"configRuleName": "test-rule", "configRuleId": "config-rule-old"})
+    old.mark_submitted([evaluation("i-1")], now=NOW)
+    old.save(now=NOW)
+    new = EvaluationCache.for_event({"configRuleName": "test-rule",
+                                     "configRuleArn": "arn:aws:config:eu-west-1:123456789012:config-rule/config-rule-new"})
+    assert new.filter([evaluation("i-1")], now=NOW) == [evaluation("i-1")]
+
+
+def test_expired_entries_are_evicted_on_save(cache):
+    refresh = evaluation_cache.REFRESH_HOURS * 3600
+    cache.mark_submitted([evaluation("i-gone")], now=NOW)
+    cache.mark_submitted([evaluation("i-1")], now=NOW + refresh)
+    cache.save(now=NOW + refresh + 60)
+    assert set(EvaluationCache("test-rule").entries) == {"AWS::EC2::Instance|i-1"}
+
+
+def test_failed_s3_save_does_not_raise(cache, monkeypatch):
+    class FailingS3:
+        def put_object(self, **kwargs):
+            raise RuntimeError("AccessDenied")
+
+    monkeypatch.setattr(evaluation_cache, "CACHE_BUCKET", "cache-bucket")
+    monkeypatch.setattr(evaluation_cache.boto3, "client", lambda service: FailingS3())
+    cache.mark_submitted([evaluation("i-1")], now=NOW)
+    cache.save(now=NOW)
+    assert EvaluationCache("test-rule").filter([evaluation("i-1")], now=NOW) == []
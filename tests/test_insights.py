@@ -0,0 +1,84 @@
+import time
+
+import insights
+
+
+def test_split_time_range_aligns_shards_to_buckets():
+    assert insights.split_time_range(1000, 8000, shard_seconds=3600) == [
+        (1000, 3600), (3600, 7200), (7200, 8000)
+    ]
+
+
+def test_split_time_range_single_and_empty():
+    assert insights.split_time_range(3600, 7200, shard_seconds=3600) == [(3600, 7200)]
+    assert insights.split_time_range(5000, 5000, shard_seconds=3600) == []
+
+
+def settled_bucket():
+    end = (int(time.time()) - insights.CACHE_SETTLE_SECONDS) // insights.SHARD_SECONDS * insights.SHARD_SECONDS
+    return (end - insights.SHARD_SECONDS, end)
+
+
+class FakeLogs:
+    """Answers every query immediately with one row stamped with the shard start."""
+
+    def __init__(self):
+        self.queries = []
+
+    def start_query(self, logGroupNames, startTime, endTime, queryString):
+        self.queries.append((startTime, endTime))
+        return {"queryId": f"q-{startTime}-{endTime}"}
+
+    def get_query_results(self, queryId):
+        start = queryId.split("-")[1]
+        return {"status": "Complete",
+                "results": [[{"field": "@timestamp", "value": start}, {"field": "@ptr", "value": "p"}]]}
+
+
+def test_settled_shards_are_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(insights, "CACHE_DIR", str(tmp_path))
+    shard = settled_bucket()
+    rows = [{"count": "3"}]
+    insights._cache_put("stats count(*)", ["/group"], shard, rows)
+    assert insights._cache_get("stats count(*)", ["/group"], shard) == rows
+
+
+def test_recent_shards_are_never_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(insights, "CACHE_DIR", str(tmp_path))
+    end = int(time.time()) - insights.CACHE_SETTLE_SECONDS + 60
+    shard = (end - 3600, end)
+    insights._cache_put("stats count(*)", ["/group"], shard, [{"count": "3"}])
+    assert insights._cache_get("stats count(*)", ["/group"], shard) is None
+
+
+def test_partial_shards_are_never_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(insights, "CACHE_DIR", str(tmp_path))
+    start, end = settled_bucket()
+    shard = (start + 60, end)
+    insights._cache_put("fields @message", ["/group"], shard, [{"@message": "x"}])
+    assert insights._cache_get("fields @message", ["/group"], shard) is None
+
+
+def test_second_run_reuses_cached_buckets(tmp_path, monkeypatch):
+    monkeypatch.setattr(insights, "CACHE_DIR", str(tmp_path))
+    client = FakeLogs()
+    end = settled_bucket()[1] - insights.SHARD_SECONDS // 2  # mid-bucket, every whole bucket settled
+    start = end - 6 * insights.SHARD_SECONDS
+
+    first = insights.run_sharded_query(client, ["/group"], "fields @timestamp", start, end)
+    first_queries = len(client.queries)
+    second = insights.run_sharded_query(client, ["/group"], "fields @timestamp", start + 30, end + 30)
+
+    assert first_queries == 7  # partial head, five whole buckets, partial tail
+    # only the partial head and tail are queried again
+    assert len(client.queries) - first_queries == 2
+    assert len(second) == len(first)
+
+
+def test_aggregation_queries_are_not_sharded(tmp_path, monkeypatch):
+    monkeypatch.setattr(insights, "CACHE_DIR", str(tmp_path))
+    client = FakeLogs()
+    end = int(time.time())
+    insights.run_sharded_query(client, ["/group"], "filter status = 'FAILED' | stats count(*) by resource_type",
+                               end - 6 * insights.SHARD_SECONDS, end)
+    assert client.queries == [(end - 6 * insights.SHARD_SECONDS, end)]
@@ -0,0 +1,93 @@
+import pytest
+
+import securityhub_findings as shf
+
+NOW = 1_700_000_000.0
+
+
+def finding(resource_id, severity="HIGH", updated_at="2024-01-01T00:00:00Z"):
+    return {
+        "Id": shf.finding_id("rule", "111122223333", "us-east-1", resource_id),
+        "CreatedAt": "2024-01-01T00:00:00.000000Z",
+        "UpdatedAt": updated_at,
+        "Severity": {"Label": severity},
+        "Resources": [{"Type": "AwsEc2Instance", "Id": resource_id}],
+    }
+
+
+def stored(resource_id, imported_at, **kwargs):
+    """Store entries as the previous run would have written them."""
+    _, current, _ = shf.plan({}, [(resource_id, finding(resource_id, **kwargs))], imported_at)
+    return current
+
+
+def test_new_findings_are_imported():
+    to_import, current, recovered = shf.plan({}, [("i-1", finding("i-1"))], NOW)
+    assert [f["Id"] for f in to_import] == [finding("i-1")["Id"]]
+    assert current[finding("i-1")["Id"]][3] == NOW
+    assert recovered == []
+
+
+def test_unchanged_findings_are_skipped_and_keep_their_import_time():
+    entries = stored("i-1", NOW - 3600)
+    to_import, current, _ = shf.plan(entries, [("i-1", finding("i-1", updated_at="later"))], NOW)
+    assert to_import == []
+    assert current[finding("i-1")["Id"]][3] == NOW - 3600
+
+
+def test_changed_findings_are_imported():
+    entries = stored("i-1", NOW - 3600)
+    to_import, _, _ = shf.plan(entries, [("i-1", finding("i-1", severity="CRITICAL"))], NOW)
+    assert len(to_import) == 1
+
+
+def test_unchanged_findings_are_reimported_when_refresh_is_due():
+    refresh = shf.FINDING_REFRESH_HOURS * 3600
+    assert refresh < 90 * 24 * 3600  # Security Hub expires findings not updated for 90 days
+    entries = stored("i-1", NOW - refresh - 60)
+    to_import, current, _ = shf.plan(entries, [("i-1", finding("i-1"))], NOW)
+    assert len(to_import) == 1
+    assert current[finding("i-1")["Id"]][3] == NOW
+
+
+def test_entries_without_an_import_time_are_due():
+    entries = stored("i-1", NOW)
+    fid = finding("i-1")["Id"]
+    entries[fid] = entries[fid][:3]
+    to_import, _, _ = shf.plan(entries, [("i-1", finding("i-1"))], NOW)
+    assert len(to_import) == 1
+
+
+def test_findings_no_longer_failing_are_recovered():
+    entries = {**stored("i-1", NOW), **stored("i-2", NOW)}
+    _, current, recovered = shf.plan(entries, [("i-1", finding("i-1"))], NOW)
+    assert list(current) == [finding("i-1")["Id"]]
+    assert recovered == [finding("i-2")["Id"]]
+
+
+@pytest.mark.parametrize("resource_type, asff_type", [
+    ("AWS::EC2::Instance", "AwsEc2Instance"),
+    ("AWS::CloudWatch::Alarm", "AwsCloudWatchAlarm"),
+    ("AWS::Logs::LogGroup", "Other"),
+    ("Custom::Thing", "Other"),
+])
+def test_asff_resource_type(resource_type, asff_type):
+    assert shf.asff_resource_type(resource_type) == asff_type
+
+
+def test_archived_findings_are_informational_for_every_publisher(monkeypatch):
+    for name, value in [("SECURITY_HUB_PRODUCT_ARN", "arn:aws:securityhub:us-east-1:111122223333:product/111122223333/default"),
+                        ("SEVERITY", "HIGH"), ("COMPLIANCE_TITLE", "t"), ("COMPLIANCE_DESCRIPTION", "d")]:
+        monkeypatch.setenv(name, value)
+    import CpuAlarmMissingeval
+    from evaluation_sinks import SecurityHubSink
+
+    sink = SecurityHubSink("rule", "111122223333", "us-east-1", client=object())
+    archived = [
+        CpuAlarmMissingeval.instance_finding("rule", "111122223333", "us-east-1", "i-1", "2024-01-01T00:00:00.000000Z", passed=True),
+        sink.archived("i-1", "2024-01-01T00:00:00.000000Z", None),
+    ]
+    assert [(f["Severity"]["Label"], f["Compliance"]["Status"], f["RecordState"]) for f in archived] == \
+        [("INFORMATIONAL", "PASSED", "ARCHIVED")] * 2
+    active = CpuAlarmMissingeval.instance_finding("rule", "111122223333", "us-east-1", "i-1", "2024-01-01T00:00:00.000000Z")
+    assert active["Severity"]["Label"] == "HIGH"